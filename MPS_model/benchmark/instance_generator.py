@@ -0,0 +1,180 @@
+import datetime
+import os
+
+import numpy as np
+import pandas as pd
+
+from data.data_reader import generate_excel_data_paths
+from util.header import *
+
+
+# 合成算例的默认规模和结构参数
+DEFAULT_INSTANCE_CONFIG = {
+    'supply_centers': 2,        # 供应中心数
+    'factories': 4,             # 组装厂数
+    'pns': 6,                   # PN 数
+    'skus_per_pn': 3,           # 每个 PN 下的 SKU 数
+    'moq_density': 0.5,         # MOQ 大于 0 的 SKU 比例
+    'T': 26,                    # 计划周期(周)
+    'demand_density': 0.7,      # 有需求的 SKU 中, 每周需求非零的概率
+    'inactive_sku_ratio': 0.1,  # 计划期内无需求、无库存且无在途PO的 SKU 比例
+    'seed': 0,                  # 随机种子
+}
+
+# 日历在计划周期前后各多覆盖的周数, 用于在途PO的到货日期和产能占用周
+_CALENDAR_MARGIN_WEEKS = 20
+
+
+def get_instance_name(config):
+    """由算例参数生成算例名称, 如 sc2_f4_pn6_k3_moq0.5_T26_seed0"""
+    return (
+        f"sc{config['supply_centers']}_f{config['factories']}_pn{config['pns']}_k{config['skus_per_pn']}"
+        f"_moq{config['moq_density']}_T{config['T']}_seed{config['seed']}"
+    )
+
+
+def generate_instance(output_dir, start_week, config=None):
+    """
+    在 output_dir/data/raw/ 下生成一套与 header.py 表头一致的合成原始数据(全部 7 张 Excel 表),
+    结构与真实数据相同: 每个 PN 在每个供应中心由 1~2 个组装厂的若干产线生产, SKU 的需求按 SKU 的需求水平随机波动,
+    部分 SKU 在计划期内无需求、无库存且无在途PO。返回 {表名: 行数}。
+    """
+    config = {**DEFAULT_INSTANCE_CONFIG, **(config or {})}
+    rng = np.random.default_rng(config['seed'])
+
+    year, week = (int(part) for part in start_week.split('W'))
+    start_monday = datetime.date.fromisocalendar(year, week, 1)
+    calendar_mondays = [
+        start_monday + datetime.timedelta(weeks=k)
+        for k in range(-_CALENDAR_MARGIN_WEEKS, config['T'] + _CALENDAR_MARGIN_WEEKS)
+    ]
+    plan_mondays = calendar_mondays[_CALENDAR_MARGIN_WEEKS: _CALENDAR_MARGIN_WEEKS + config['T']]
+
+    supply_centers = [f"SC{i}" for i in range(config['supply_centers'])]
+    factories = [f"F{i}" for i in range(config['factories'])]
+    pns = [f"PN{i}" for i in range(config['pns'])]
+    skus_of_pn = {
+        pn: [f"SKU{i * config['skus_per_pn'] + j}" for j in range(config['skus_per_pn'])] for i, pn in enumerate(pns)
+    }
+
+    tables = {
+        TableName.ANKER_WEEK: _generate_anker_week_table(calendar_mondays),
+        TableName.FACTORY_CAPACITY: _generate_factory_capacity_table(rng, supply_centers, factories, pns),
+        TableName.FACTORY_PRODUCTION_DAYS: _generate_production_days_table(rng, factories, calendar_mondays),
+    }
+    tables.update(_generate_sku_tables(rng, config, supply_centers, factories, skus_of_pn, start_monday, plan_mondays))
+
+    raw_data_paths = generate_excel_data_paths()
+    os.makedirs(os.path.join(output_dir, "data", "raw"), exist_ok=True)
+    for table_name, table in tables.items():
+        table.to_excel(os.path.join(output_dir, raw_data_paths[table_name]), index=False)
+
+    print(f"Synthetic instance {get_instance_name(config)} written to {output_dir}")
+    return {table_name: len(table) for table_name, table in tables.items()}
+
+
+def _week_string(monday):
+    year, week, _ = monday.isocalendar()
+    return f"{year}W{week}"
+
+
+def _generate_anker_week_table(calendar_mondays):
+    return pd.DataFrame({
+        AnkerWeek.ANKER_WEEK_MONTH_DAY: [f"{_week_string(d)}-{d:%m/%d}" for d in calendar_mondays],
+        AnkerWeek.ANKER_WEEK: [_week_string(d) for d in calendar_mondays],
+        AnkerWeek.ANKER_MONTH: [f"{d.year}{d.month:02d}" for d in calendar_mondays],
+    })
+
+
+def _generate_factory_capacity_table(rng, supply_centers, factories, pns):
+    """每个 PN 在每个供应中心由 1~2 个组装厂生产, 每个组装厂有 1~2 类产线"""
+    rows = []
+    for sc in supply_centers:
+        for pn in pns:
+            for factory in rng.choice(factories, size=min(int(rng.integers(1, 3)), len(factories)), replace=False):
+                for line in range(int(rng.integers(1, 3))):
+                    rows.append({
+                        FactoryCapacity.BG: "BG1",
+                        FactoryCapacity.PDT: "PDT1",
+                        FactoryCapacity.PN: pn,
+                        FactoryCapacity.SUPPLY_CENTER: sc,
+                        FactoryCapacity.FACTORY: str(factory),
+                        FactoryCapacity.PRODUCT_LINE: f"L{line}",
+                        FactoryCapacity.UPH: float(rng.integers(5, 50)),
+                        FactoryCapacity.HOURS_PER_SHIFT: 8.0,
+                        FactoryCapacity.SHIFTS_PER_DAY_PER_LINE: 2.0,
+                        FactoryCapacity.AVAILABLE_LINE_COUNT: float(rng.integers(1, 3)),
+                    })
+    return pd.DataFrame(rows)
+
+
+def _generate_production_days_table(rng, factories, calendar_mondays):
+    production_days = rng.integers(0, 7, size=(len(factories), len(calendar_mondays)))
+    table = pd.DataFrame(production_days, columns=[_week_string(d) for d in calendar_mondays])
+    table.insert(0, FactoryProductionDays.FACTORY, factories)
+    return table
+
+
+def _generate_sku_tables(rng, config, supply_centers, factories, skus_of_pn, start_monday, plan_mondays):
+    """生成 SKU 主数据、库存现有量、SOP预测数据和在途PO数据"""
+    sku_rows, inventory_rows, sop_rows, po_rows = [], [], [], []
+    sop_week_columns = [f"{_week_string(d)}-{d:%m/%d}" for d in plan_mondays]
+    horizon_days = 7 * len(plan_mondays)
+
+    for pn, skus in skus_of_pn.items():
+        for sku in skus:
+            for sc in supply_centers:
+                active = rng.random() >= config['inactive_sku_ratio']
+                sku_rows.append({
+                    SKUMain.BG: "BG1",
+                    SKUMain.PDT: "PDT1",
+                    SKUMain.PN: pn,
+                    SKUMain.SKU: sku,
+                    SKUMain.SUPPLY_CENTER: sc,
+                    SKUMain.SLA_S: int(rng.integers(1, 5)),
+                    SKUMain.SAFTY_STOCK_WEEKS: int(rng.integers(0, 4)) if active else 0,
+                    SKUMain.STOCK_OUT_COST: float(rng.integers(1, 5)),
+                    SKUMain.LOSS_SALES_COST: float(rng.integers(10, 50)),
+                    SKUMain.MOQ: int(rng.choice([100, 500])) if rng.random() < config['moq_density'] else 0,
+                })
+
+                demand = np.zeros(len(plan_mondays))
+                if active:
+                    demand_level = rng.lognormal(mean=5.5, sigma=0.6)
+                    nonzero = rng.random(len(plan_mondays)) < config['demand_density']
+                    demand = np.round(nonzero * demand_level * rng.uniform(0.5, 1.5, len(plan_mondays)))
+                    if rng.random() < 0.8:
+                        inventory_rows.append({
+                            CurrentInventory.SUPPLY_CENTER: sc,
+                            CurrentInventory.SKU: sku,
+                            CurrentInventory.QUANTITY: int(rng.integers(0, 4 * demand_level)),
+                        })
+                    for _ in range(int(rng.integers(0, 4))):
+                        po_rows.append({
+                            IntransitPO.SUPPLIER: str(rng.choice(factories)),
+                            IntransitPO.PN: pn,
+                            IntransitPO.SKU: sku,
+                            IntransitPO.INTRANSIT_QUANTITY: int(rng.integers(10, 2 * demand_level + 11)),
+                            IntransitPO.SUPPLY_CENTER: sc,
+                            IntransitPO.REQUIRED_ARRIVAL_TIME: pd.Timestamp(start_monday) + pd.Timedelta(
+                                days=int(rng.integers(-14, horizon_days))
+                            ),
+                        })
+                sop_rows.append({
+                    SOP_PREDICTION.SKU: sku,
+                    SOP_PREDICTION.PN: pn,
+                    SOP_PREDICTION.SUPPLY_CENTER: sc,
+                    **dict(zip(sop_week_columns, demand.astype(float))),
+                })
+
+    return {
+        TableName.CURRENT_INVENTORY: pd.DataFrame(
+            inventory_rows, columns=[CurrentInventory.SUPPLY_CENTER, CurrentInventory.SKU, CurrentInventory.QUANTITY]
+        ),
+        TableName.INTRANSIT_PO: pd.DataFrame(po_rows, columns=[
+            IntransitPO.SUPPLIER, IntransitPO.PN, IntransitPO.SKU, IntransitPO.INTRANSIT_QUANTITY,
+            IntransitPO.SUPPLY_CENTER, IntransitPO.REQUIRED_ARRIVAL_TIME,
+        ]),
+        TableName.SKU_MAIN: pd.DataFrame(sku_rows),
+        TableName.SOP_PREDICTION: pd.DataFrame(sop_rows),
+    }
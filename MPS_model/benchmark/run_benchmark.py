@@ -0,0 +1,187 @@
+import datetime
+import json
+import os
+
+import coptpy
+from coptpy import COPT
+import pandas as pd
+
+from benchmark.instance_generator import DEFAULT_INSTANCE_CONFIG, generate_instance, get_instance_name
+from main import _extract_sub_data
+from models.MPS_model import MPSModel, set_sub_problem_data
+from models.mps_matrix_builder import MPSMatrixBuilder
+from util.data_loader import load_model_params
+from util.profiler import PROFILER
+
+
+# 合成算例和基准测试报告的默认目录, 相对于 MPS_model/
+INSTANCE_DIR = "benchmark/instances"
+REPORT_DIR = "benchmark/reports"
+
+
+class _BuildOnlyModel:
+    """
+    只保存子问题数据的模型, 供 MPSMatrixBuilder 在不创建 COPT 环境(无需求解器许可)的情况下计算矩阵数据。
+    """
+    def __init__(self, supply_center, data, relax_decision_vars, tighten_big_m):
+        self.supply_center = supply_center
+        self.relax_decision_vars = relax_decision_vars
+        self.tighten_big_m = tighten_big_m
+        set_sub_problem_data(self, data)
+
+
+def run_benchmark(instance_configs, start_week="2025W1", build_only=True, build_mode="matrix", tighten_big_m=False,
+                  relax_decision_vars=False, solver_params=None, use_cache=False,
+                  instance_dir=INSTANCE_DIR, report_dir=REPORT_DIR):
+    """
+    依次生成并运行各合成算例, 统计从 DataReader 到 MPSModel 建模(和求解)各阶段的耗时, 写出 CSV 和 JSON 报告。
+    build_only 为 True 时只由 MPSMatrixBuilder 计算各供应中心的矩阵数据, 不创建 COPT 环境, 无需求解器许可;
+    否则按 build_mode 构建 MPSModel 并求解。返回 (CSV 路径, JSON 路径)。
+    """
+    instance_dir = os.path.abspath(instance_dir)
+    report_dir = os.path.abspath(report_dir)
+    settings = {
+        'start_week': start_week,
+        'build_only': build_only,
+        'build_mode': "matrix" if build_only else build_mode,
+        'tighten_big_m': tighten_big_m,
+        'relax_decision_vars': relax_decision_vars,
+        'solver_params': solver_params or {},
+        'use_cache': use_cache,
+    }
+
+    results = [
+        _run_instance({**DEFAULT_INSTANCE_CONFIG, **config}, instance_dir, settings) for config in instance_configs
+    ]
+    return _write_report(results, settings, report_dir)
+
+
+def _run_instance(config, instance_dir, settings):
+    """生成单个算例并运行数据预处理、建模(和求解), 返回该算例的参数、模型规模和各阶段统计"""
+    name = get_instance_name(config)
+    work_dir = os.path.join(instance_dir, name)
+    PROFILER.reset()
+    with PROFILER.stage("benchmark.generate_instance") as record:
+        record['rows'] = sum(generate_instance(work_dir, settings['start_week'], config).values())
+
+    # 数据读取、缓存和输出路径均相对于当前目录, 在算例目录下运行
+    original_dir = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        model_params_cls = load_model_params(
+            settings['start_week'], config['T'], use_cache=settings['use_cache'], export_mode="off"
+        )[0]
+        models = {}
+        env = None
+        if not settings['build_only']:
+            env = coptpy.Envr()
+        for sc in model_params_cls.supply_center_set:
+            sub_data = _extract_sub_data(model_params_cls, sc)
+            if settings['build_only']:
+                models[sc] = _build_arrays_only(sc, sub_data, settings)
+            else:
+                models[sc] = _build_and_solve(env, sc, sub_data, settings)
+    finally:
+        os.chdir(original_dir)
+
+    records = PROFILER.get_records()
+    stage_totals = {}
+    for record in records:
+        stage = record['stage'].split('[')[0]
+        stage_totals[stage] = round(stage_totals.get(stage, 0) + record['wall_time_s'], 6)
+    print(f"Benchmark {name}: " + ", ".join(f"{stage} {wall_time:.3f}s" for stage, wall_time in stage_totals.items()))
+
+    return {
+        'name': name,
+        'config': config,
+        'models': models,
+        'stage_totals': stage_totals,
+        'total_wall_time_s': round(sum(record['wall_time_s'] for record in records), 6),
+        'stages': records,
+    }
+
+
+def _build_arrays_only(supply_center, sub_data, settings):
+    """只计算矩阵数据, 返回模型规模"""
+    with PROFILER.stage(f"MPSMatrixBuilder.build_arrays[{supply_center}]") as record:
+        builder = MPSMatrixBuilder(_BuildOnlyModel(
+            supply_center, sub_data, settings['relax_decision_vars'], settings['tighten_big_m']
+        ))
+        arrays = builder.build_arrays()
+        record['rows'] = len(arrays['constr_names'])
+        record['cols'] = len(arrays['var_names'])
+        record['nnz'] = arrays['A'].nnz
+    return {'rows': record['rows'], 'cols': record['cols'], 'nnz': record['nnz']}
+
+
+def _build_and_solve(env, supply_center, sub_data, settings):
+    """构建 MPSModel 并求解, 返回模型规模和求解结果"""
+    model = MPSModel(
+        env, supply_center, sub_data, params=settings['solver_params'],
+        relax_decision_vars=settings['relax_decision_vars'], build_mode=settings['build_mode'],
+        tighten_big_m=settings['tighten_big_m']
+    )
+    model.solve(save_model=False)
+    return {
+        'rows': model.model.getAttr(COPT.Attr.Rows),
+        'cols': model.model.getAttr(COPT.Attr.Cols),
+        'nnz': model.model.getAttr(COPT.Attr.Elems),
+        'status': model.model.status,
+        'objective_value': model.model.objval if model.model.getAttr(COPT.Attr.HasMipSol) else None,
+    }
+
+
+def _write_report(results, settings, report_dir):
+    """
+    写出基准测试报告: CSV 每行为一个算例的一个阶段, JSON 包含运行设置、各算例的参数、模型规模、按阶段汇总的耗时和完整阶段统计。
+    """
+    current_time = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    os.makedirs(report_dir, exist_ok=True)
+    csv_file_name = os.path.join(report_dir, f"benchmark_{current_time}.csv")
+    json_file_name = os.path.join(report_dir, f"benchmark_{current_time}.json")
+
+    rows = []
+    for result in results:
+        for record in result['stages']:
+            rows.append({
+                'instance': result['name'],
+                **result['config'],
+                'stage': record['stage'],
+                'wall_time_s': record['wall_time_s'],
+                'cpu_time_s': record['cpu_time_s'],
+                'peak_rss_delta_mb': record['peak_rss_delta_mb'],
+                'rows': record['rows'],
+            })
+    pd.DataFrame(rows).to_csv(csv_file_name, index=False)
+
+    with open(json_file_name, 'w', encoding='utf-8') as f:
+        json.dump({
+            'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'settings': settings,
+            'instances': results,
+        }, f, ensure_ascii=False, indent=2, default=str)
+
+    print(f"Benchmark report written to {csv_file_name} and {json_file_name}")
+    return csv_file_name, json_file_name
+
+
+if __name__ == "__main__":
+
+    args = {
+        "instance_configs": [           # 各算例参数, 缺省项取 DEFAULT_INSTANCE_CONFIG
+            {"supply_centers": 2, "factories": 4, "pns": 6, "skus_per_pn": 3},
+            {"supply_centers": 4, "factories": 8, "pns": 30, "skus_per_pn": 4},
+            {"supply_centers": 8, "factories": 16, "pns": 100, "skus_per_pn": 5, "T": 52},
+        ],
+        "start_week": "2025W1",         # 起始周
+        "build_only": True,             # 是否只计算模型矩阵数据而不创建 COPT 环境和求解, 无需求解器许可
+        "build_mode": "matrix",         # build_only 为 False 时的模型构建方式: "expression" 或 "matrix"
+        "tighten_big_m": True,          # 是否收紧大 M
+        "relax_decision_vars": False,   # 是否将决策变量放松为连续变量
+        "solver_params": {              # build_only 为 False 时的求解器参数
+            'TimeLimit': 60
+        },
+        "use_cache": False,             # 是否使用清洗后原始数据表的缓存, 关闭时每次都计入读取 Excel 的耗时
+    }
+
+    run_benchmark(**args)
@@ -1,20 +1,54 @@
 from util.header import *
+from util.profiler import PROFILER, count_rows
+from util.table_schema import TABLE_SCHEMAS
+from concurrent.futures import ProcessPoolExecutor
+import glob
+import hashlib
 import os
+import time
 import pandas as pd
 
 
+# 清洗结果缓存目录及版本号, 修改清洗逻辑后需递增版本号使旧缓存失效
+CACHE_DIR = "./data/cache"
+CACHE_VERSION = 2
+
+
 class DataReader:
-    def __init__(self):
+    def __init__(self, use_cache=True, num_workers=1):
         """
         初始化DataReader对象, 生成原始数据路径字典, 读取原始数据, 并进行初步清洗。
         处理逻辑：
-        1. 生成各表Excel路径;
-        2. 读取所有原始数据表为DataFrame;
-        3. 对各表进行初步清洗（去重、去空、格式处理等）。
+        1. 生成各表Excel路径, 并计算各文件内容的哈希值;
+        2. 若启用缓存, 优先从缓存目录读取清洗后的表格(Parquet格式);
+        3. 按 TABLE_SCHEMAS 只读取所需列并指定列类型, 读取未命中缓存的原始数据表为DataFrame并校验所需列是否存在,
+           num_workers > 1 时使用进程池并行读取;
+        4. 对这些表进行初步清洗（去重、去空、格式处理等）, 并写入缓存。
         """
+        self._use_cache = use_cache
+        self._num_workers = num_workers
         self._excel_data_paths_dict = self._generate_excel_data_paths()
-        self._data_dict = self._read_raw_data()
-        self._init_clean()
+        self._file_digests_dict = self._compute_file_digests()
+
+        with PROFILER.stage("DataReader.load_cached_data") as record:
+            cached_data_dict = self._load_cached_data() if use_cache else {}
+            record['rows'] = count_rows(cached_data_dict)
+        missed_table_names = [name for name in self._excel_data_paths_dict if name not in cached_data_dict]
+
+        with PROFILER.stage("DataReader.read_raw_data") as record:
+            self._data_dict = self._read_raw_data(missed_table_names)
+            record['rows'] = count_rows(self._data_dict)
+        with PROFILER.stage("DataReader.init_clean") as record:
+            self._init_clean(missed_table_names)
+            record['rows'] = count_rows(self._data_dict)
+        if use_cache:
+            with PROFILER.stage("DataReader.save_data_to_cache") as record:
+                self._save_data_to_cache(missed_table_names)
+                record['rows'] = count_rows(self._data_dict)
+
+        # 保持与路径字典一致的表顺序
+        self._data_dict.update(cached_data_dict)
+        self._data_dict = {name: self._data_dict[name] for name in self._excel_data_paths_dict}
 
     def get_excel_data_paths_dict(self):
         """
@@ -28,46 +62,125 @@ class DataReader:
         """
         return self._data_dict
 
+    def get_file_digests_dict(self):
+        """
+        获取各原始Excel文件内容哈希值的字典。
+        """
+        return self._file_digests_dict
+
     def _generate_excel_data_paths(self):
         """
         生成原始数据各表的Excel文件路径字典。
         """
-        base_dir = "./data/raw"
-        
-        excel_data_paths_dict = {}
-        def get_full_path(file_name):
-            file_name = ''.join((file_name, '.xlsx'))
-            return os.path.join(base_dir, file_name)
-        
-        excel_data_paths_dict[TableName.ANKER_WEEK] = get_full_path(TableName.ANKER_WEEK)
-        excel_data_paths_dict[TableName.FACTORY_CAPACITY] = get_full_path(TableName.FACTORY_CAPACITY)
-        excel_data_paths_dict[TableName.FACTORY_PRODUCTION_DAYS] = get_full_path(TableName.FACTORY_PRODUCTION_DAYS)
-        excel_data_paths_dict[TableName.CURRENT_INVENTORY] = get_full_path(TableName.CURRENT_INVENTORY)
-        excel_data_paths_dict[TableName.INTRANSIT_PO] = get_full_path(TableName.INTRANSIT_PO)
-        excel_data_paths_dict[TableName.SKU_MAIN] = get_full_path(TableName.SKU_MAIN)
-        excel_data_paths_dict[TableName.SOP_PREDICTION] = get_full_path(TableName.SOP_PREDICTION)
+        return generate_excel_data_paths()
+
+
+    def _compute_file_digests(self):
+        """
+        计算各原始Excel文件内容的SHA-256哈希值, 作为缓存键。文件内容变化时缓存自动失效。
+        """
+        file_digests_dict = {}
+        for table_name, table_path in self._excel_data_paths_dict.items():
+            file_digests_dict[table_name] = compute_file_digest(table_path)
+
+        return file_digests_dict
+
+
+    def _get_cache_path(self, table_name):
+        """
+        生成表格缓存文件路径, 文件名包含缓存版本号和原始文件哈希值。
+        """
+        digest = self._file_digests_dict[table_name]
+        return os.path.join(CACHE_DIR, f"{table_name}_v{CACHE_VERSION}_{digest[:16]}.parquet")
+
+
+    def _load_cached_data(self):
+        """
+        读取命中缓存的清洗后数据表, 返回数据字典。未命中或读取失败的表不在返回结果中。
+        """
+        cached_data_dict = {}
+        for table_name in self._excel_data_paths_dict:
+            cache_path = self._get_cache_path(table_name)
+            if not os.path.exists(cache_path):
+                print(f"Cache miss: {table_name}")
+                continue
+            try:
+                cached_data_dict[table_name] = pd.read_parquet(cache_path)
+                print(f"Cache hit: {table_name} <- {cache_path}")
+            except Exception as e:
+                print(f"Cache miss: {table_name} (failed to read {cache_path}: {e})")
 
-        return excel_data_paths_dict
+        print(f"Data cache: {len(cached_data_dict)} hits, {len(self._excel_data_paths_dict) - len(cached_data_dict)} misses.")
+        return cached_data_dict
 
 
-    def _read_raw_data(self):
+    def _save_data_to_cache(self, table_names):
+        """
+        将清洗后的数据表写入缓存目录, 并删除同一表格的旧缓存文件。写入失败时仅提示, 不影响后续流程。
         """
-        读取所有原始Excel数据表, 返回数据字典。
+        if not table_names:
+            return
+        os.makedirs(CACHE_DIR, exist_ok=True)
+
+        for table_name in table_names:
+            cache_path = self._get_cache_path(table_name)
+            for stale_path in glob.glob(os.path.join(CACHE_DIR, f"{table_name}_v*.parquet")):
+                if stale_path != cache_path:
+                    os.remove(stale_path)
+            try:
+                self._data_dict[table_name].to_parquet(cache_path)
+            except Exception as e:
+                # 例如未安装 pyarrow, 或列中混有无法序列化的类型
+                if os.path.exists(cache_path):
+                    os.remove(cache_path)
+                print(f"Failed to cache {table_name}: {e}")
+
+
+    def _read_raw_data(self, table_names):
         """
+        读取指定的原始Excel数据表, 返回数据字典。
+        各表相互独立, num_workers > 1 时按文件大小从大到小提交至进程池并行解析, 总耗时约等于最大文件的解析时间。
+        每个工作簿只打开一次, 表头校验在读取进程中完成, 任一表缺少所需列时抛出 ValueError。
+        """
+        table_names = sorted(table_names, key=lambda name: os.path.getsize(self._excel_data_paths_dict[name]), reverse=True)
+        num_workers = min(self._num_workers, len(table_names))
+
+        start_time = time.perf_counter()
+        if num_workers > 1:
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                futures = [
+                    executor.submit(_read_excel_table, table_name, self._excel_data_paths_dict[table_name])
+                    for table_name in table_names
+                ]
+                results = [future.result() for future in futures]
+        else:
+            results = [
+                _read_excel_table(table_name, self._excel_data_paths_dict[table_name])
+                for table_name in table_names
+            ]
+
         _data_dict = {}
-        for table_name, table_path in self._excel_data_paths_dict.items():
-            _data_dict[table_name] = pd.read_excel(table_path)
+        for table_name, df, elapsed in results:
+            _data_dict[table_name] = df
+            print(f"Loaded {table_name}: {len(df)} rows in {elapsed:.2f}s")
 
+        if results:
+            print(f"Loaded {len(results)} tables with {max(num_workers, 1)} worker(s) in {time.perf_counter() - start_time:.2f}s")
         return _data_dict
     
 
-    def _init_clean(self):
-        self._init_clean_capacity()  # 清洗工厂产能数据表
-        self._init_clean_schedule()  # 清洗工厂生产日历数据表
-        self._init_clean_current_inventory()  # 清洗当前库存数据表
-        self._init_clean_intransit_PO()  # 清洗在途采购订单数据表
-        self._init_clean_sku_main()  # 清洗SKU主数据表
-        self._init_clean_SOP()  # 清洗SOP预测数据表
+    def _init_clean(self, table_names):
+        clean_funcs = {
+            TableName.FACTORY_CAPACITY: self._init_clean_capacity,  # 清洗工厂产能数据表
+            TableName.FACTORY_PRODUCTION_DAYS: self._init_clean_schedule,  # 清洗工厂生产日历数据表
+            TableName.CURRENT_INVENTORY: self._init_clean_current_inventory,  # 清洗当前库存数据表
+            TableName.INTRANSIT_PO: self._init_clean_intransit_PO,  # 清洗在途采购订单数据表
+            TableName.SKU_MAIN: self._init_clean_sku_main,  # 清洗SKU主数据表
+            TableName.SOP_PREDICTION: self._init_clean_SOP,  # 清洗SOP预测数据表
+        }
+        for table_name, clean_func in clean_funcs.items():
+            if table_name in table_names:
+                clean_func()
 
 
     def _init_clean_capacity(self):
@@ -168,8 +281,62 @@ class DataReader:
 
         date_columns = [col for col in sop_df.columns if col.startswith('20') and 'W' in col]
         sop_df['non_zero_count'] = (sop_df[date_columns] != 0).sum(axis=1)
-        sop_df = sop_df.loc[sop_df.groupby([SOP_PREDICTION.SKU, SOP_PREDICTION.SUPPLY_CENTER])['non_zero_count'].idxmax()]
+        sop_df = sop_df.loc[sop_df.groupby([SOP_PREDICTION.SKU, SOP_PREDICTION.SUPPLY_CENTER], observed=True)['non_zero_count'].idxmax()]
         sop_df = sop_df.drop(columns=['non_zero_count'])
         
         self._data_dict[TableName.SOP_PREDICTION] = sop_df
 
+
+
+
+def _read_excel_table(table_name, table_path):
+    """
+    按 TABLE_SCHEMAS 读取单个Excel表格、校验所需列并计时。定义在模块层级, 以便进程池序列化调用。
+    """
+    start_time = time.perf_counter()
+    schema = TABLE_SCHEMAS[table_name]
+    df = schema.check_columns(pd.read_excel(table_path, **schema.get_read_kwargs()))
+    return table_name, df, time.perf_counter() - start_time
+
+
+def compute_file_digest(file_path, chunk_size=1 << 20):
+    """
+    分块计算文件内容的SHA-256哈希值。
+    """
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def generate_excel_data_paths():
+    """
+    生成原始数据各表的Excel文件路径字典。
+    """
+    base_dir = "./data/raw"
+    
+    excel_data_paths_dict = {}
+    def get_full_path(file_name):
+        file_name = ''.join((file_name, '.xlsx'))
+        return os.path.join(base_dir, file_name)
+    
+    excel_data_paths_dict[TableName.ANKER_WEEK] = get_full_path(TableName.ANKER_WEEK)
+    excel_data_paths_dict[TableName.FACTORY_CAPACITY] = get_full_path(TableName.FACTORY_CAPACITY)
+    excel_data_paths_dict[TableName.FACTORY_PRODUCTION_DAYS] = get_full_path(TableName.FACTORY_PRODUCTION_DAYS)
+    excel_data_paths_dict[TableName.CURRENT_INVENTORY] = get_full_path(TableName.CURRENT_INVENTORY)
+    excel_data_paths_dict[TableName.INTRANSIT_PO] = get_full_path(TableName.INTRANSIT_PO)
+    excel_data_paths_dict[TableName.SKU_MAIN] = get_full_path(TableName.SKU_MAIN)
+    excel_data_paths_dict[TableName.SOP_PREDICTION] = get_full_path(TableName.SOP_PREDICTION)
+
+    return excel_data_paths_dict
+
+
+def compute_raw_data_digests():
+    """
+    计算各原始Excel文件内容的SHA-256哈希值字典, 无需读取数据即可判断原始数据是否变化。
+    """
+    return {
+        table_name: compute_file_digest(table_path)
+        for table_name, table_path in generate_excel_data_paths().items()
+    }
@@ -0,0 +1,76 @@
+from util.header import *
+import pandas as pd
+
+
+class WeekCapacityEngine:
+    """
+    周产能计算: 将产线级小时产能(UPH × 班次时长 × 班次数 × 产线数)与工厂生产天数矩阵广播相乘,
+    再按 (PN, 供应中心, 组装厂) 一次分组求和, 汇总各产线类别的产能, 结果为下游使用的 WEEK_CAPACITY 表。
+    """
+    def __init__(self, factory_capacity_df, factory_schedule_df, duration):
+        self._week_cols = [
+            col for col in factory_schedule_df.columns
+            if isinstance(col, str) and col.startswith('20') and col in duration
+        ]
+
+        line_capacity_df = self._compute_line_week_capacity(factory_capacity_df, factory_schedule_df)
+        self._week_capacity_df = self._sum_line_capacities(line_capacity_df)
+
+
+    def get_week_capacity_df(self):
+        """
+        获取汇总后的周产能表, 列为 BG、PDT、PN、供应中心、组装厂及计划周期内的各周。
+        """
+        return self._week_capacity_df
+
+
+    def _compute_line_week_capacity(self, factory_capacity_df, factory_schedule_df):
+        """
+        计算每条产线在计划周期内每周的产能。只保留在生产天数表中存在的工厂(等价于内连接)。
+        """
+        assert FactoryCapacity.FACTORY == FactoryProductionDays.FACTORY
+
+        schedule_factories = pd.Index(factory_schedule_df[FactoryProductionDays.FACTORY].astype(object))
+        production_days = factory_schedule_df[self._week_cols].to_numpy(dtype=float)  # Shape: (num_factories, num_weeks)
+
+        schedule_positions = schedule_factories.get_indexer(factory_capacity_df[FactoryCapacity.FACTORY].astype(object))
+        matched = schedule_positions >= 0
+        line_df = factory_capacity_df[matched]
+
+        # 产线每天产能, Shape: (num_lines,)
+        daily_rate = (
+            line_df[FactoryCapacity.UPH] *
+            line_df[FactoryCapacity.HOURS_PER_SHIFT] *
+            line_df[FactoryCapacity.SHIFTS_PER_DAY_PER_LINE] *
+            line_df[FactoryCapacity.AVAILABLE_LINE_COUNT]
+        ).to_numpy(dtype=float)
+        line_week_capacity = daily_rate[:, None] * production_days[schedule_positions[matched]]
+
+        line_capacity_df = line_df[[
+            FactoryCapacity.BG, FactoryCapacity.PDT, FactoryCapacity.PN, FactoryCapacity.SUPPLY_CENTER,
+            FactoryCapacity.FACTORY, FactoryCapacity.PRODUCT_LINE
+        ]].reset_index(drop=True)
+        line_capacity_df = pd.concat(
+            [line_capacity_df, pd.DataFrame(line_week_capacity, columns=self._week_cols)], axis=1
+        )
+
+        # Check whether the week capacity is duplicated
+        duplicate_rows = line_capacity_df.duplicated(subset=[
+            WeekCapacity.PN, WeekCapacity.SUPPLY_CENTER, WeekCapacity.FACTORY, WeekCapacity.PRODUCT_LINE
+            ], keep=False)
+        assert not duplicate_rows.any()
+
+        return line_capacity_df
+
+
+    def _sum_line_capacities(self, line_capacity_df):
+        """
+        按 (PN, 供应中心, 组装厂) 分组对各产线类别的周产能求和, BG 和 PDT 取组内首行的值。
+        """
+        group_keys = [WeekCapacity.PN, WeekCapacity.SUPPLY_CENTER, WeekCapacity.FACTORY]
+        aggregations = {WeekCapacity.BG: 'first', WeekCapacity.PDT: 'first'}
+        aggregations.update({week: 'sum' for week in self._week_cols})
+
+        week_capacity_df = line_capacity_df.groupby(group_keys, observed=True, sort=True).agg(aggregations).reset_index()
+
+        return week_capacity_df[[WeekCapacity.BG, WeekCapacity.PDT] + group_keys + self._week_cols]
@@ -1,22 +1,31 @@
 from util.header import *
+from data_processor.capacity_engine import WeekCapacityEngine
+from data_processor.week_calendar import WeekCalendar
+from util.data_exporter import export_modified_data
+from util.profiler import PROFILER, count_rows
 import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
-import os
-import re
 
 
 class DataModifier:
-    def __init__(self, data_dict, start_week: str, T: int):
+    def __init__(self, data_dict, start_week: str, T: int, export_mode="excel", supply_centers=None):
         """
         初始化DataModifier对象, 设置数据字典、起始周、计划周期等, 执行数据编辑流程。
+        export_mode 控制编辑后表格的导出格式: "off" 不导出, "parquet" 或 "excel"。
+        supply_centers 为需要保留的供应中心列表, 为 None 时保留全部供应中心。
         """
         self._data_dict = data_dict
         self._start_week = start_week  # E.g.: "2025W1"
         self._time_span = T
+        self._export_mode = export_mode
+        self._supply_centers = supply_centers
 
-        self._duration = self._generate_week_schedule()
-        self._generate_real_date_to_anker_week_mapping()
+        # 安克周日历只构建一次, 供所有日期和周字符串的转换步骤共用
+        with PROFILER.stage("DataModifier.build_week_calendar") as record:
+            self._week_calendar = WeekCalendar(self._data_dict[TableName.ANKER_WEEK], start_week, T)
+            record['rows'] = len(self._week_calendar.get_anker_week_table())
+        self._data_dict[TableName.ANKER_WEEK] = self._week_calendar.get_anker_week_table()
+        self._duration = self._week_calendar.get_plan_duration()
 
         self._modify_data_dict()
         self._save_modified_data_dict()
@@ -41,42 +50,46 @@ class DataModifier:
         获取计划的周数列表。
         """
         return self._duration
+
+
+    def get_week_calendar(self):
+        """
+        获取安克周日历。
+        """
+        return self._week_calendar
     
 
     def _save_modified_data_dict(self):
         """
-        将处理后的数据字典保存为Excel文件到指定目录。
+        按导出模式将处理后的数据字典保存到指定目录。写入在后台线程中进行, 不阻塞后续的模型参数生成和建模。
         """
-        data_dict = self._data_dict
         base_dir = "./data/modified"
-        for supply_center, data in data_dict.items():
-            supply_center_dir = os.path.join(base_dir, supply_center)
-            if not os.path.exists(supply_center_dir):
-                os.makedirs(supply_center_dir)
-
-            for table_name, df in data.items():
-                file_path = os.path.join(supply_center_dir, f"{table_name}.xlsx")
-                df.to_excel(file_path, index=False)
-        
-        print(f"Modified data saved to {base_dir}.")
+        export_modified_data(self._data_dict, base_dir, self._export_mode)
 
 
     def _modify_data_dict(self):
-        # 由于 SKU 主数据表中没有运输 SLA: SLA_T 列，临时添加一列全 1 的数据作为运输 SLA
-        self._add_SLA_T_to_sku_main_table()
-
-        self._generate_week_capacity_within_duration()
-        self._sum_capacities_of_each_factory()
-        self._split_data_by_supply_center()
-        self._filter_valid_skus()
-        self._fill_MOQ_to_sku_main()
-        self._merge_current_inventory_into_sku_main()
-        self._remove_unmatched_skus_in_po_df()
-        self._generate_arrival_week_quantity_to_PO_table()
-        self._add_model_week_col_to_PO_table()
-        self._add_capacity_occupied_week_to_PO_table()
-        self._filter_demand_out_of_time_span()
-        self._update_required_inventory_level_to_sop_prediction_table()
+        modify_steps = [
+            # 由于 SKU 主数据表中没有运输 SLA: SLA_T 列，临时添加一列全 1 的数据作为运输 SLA
+            self._add_SLA_T_to_sku_main_table,
+
+            self._generate_week_capacity_table,
+            self._split_data_by_supply_center,
+            self._filter_valid_skus,
+            self._fill_MOQ_to_sku_main,
+            self._merge_current_inventory_into_sku_main,
+            self._remove_unmatched_skus_in_po_df,
+            self._generate_arrival_week_quantity_to_PO_table,
+            self._add_model_week_col_to_PO_table,
+            self._add_capacity_occupied_week_to_PO_table,
+            self._filter_demand_out_of_time_span,
+            self._update_required_inventory_level_to_sop_prediction_table,
+        ]
+
+        # 逐步执行并记录各步骤的耗时、内存和输出行数
+        for modify_step in modify_steps:
+            with PROFILER.stage(f"DataModifier.{modify_step.__name__.lstrip('_')}") as record:
+                modify_step()
+                record['rows'] = count_rows(self._data_dict)
 
 
     # 由于 SKU 主数据表中没有 SLA_T 列，临时添加一列全 1 的数据作为运输 SLA
@@ -86,100 +99,71 @@ class DataModifier:
         self._data_dict[TableName.SKU_MAIN] = sku_df
 
 
-    def _generate_week_capacity_within_duration(self):
+    def _generate_week_capacity_table(self):
         """
-        计算每条产线在计划周期内每周的产能, 并生成 WEEK_CAPACITY 表。
+        计算每个工厂对每个PN在计划周期内每周的总产能(跨产线求和), 生成 WEEK_CAPACITY 表。
         """
-        factory_capacity_df = self._data_dict[TableName.FACTORY_CAPACITY]
-        factory_schedule_df = self._data_dict[TableName.FACTORY_PRODUCTION_DAYS]
-
-        kept_cols = [col for col in factory_schedule_df.columns if (col.startswith('20') and col in self._duration) or not col.startswith('20')]
-        factory_schedule_df = factory_schedule_df[kept_cols]
-
-        assert FactoryCapacity.FACTORY == FactoryProductionDays.FACTORY
-        capacity_schedule_merged_df = factory_capacity_df.merge(factory_schedule_df, on=FactoryCapacity.FACTORY, how='inner')
-
-        week_capacity_df = capacity_schedule_merged_df[
-            [FactoryCapacity.BG, FactoryCapacity.PDT, FactoryCapacity.PN, FactoryCapacity.SUPPLY_CENTER, FactoryCapacity.FACTORY, FactoryCapacity.PRODUCT_LINE]
-            ].copy()
-
-        weeks = [col for col in factory_schedule_df.columns if col.startswith('20')]
-        for week in weeks:            
-            week_capacity_df[week] = capacity_schedule_merged_df[FactoryCapacity.UPH] * \
-                            capacity_schedule_merged_df[FactoryCapacity.HOURS_PER_SHIFT] * \
-                            capacity_schedule_merged_df[FactoryCapacity.SHIFTS_PER_DAY_PER_LINE] * \
-                            capacity_schedule_merged_df[FactoryCapacity.AVAILABLE_LINE_COUNT] * \
-                            capacity_schedule_merged_df[week]
-
-        # Check whether the week capacity is duplicated
-        duplicate_rows = week_capacity_df.duplicated(subset=[
-            WeekCapacity.PN, WeekCapacity.SUPPLY_CENTER, WeekCapacity.FACTORY, WeekCapacity.PRODUCT_LINE
-            ], keep=False)
-        assert len(duplicate_rows[duplicate_rows != False].index.tolist()) == 0
-
-        self._data_dict[TableName.WEEK_CAPACITY] = week_capacity_df
+        self._week_capacity_engine = WeekCapacityEngine(
+            self._data_dict[TableName.FACTORY_CAPACITY],
+            self._data_dict[TableName.FACTORY_PRODUCTION_DAYS],
+            self._duration
+        )
+        self._data_dict[TableName.WEEK_CAPACITY] = self._week_capacity_engine.get_week_capacity_df()
 
 
-    def _sum_capacities_of_each_factory(self):
+    def _split_data_by_supply_center(self):
         """
-        汇总每个工厂对每个PN的总产能(跨产线求和), 并更新WEEK_CAPACITY表。
+        按供应中心拆分数据字典中的各个表格。
+        每个表格只分组一次, 各供应中心的子表为按供应中心排序后表格的连续行切片, 而非逐个供应中心布尔筛选得到的副本。
         """
-        week_capacity_df = self._data_dict[TableName.WEEK_CAPACITY]
-
-        factory_capacity_df = pd.DataFrame()
-        grouped = week_capacity_df.groupby([WeekCapacity.PN, WeekCapacity.SUPPLY_CENTER, WeekCapacity.FACTORY])
-        for _, group in grouped:
-            group_copy = group.copy()
-            week_cols = [col for col in group.columns if col.startswith('20')]
-            for week in week_cols:
-                group_copy[week] = group[week].sum()
-            factory_capacity_df = pd.concat([factory_capacity_df, group_copy])
-
-        factory_capacity_df = factory_capacity_df.drop_duplicates(subset=[WeekCapacity.PN, WeekCapacity.SUPPLY_CENTER, WeekCapacity.FACTORY])
-        factory_capacity_df = factory_capacity_df.drop(columns=[WeekCapacity.PRODUCT_LINE])
+        # SKU主数据决定供应中心集合
+        sku_main_df = self._data_dict[TableName.SKU_MAIN]
+        supply_center_set = list(sku_main_df[SKUMain.SUPPLY_CENTER].unique())
+        if self._supply_centers is not None:
+            unknown_supply_centers = [sc for sc in self._supply_centers if sc not in supply_center_set]
+            if unknown_supply_centers:
+                raise ValueError(f"Unknown supply centers: {unknown_supply_centers}")
+            supply_center_set = list(self._supply_centers)
+
+        supply_center_cols = {
+            TableName.SKU_MAIN: SKUMain.SUPPLY_CENTER,  # SKU主数据
+            TableName.WEEK_CAPACITY: WeekCapacity.SUPPLY_CENTER,  # 工厂周产能数据
+            TableName.CURRENT_INVENTORY: CurrentInventory.SUPPLY_CENTER,  # 库存现有量
+            TableName.INTRANSIT_PO: IntransitPO.SUPPLY_CENTER,  # 在途PO数据
+            TableName.SOP_PREDICTION: SOP_PREDICTION.SUPPLY_CENTER,  # SOP预测数据
+        }
+
+        splited_data_dict = {supply_center: {} for supply_center in supply_center_set}
+        for table_name, supply_center_col in supply_center_cols.items():
+            df = self._data_dict[table_name]
+            partitions = self._partition_by_column(df, supply_center_col)
+            for supply_center in supply_center_set:
+                splited_data_dict[supply_center][table_name] = partitions.get(supply_center, df.iloc[0:0])
 
-        self._data_dict[TableName.WEEK_CAPACITY] = factory_capacity_df
+        self._data_dict = splited_data_dict
 
 
-    def _split_data_by_supply_center(self):
+    @staticmethod
+    def _partition_by_column(df, col):
         """
-        按供应中心拆分数据字典中的各个表格。
+        按列值将表格一次性分组, 返回 {列值: 子表}。
+        先按分组顺序重排一次行(组内保持原有行序), 各子表为重排后表格的连续行切片。
         """
-        splited_data_dict = {}
+        group_positions = df.groupby(col, observed=True, sort=False).indices
+        if not group_positions:
+            return {}
 
-        # SKU主数据
-        sku_main_df = self._data_dict[TableName.SKU_MAIN]
-        supply_center_set = list(sku_main_df[SKUMain.SUPPLY_CENTER].unique())
+        order = np.concatenate(list(group_positions.values()))
+        grouped_df = df.take(order)
 
-        for supply_center in supply_center_set:
-            sku_in_one_supply_center_df = sku_main_df[sku_main_df[SKUMain.SUPPLY_CENTER] == supply_center]
-            splited_data_dict[supply_center] = {TableName.SKU_MAIN: sku_in_one_supply_center_df}
-        
-        # 工厂周产能数据
-        week_capacity_df = self._data_dict[TableName.WEEK_CAPACITY]
-        for supply_center in supply_center_set:
-            week_capacity_df_in_one_supply_center = week_capacity_df[week_capacity_df[WeekCapacity.SUPPLY_CENTER] == supply_center]
-            splited_data_dict[supply_center][TableName.WEEK_CAPACITY] = week_capacity_df_in_one_supply_center
-
-        # 库存现有量
-        current_inventory_df = self._data_dict[TableName.CURRENT_INVENTORY]
-        for supply_center in supply_center_set:
-            current_inventory_df_in_one_supply_center = current_inventory_df[current_inventory_df[CurrentInventory.SUPPLY_CENTER] == supply_center]
-            splited_data_dict[supply_center][TableName.CURRENT_INVENTORY] = current_inventory_df_in_one_supply_center
-
-        # 在途PO数据
-        intransit_po_df = self._data_dict[TableName.INTRANSIT_PO]
-        for supply_center in supply_center_set:
-            intransit_po_df_in_one_supply_center = intransit_po_df[intransit_po_df[IntransitPO.SUPPLY_CENTER] == supply_center]
-            splited_data_dict[supply_center][TableName.INTRANSIT_PO] = intransit_po_df_in_one_supply_center
-
-        # SOP预测数据
-        sop_prediction_df = self._data_dict[TableName.SOP_PREDICTION]
-        for supply_center in supply_center_set:
-            sop_prediction_df_in_one_supply_center = sop_prediction_df[sop_prediction_df[SOP_PREDICTION.SUPPLY_CENTER] == supply_center]
-            splited_data_dict[supply_center][TableName.SOP_PREDICTION] = sop_prediction_df_in_one_supply_center
+        partitions = {}
+        start = 0
+        for key, positions in group_positions.items():
+            stop = start + len(positions)
+            partitions[key] = grouped_df.iloc[start:stop]
+            start = stop
 
-        self._data_dict = splited_data_dict
+        return partitions
 
 
     def _filter_valid_skus(self):
@@ -278,7 +262,7 @@ class DataModifier:
         for supply_center, data in data_dict.items():
             PO_df = data[TableName.INTRANSIT_PO]
             PO_df[IntransitPO.REQUIRED_ARRIVAL_TIME] = pd.to_datetime(PO_df[IntransitPO.REQUIRED_ARRIVAL_TIME])
-            PO_df[IntransitPO.REQUIRED_ARRIVAL_WEEK] = PO_df[IntransitPO.REQUIRED_ARRIVAL_TIME].apply(lambda x: self._map_date_to_anker_week(x))
+            PO_df[IntransitPO.REQUIRED_ARRIVAL_WEEK] = self._week_calendar.map_dates_to_anker_weeks(PO_df[IntransitPO.REQUIRED_ARRIVAL_TIME])
             
             # 过滤不在计划周期内到达的 PO 单
             PO_df = PO_df[PO_df[IntransitPO.REQUIRED_ARRIVAL_WEEK].isin(self._duration)]
@@ -296,7 +280,7 @@ class DataModifier:
         for supply_center, data in data_dict.items():
             PO_df = data[TableName.INTRANSIT_PO]
             arrival_anker_weeks = PO_df[IntransitPO.REQUIRED_ARRIVAL_WEEK]
-            arrival_model_weeks = self._map_anker_week_to_model_week(arrival_anker_weeks)
+            arrival_model_weeks = self._week_calendar.map_anker_weeks_to_model_weeks(arrival_anker_weeks)
 
             PO_df[IntransitPO.REQUIRED_ARRIVAL_MODEL_WEEK] = arrival_model_weeks
             data[TableName.INTRANSIT_PO] = PO_df
@@ -341,138 +325,34 @@ class DataModifier:
     def _update_required_inventory_level_to_sop_prediction_table(self):
         """
         根据安全库存周数, 计算每个SKU每周的需求和, 更新到REQUIRED_INVENTORY_LEVEL表。
+        第 i 周的要求库存为第 i 周起 ss_wks + 1 周(截断至计划期末)的需求之和, 对 SKU × 周 需求矩阵一次性计算。
         """
         data_dict = self._data_dict
 
         for supply_center, data in data_dict.items():
             sop_df_copy = data[TableName.SOP_PREDICTION].copy()
-            sku_df = data[TableName.SKU_MAIN]
-            sku_df = sku_df.set_index(SKUMain.SKU)
+            ss_wks = data[TableName.SKU_MAIN].set_index(SKUMain.SKU)[SKUMain.SAFTY_STOCK_WEEKS]
 
             week_cols = [col for col in sop_df_copy.columns if col.startswith('20')]
-            
-            # Calculate required inventory for each SKU
-            for sku in sop_df_copy[SOP_PREDICTION.SKU]:
-                # Get safety stock weeks for this SKU
-                ss_wks = sku_df.loc[sku, SKUMain.SAFTY_STOCK_WEEKS]
-                
-                # Get demand row for this SKU
-                sku_demand = sop_df_copy[sop_df_copy[SOP_PREDICTION.SKU] == sku][week_cols].iloc[0]
-                
-                # Calculate required inventory for each week
-                for i, week in enumerate(week_cols):
-                    # Determine how many weeks to sum (considering boundary)
-                    weeks_to_sum = min(ss_wks + 1, len(week_cols) - i)
-                    
-                    # Sum demands for the required weeks
-                    required_inv = sku_demand[i: i + weeks_to_sum].sum()
-                    
-                    # Update result DataFrame
-                    sop_df_copy.loc[sop_df_copy[SOP_PREDICTION.SKU] == sku, week] = required_inv
+
+            demand = sop_df_copy[week_cols].to_numpy(dtype=float)
+            window_lengths = sop_df_copy[SOP_PREDICTION.SKU].astype(object).map(ss_wks).to_numpy(dtype=int) + 1
+            sop_df_copy[week_cols] = self._compute_forward_window_sums(demand, window_lengths)
 
             data[TableName.REQUIRED_INVENTORY_LEVEL] = sop_df_copy
             self._data_dict[supply_center] = data
 
 
-    def _get_week_string(self, date):
-        """
-        将日期对象转换为"YYYYWN"格式的周字符串。
-        """
-        year, week, _ = date.isocalendar()
-        return f"{year}W{week}"
-    
-
-    def _week_to_date(self, week_str):
-        """
-        将"YYYYWN"格式的周字符串转换为对应的日期对象。
-        """
-        year = int(week_str[:4])
-        week = int(week_str[5:])
-        # 使用当年第一天的日期作为起点
-        date = datetime(year, 1, 1)
-        # 调整到该年的第N周（ISO周从周一开始）
-        delta = timedelta(days=(week-1)*7)
-        return date + delta
-    
-
-    def _generate_week_schedule(self):
-        """
-        根据起始周和计划周期，生成计划周期内所有周的字符串列表。
-        例如: start_week = '2025W50', duration = ['2025W50', ..., '2026W23']
-        """
-        # 将起始周转换为日期
-        start_date = self._week_to_date(self._start_week)
-        # 生成周期列表
-        duration = []
-        current_date = start_date
-        
-        for _ in range(self._time_span):
-            week_str = self._get_week_string(current_date)
-            duration.append(week_str)
-            # 增加7天到下一周
-            current_date += timedelta(days=7)
-        
-        return duration
-    
-    
-    def _generate_real_date_to_anker_week_mapping(self):
+    @staticmethod
+    def _compute_forward_window_sums(demand, window_lengths):
         """
-        生成真实日期到anker周的映射表, 并存储到数据字典和对象属性中。
+        计算需求矩阵每行的前向窗口和: result[r, i] = sum(demand[r, i: min(i + window_lengths[r], 周数)])。
+        通过在前缀和矩阵上按行取窗口终点实现, 窗口长度不大于 0 时结果为 0。
         """
-        anker_week_mapping = self._data_dict[TableName.ANKER_WEEK]
-
-        anker_week_mapping[AnkerWeek.WEEK] = anker_week_mapping[AnkerWeek.ANKER_WEEK_MONTH_DAY].str.extract(r'(\d{4}W\d+)')
-        anker_week_mapping[AnkerWeek.MONTH_AND_DAY] = anker_week_mapping[AnkerWeek.ANKER_WEEK_MONTH_DAY].str.extract(r'(\d{2}/\d{2})')
-        anker_week_mapping[AnkerWeek.YEAR] = anker_week_mapping[AnkerWeek.ANKER_MONTH].astype(str).str[:4]
-        anker_week_mapping[AnkerWeek.WEEK_START_DATE] = pd.to_datetime(
-            anker_week_mapping.apply(lambda x: f"{x['年']}-{x['月/日']}", axis=1), format='%Y-%m/%d'
-        )
-        anker_week_mapping = anker_week_mapping.sort_values(AnkerWeek.WEEK_START_DATE)
-
-        self._data_dict[TableName.ANKER_WEEK] = anker_week_mapping
-        self._anker_week_mapping = anker_week_mapping
+        num_rows, num_weeks = demand.shape
+        prefix_sums = np.zeros((num_rows, num_weeks + 1))
+        np.cumsum(demand, axis=1, out=prefix_sums[:, 1:])
 
-
-    def _map_date_to_anker_week(self, date):
-        """
-        将目标日期映射到anker周字符串。
-        """
-        anker_week_mapping = self._anker_week_mapping
-        for i in range(len(anker_week_mapping) - 1):
-            if anker_week_mapping.iloc[i][AnkerWeek.WEEK_START_DATE] <= date < anker_week_mapping.iloc[i + 1][AnkerWeek.WEEK_START_DATE]:
-                return anker_week_mapping.iloc[i][AnkerWeek.WEEK]
-            
-        if date >= anker_week_mapping.iloc[-1][AnkerWeek.WEEK_START_DATE]:
-            return pd.NA
-        
-        return pd.NA
-    
-
-    def _map_anker_week_to_model_week(self, weeks: pd.Series):
-        """
-        将anker周字符串序列映射为模型周序号(起始周为1)。
-        """
-        plan_start_year_week = self._start_week  # E.g.: "2025W1"
-
-        assert isinstance(weeks, pd.Series)
-        start_year, start_week = self._parse_week_string(plan_start_year_week)
-        # Handle Series of target dates
-        def compute_model_date(t_date):
-            target_year, target_week = self._parse_week_string(t_date)
-            year_diff = target_year - start_year
-            week_diff = target_week - start_week
-            total_weeks = year_diff * 52 + week_diff
-            return total_weeks + 1
-        
-        return weeks.apply(compute_model_date)
-
-    
-    def _parse_week_string(self, week_str):
-        """
-        解析"YYYYWn"格式的周字符串，返回年份和周数的整数元组。
-        """
-        match = re.match(r'(\d{4})W(\d+)', week_str)
-        if not match:
-            raise ValueError(f"Invalid week string format: {week_str}")
-        year, week = map(int, match.groups())
-        return year, week
\ No newline at end of file
+        window_starts = np.arange(num_weeks)
+        window_ends = np.clip(window_starts[None, :] + window_lengths[:, None], window_starts[None, :], num_weeks)
+        return np.take_along_axis(prefix_sums, window_ends, axis=1) - prefix_sums[:, :num_weeks]
@@ -1,15 +1,16 @@
 from typing import Dict
 from data_processor.data_modifier import DataModifier
-from data_processor.model_params_generator import ModelParams
+from data_processor.model_params_generator import LazyModelParams, ModelParams
 from util.header import *
 
 
 class DataPreprocessor:
-    def __init__(self, data_dict, start_week: str, T=26):
+    def __init__(self, data_dict, start_week: str, T=26, export_mode="excel", supply_centers=None, lazy_params=False):
 
         self._T = T
+        self._lazy_params = lazy_params
 
-        _data_modifier = DataModifier(data_dict, start_week, T)
+        _data_modifier = DataModifier(data_dict, start_week, T, export_mode=export_mode, supply_centers=supply_centers)
         self._data_dict = _data_modifier.get_modified_data_dict()
 
         self._generate_processed_data_cls()
@@ -24,4 +25,7 @@ class DataPreprocessor:
 
 
     def _generate_processed_data_cls(self):
-        self._processed_data_cls = ModelParams(self._data_dict, self._T)
\ No newline at end of file
+        if self._lazy_params:
+            self._processed_data_cls = LazyModelParams(self._data_dict, self._T)
+        else:
+            self._processed_data_cls = ModelParams(self._data_dict, self._T)
@@ -1,55 +1,155 @@
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List
+import threading
 
 from util.header import *
+from util.profiler import PROFILER, count_rows
+from data_processor.param_tables import PairSeriesTable, SeriesTable
 import numpy as np
+import pandas as pd
+
+
+# PN 周产能为 0 时的单位产能占用, 使该周无法生产对应SKU
+ZERO_CAPACITY_OCCUPANCY = 1e8
 
 
 class ModelParams:
     def __init__(self, data_dict, T):
         """
-        初始化 ModelParams, 生成所有模型参数字典。
+        初始化 ModelParams, 生成所有模型参数字典。每个生成步骤的耗时、内存和输出条目数记录到 PROFILER。
         """
         _model_params_generator = ModelParamsGenerator(data_dict)
+        _generate = self._profiled_generate
 
         # 总计划周期
         self.T = T
         # 供应中心集合
         self.supply_center_set = list(data_dict.keys())
         # 供应中心对应的SKU集合
-        self.sku_set = _model_params_generator.generate_sku_set()
+        self.sku_set = _generate(_model_params_generator.generate_sku_set)
         # 供应中心对应的工厂集合
-        self.factory_set = _model_params_generator.generate_factory_set()
+        self.factory_set = _generate(_model_params_generator.generate_factory_set)
         # 供应中心对应的BG-SKU映射
-        self.bg_to_sku_mapping_dict = _model_params_generator.generate_bg_to_sku_mapping_dict()
+        self.bg_to_sku_mapping_dict = _generate(_model_params_generator.generate_bg_to_sku_mapping_dict)
         # 供应中心对应的SKU-可用工厂映射
-        self.available_factory_set_of_skus = _model_params_generator.generate_available_factory_set_of_skus()
+        self.available_factory_set_of_skus = _generate(_model_params_generator.generate_available_factory_set_of_skus)
         # 供应中心对应的工厂-可生产SKU映射
-        self.factory_sku_lists_dict = _model_params_generator.generate_factory_sku_lists_dict()
+        self.factory_sku_lists_dict = _generate(_model_params_generator.generate_factory_sku_lists_dict)
         # 供应中心对应的SLA_S字典
-        self.SLA_S_dict = _model_params_generator.generate_SLA_S_dict()
+        self.SLA_S_dict = _generate(_model_params_generator.generate_SLA_S_dict)
         # 供应中心对应的库存成本字典
-        self.stock_cost_dict = _model_params_generator.generate_stock_cost_dict()
+        self.stock_cost_dict = _generate(_model_params_generator.generate_stock_cost_dict)
         # 供应中心对应的缺货成本字典
-        self.loss_sales_cost_dict = _model_params_generator.generate_loss_sales_cost_dict()
+        self.loss_sales_cost_dict = _generate(_model_params_generator.generate_loss_sales_cost_dict)
         # 供应中心对应的最小下单量 MOQ 字典
-        self.MOQ_dict = _model_params_generator.generate_MOQ_dict()
+        self.MOQ_dict = _generate(_model_params_generator.generate_MOQ_dict)
         # 供应中心对应的运输SLA SLA_T 字典
-        self.SLA_T_dict = _model_params_generator.generate_SLA_T_dict()
+        self.SLA_T_dict = _generate(_model_params_generator.generate_SLA_T_dict)
         # 供应中心对应的初始库存字典
-        self.initial_inventory_dict = _model_params_generator.generate_initial_inventory_dict()
+        self.initial_inventory_dict = _generate(_model_params_generator.generate_initial_inventory_dict)
         # 供应中心对应的需求字典
-        self.demand_dict = _model_params_generator.generate_demand_dict()
+        self.demand_dict = _generate(_model_params_generator.generate_demand_dict)
         # 供应中心对应的目标库存水平字典
-        self.required_inventory_level_dict = _model_params_generator.generate_required_inventory_level_dict()
+        self.required_inventory_level_dict = _generate(_model_params_generator.generate_required_inventory_level_dict)
         # 供应中心对应的PN-工厂存在一对一关系的工厂-SKU映射
         # 原计划单独求解这部分的排产问题，但必要性有限，目前弃用
-        self.isolated_factory_set = _model_params_generator.generate_isolated_sku_set()
+        self.isolated_factory_set = _generate(_model_params_generator.generate_isolated_sku_set)
         # 供应中心对应的标准产能和产能占用字典
-        self.normalized_capacity_dict, self.capacity_occupancy_dict = _model_params_generator.generate_normalized_capacity_and_capacity_occupancy()
+        self.normalized_capacity_dict, self.capacity_occupancy_dict = _generate(_model_params_generator.generate_normalized_capacity_and_capacity_occupancy)
         # 供应中心对应的PO单到达日期和数量字典
-        self.week_arrival_quantity_from_PO = _model_params_generator.generate_week_arrival_quantity_from_PO(T, self.sku_set)
+        self.week_arrival_quantity_from_PO = _generate(_model_params_generator.generate_week_arrival_quantity_from_PO, T, self.sku_set)
         # 供应中心对应的在途PO单产能占用量字典
-        self.po_capacity_occupation_dicts = _model_params_generator.generate_po_capacity_occupation(self.capacity_occupancy_dict, T)
+        self.po_capacity_occupation_dicts = _generate(_model_params_generator.generate_po_capacity_occupation, self.capacity_occupancy_dict, T)
+
+
+    def get_supply_center_size(self, supply_center):
+        """
+        获取供应中心的规模(SKU数), 用于安排各供应中心子问题的求解顺序。
+        """
+        return len(self.sku_set[supply_center])
+
+
+    @classmethod
+    def from_attributes(cls, attributes):
+        """
+        由已生成的参数属性字典直接构建 ModelParams, 不执行参数生成, 用于从快照恢复。
+        """
+        model_params = cls.__new__(cls)
+        model_params.__dict__.update(attributes)
+        return model_params
+
+
+    @staticmethod
+    def _profiled_generate(generate_func, *args):
+        """
+        调用参数生成函数, 并记录其耗时、内存和输出条目数。
+        """
+        with PROFILER.stage(f"ModelParamsGenerator.{generate_func.__name__}") as record:
+            result = generate_func(*args)
+            record['rows'] = count_rows(result)
+        return result
+
+
+class LazyModelParams:
+    """
+    按供应中心延迟生成的模型参数: 某个供应中心的 ModelParams 在被请求时才生成, 提取该中心的子问题数据后即可释放,
+    内存中最多同时保留当前和预取的两个供应中心的参数。各供应中心编辑后的数据表在构建时已全部生成, 由调用方传入。
+    prefetch 在后台线程中提前生成下一个供应中心的参数, 与当前供应中心的建模求解重叠进行。
+    """
+    def __init__(self, data_dict, T):
+        # 总计划周期
+        self.T = T
+        # 供应中心集合
+        self.supply_center_set = list(data_dict.keys())
+
+        self._data_dict = dict(data_dict)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model_params")
+        self._futures = {}
+        self._lock = threading.Lock()
+
+
+    def prefetch(self, supply_center):
+        """
+        在后台线程中开始生成指定供应中心的参数, 已在生成或已生成时不重复提交。
+        """
+        with self._lock:
+            if supply_center not in self._futures:
+                if supply_center not in self._data_dict:
+                    raise KeyError(f"Supply center {supply_center} is unknown or has been released")
+                self._futures[supply_center] = self._executor.submit(
+                    self._generate_supply_center_params, supply_center, self._data_dict[supply_center]
+                )
+
+
+    def get_supply_center_params(self, supply_center):
+        """
+        获取指定供应中心的 ModelParams(只包含该供应中心), 尚未生成时立即生成并等待完成。
+        """
+        self.prefetch(supply_center)
+        return self._futures[supply_center].result()
+
+
+    def release(self, supply_center):
+        """
+        释放指定供应中心的参数和编辑后数据表的引用, 之后不能再获取该供应中心的参数。
+        """
+        with self._lock:
+            self._futures.pop(supply_center, None)
+            self._data_dict.pop(supply_center, None)
+        if not self._data_dict:
+            self._executor.shutdown(wait=False)
+
+
+    def get_supply_center_size(self, supply_center):
+        """
+        获取供应中心的规模(SKU主数据行数), 无需生成参数, 用于安排各供应中心子问题的求解顺序。
+        """
+        return len(self._data_dict[supply_center][TableName.SKU_MAIN])
+
+
+    def _generate_supply_center_params(self, supply_center, data):
+        with PROFILER.stage(f"LazyModelParams.generate[{supply_center}]"):
+            return ModelParams({supply_center: data}, self.T)
 
 
 class ModelParamsGenerator:
@@ -107,7 +207,7 @@ class ModelParamsGenerator:
             
             # 按SKU分组，收集每个SKU对应的所有工厂
             sku_factory_dict = {}
-            for sku, group in sku_factory_df.groupby(SKUMain.SKU):
+            for sku, group in sku_factory_df.groupby(SKUMain.SKU, observed=True):
                 factories = group[WeekCapacity.FACTORY].dropna().unique().tolist()
                 sku_factory_dict[sku] = factories if factories else []
 
@@ -142,7 +242,7 @@ class ModelParamsGenerator:
             )
 
             # Group by factory to collect SKUs
-            for factory, group in sku_factory_df.groupby(WeekCapacity.FACTORY):
+            for factory, group in sku_factory_df.groupby(WeekCapacity.FACTORY, observed=True):
                 skus = group[SKUMain.SKU].dropna().unique().tolist()
                 if factory not in factory_sku_lists:
                     factory_sku_lists[factory] = []
@@ -170,7 +270,7 @@ class ModelParamsGenerator:
 
         bg_to_sku_mapping_dict = { supply_center: {
             bg: group[SKUMain.SKU].tolist()
-            for bg, group in data[TableName.SKU_MAIN].groupby(SKUMain.BG)} 
+            for bg, group in data[TableName.SKU_MAIN].groupby(SKUMain.BG, observed=True)} 
         for supply_center, data in data_dict.items() }
         
         return bg_to_sku_mapping_dict
@@ -264,7 +364,7 @@ class ModelParamsGenerator:
 
     def generate_demand_dict(self):
         """
-        生成每个供应中心下SKU每周需求的字典。
+        生成每个供应中心下SKU每周需求的参数表(SKU × 周矩阵, 可按字典方式访问)。
         """
         data_dict = self._data_dict
 
@@ -273,20 +373,16 @@ class ModelParamsGenerator:
             demand_data = data[TableName.SOP_PREDICTION]
 
             week_cols = [col for col in demand_data.columns if col.startswith('20')]
-            demand_dict = {}
-            for _, row in demand_data.iterrows():
-                sku = row[SOP_PREDICTION.SKU]
-                weekly_demand = row[week_cols].tolist()
-                demand_dict[sku] = weekly_demand
-
-            demand_dicts[supply_center] = demand_dict
+            demand_dicts[supply_center] = SeriesTable(
+                demand_data[SOP_PREDICTION.SKU].tolist(), demand_data[week_cols].to_numpy(dtype=float, copy=True), len(week_cols)
+            )
 
         return demand_dicts
     
 
     def generate_required_inventory_level_dict(self) -> Dict:
         """
-        生成每个供应中心下SKU每周目标库存字典。
+        生成每个供应中心下SKU每周目标库存的参数表(SKU × 周矩阵, 可按字典方式访问)。
         """
         data_dict = self._data_dict
 
@@ -295,13 +391,11 @@ class ModelParamsGenerator:
             required_inventory_level_data = data[TableName.REQUIRED_INVENTORY_LEVEL]
 
             week_cols = [col for col in required_inventory_level_data.columns if col.startswith('20')]
-            inventory_dict = {}
-            for _, row in required_inventory_level_data.iterrows():
-                sku = row[RequiredInventoryLevel.SKU]
-                weekly_inventory = row[week_cols].tolist()
-                inventory_dict[sku] = weekly_inventory
-
-            required_inventory_level_dict[supply_center] = inventory_dict
+            required_inventory_level_dict[supply_center] = SeriesTable(
+                required_inventory_level_data[RequiredInventoryLevel.SKU].tolist(),
+                required_inventory_level_data[week_cols].to_numpy(dtype=float, copy=True),
+                len(week_cols)
+            )
 
         return required_inventory_level_dict
 
@@ -320,7 +414,7 @@ class ModelParamsGenerator:
             capacity_data = data[TableName.WEEK_CAPACITY]
 
             pn_to_sku_dict = {}
-            for pn, group in sku_data.groupby(SKUMain.PN):
+            for pn, group in sku_data.groupby(SKUMain.PN, observed=True):
                 pn_to_sku_dict[pn] = group[SKUMain.SKU].tolist()
 
             pn_to_factory = {}  # pn -> set of factory
@@ -354,13 +448,16 @@ class ModelParamsGenerator:
     def generate_normalized_capacity_and_capacity_occupancy(self):
         """
         计算每个供应中心下工厂的标准产能和单位产能占用(标准产能/PN产能)。
+        WEEK_CAPACITY 表的每一行为一个 (工厂, PN) 的周产能, 整张表按矩阵一次计算:
+        C_{f, t} = max_p C_{f, p, t}, o_{f, p, t} = C_{f, t} / C_{f, p, t}, PN产能为0的周取 ZERO_CAPACITY_OCCUPANCY,
+        再通过行索引数组将每个 PN 的结果展开到其对应的各个SKU。
         """
         # Retrieve data dictionary
         data_dict = self._data_dict
 
         # Initialize dictionaries to store results
-        factory_standard_capacities = {}  # {supply_center: {factory: list of capacities}}
-        sku_capacity_usage = {}  # {supply_center: {factory: {sku: list of usage}}}
+        factory_standard_capacities = {}  # {supply_center: SeriesTable of C_{f, t}}
+        sku_capacity_usage = {}  # {supply_center: PairSeriesTable of o_{f, p, t}}
 
         for supply_center, datasets in data_dict.items():
             # Extract capacity and SKU data
@@ -370,65 +467,62 @@ class ModelParamsGenerator:
             # Identify week columns (starting with '20')
             week_columns = [col for col in capacity_data.columns if col.startswith('20')]
 
-            # Build PN to SKU mapping
-            # TODO: can be optimized
-            pn_to_sku_mapping = {}
-            for pn, group in sku_data.groupby(SKUMain.PN):
-                pn_to_sku_mapping[pn] = group[SKUMain.SKU].tolist()
-
-            # Initialize dictionaries for this supply center
-            factory_capacities = {}  # {factory: list of C_{f, t}}
-            factory_sku_usage = {}  # {factory: {sku: list of o_{f, p, t}}}
+            # Factory code of each capacity row, in groupby order of factories
+            capacity_by_factory = capacity_data.groupby(WeekCapacity.FACTORY, observed=True)
+            factory_codes = capacity_by_factory.ngroup().to_numpy()
+            factories = capacity_by_factory.size().index.tolist()
+            capacity_values = capacity_data[week_columns].to_numpy(dtype=float)  # Shape: (num_factory_pns, num_weeks)
 
-            # Group capacity data by factory
-            capacity_by_factory = capacity_data.groupby(WeekCapacity.FACTORY)
+            # 1. Calculate factory standard capacity C_{f, t} = max_p C_{f, p, t}
+            standard_capacity = np.full((len(factories), len(week_columns)), -np.inf)
+            np.maximum.at(standard_capacity, factory_codes, capacity_values)
 
-            for factory, factory_group in capacity_by_factory:
-                # Extract capacity matrix for this factory
-                capacity_values = factory_group[week_columns].values  # Shape: (num_pns, num_weeks)
+            # 2. Calculate unit capacity usage o_{f, p, t} = C_{f, t} / C_{f, p, t}, masking zero PN capacity
+            usage = np.full(capacity_values.shape, ZERO_CAPACITY_OCCUPANCY)
+            np.divide(standard_capacity[factory_codes], capacity_values, out=usage, where=capacity_values != 0)
 
-                # 1. Calculate factory standard capacity C_{f, t} = max_p C_{f, p, t}
-                standard_capacity = np.max(capacity_values, axis=0).tolist()
-                factory_capacities[factory] = standard_capacity
-
-                # 2. Calculate unit capacity usage o_{f, p, t} = C_{f, t} / C_{f, p, t}
-                part_numbers = factory_group[WeekCapacity.PN].values  # PN list for this factory
-                sku_usage = {}  # {sku: list of usage}
+            # 3. Expand each (factory, PN) row to the SKUs of that PN
+            row_positions, sku_positions = self._expand_pn_rows_to_skus(
+                capacity_data[WeekCapacity.PN], sku_data[SKUMain.PN]
+            )
+            sku_codes, sku_labels = pd.factorize(sku_data[SKUMain.SKU].astype(object).to_numpy()[sku_positions])
 
-                for pn_index, part_number in enumerate(part_numbers):
-                    # Map PN to SKUs
-                    skus_for_pn = pn_to_sku_mapping.get(part_number, [])
-                    if not skus_for_pn:  # Skip if PN has no corresponding SKUs
-                        continue
+            # Store results for this supply center
+            factory_standard_capacities[supply_center] = SeriesTable(factories, standard_capacity, len(week_columns))
+            sku_capacity_usage[supply_center] = PairSeriesTable(
+                factories, list(sku_labels), factory_codes[row_positions], sku_codes, usage[row_positions], len(week_columns)
+            )
 
-                    # Get capacity for this PN
-                    pn_capacity = capacity_values[pn_index]  # C_{f, p, t} for this PN
+        return factory_standard_capacities, sku_capacity_usage
 
-                    # Calculate usage for each SKU mapped to this PN
-                    for sku in skus_for_pn:
-                        usage_per_week = []
-                        for week_index, factory_capacity in enumerate(standard_capacity):
-                            pn_week_capacity = pn_capacity[week_index]
-                            if pn_week_capacity == 0:
-                                # Handle division by zero: use a large value (e.g., 1e8)
-                                usage_per_week.append(1e8)
-                            else:
-                                usage_per_week.append(float(factory_capacity / pn_week_capacity))
 
-                        sku_usage[sku] = usage_per_week
+    @staticmethod
+    def _expand_pn_rows_to_skus(row_pns, sku_pns):
+        """
+        将按 PN 的行展开为按SKU的行: 第 i 行的 PN 对应 k 个SKU时展开为 k 行, 没有对应SKU的 PN 行被跳过。
+        返回等长的 (行位置数组, SKU位置数组), 分别索引 row_pns 和 sku_pns; 同一行内SKU保持 sku_pns 中的原有顺序。
+        """
+        sku_pn_codes, pn_labels = pd.factorize(sku_pns.astype(object))
+        # SKU positions grouped by PN, and the start of each PN's block
+        sku_order = np.argsort(sku_pn_codes, kind='stable')
+        block_starts = np.searchsorted(sku_pn_codes[sku_order], np.arange(len(pn_labels) + 1))
 
-                factory_sku_usage[factory] = sku_usage
+        row_pn_codes = pd.Index(pn_labels).get_indexer(row_pns.astype(object))
+        matched = row_pn_codes >= 0
+        counts = np.zeros(len(row_pn_codes), dtype=np.int64)
+        counts[matched] = block_starts[row_pn_codes[matched] + 1] - block_starts[row_pn_codes[matched]]
 
-            # Store results for this supply center
-            factory_standard_capacities[supply_center] = factory_capacities
-            sku_capacity_usage[supply_center] = factory_sku_usage
+        row_positions = np.repeat(np.arange(len(row_pn_codes)), counts)
+        offsets = np.arange(len(row_positions)) - np.repeat(np.cumsum(counts) - counts, counts)
+        sku_positions = sku_order[block_starts[row_pn_codes[row_positions]] + offsets]
 
-        return factory_standard_capacities, sku_capacity_usage
+        return row_positions, sku_positions
     
 
     def generate_week_arrival_quantity_from_PO(self, T, sku_set):
         """
-        生成每个供应中心下SKU每周到货量的字典, key为SKU, value为长度为T的到货量列表。
+        生成每个供应中心下SKU每周到货量的参数表(SKU × T 矩阵), key为SKU, value为长度为T的到货量列表。
+        PO 按 (SKU, 到货模型周) 一次分组求和后散布到矩阵中; 不在SKU集合中或不在计划周期内的 PO 被忽略。
         """
         data_dict = self._data_dict
 
@@ -438,75 +532,58 @@ class ModelParamsGenerator:
 
             # Group by SKU and model week, summing quantities
             grouped = PO_df.groupby(
-                [IntransitPO.SKU, IntransitPO.REQUIRED_ARRIVAL_MODEL_WEEK]
+                [IntransitPO.SKU, IntransitPO.REQUIRED_ARRIVAL_MODEL_WEEK], observed=True
                 )[IntransitPO.INTRANSIT_QUANTITY].sum().reset_index()
-            
-            # Initialize the dictionary
-            sku_dict = {}
-            
-            # For each SKU, create a list of quantities
-            for sku in sku_set[supply_center]:
-                # Filter rows for this SKU
-                sku_data = grouped[grouped[IntransitPO.SKU] == sku]
-                
-                # Initialize list with zeros for all weeks
-                quantities = [0.0] * T
-                
-                # Fill in quantities for the weeks where data exists
-                for _, row in sku_data.iterrows():
-                    week_idx = int(row[IntransitPO.REQUIRED_ARRIVAL_MODEL_WEEK]) - 1  # Convert to 0-based index
-                    quantities[week_idx] = row[IntransitPO.INTRANSIT_QUANTITY]
-                
-                sku_dict[sku] = quantities
 
-            week_arrival_quantity_dicts[supply_center] = sku_dict
+            skus = list(sku_set[supply_center])
+            sku_rows = pd.Index(skus, dtype=object).get_indexer(grouped[IntransitPO.SKU].astype(object))
+            week_idx = grouped[IntransitPO.REQUIRED_ARRIVAL_MODEL_WEEK].to_numpy(dtype=np.int64) - 1  # Convert to 0-based index
+            valid = (sku_rows >= 0) & (week_idx >= 0) & (week_idx < T)
+
+            # Each (SKU, week) appears once after grouping, so a plain scatter suffices
+            quantities = np.zeros((len(skus), T))
+            quantities[sku_rows[valid], week_idx[valid]] = grouped[IntransitPO.INTRANSIT_QUANTITY].to_numpy(dtype=float)[valid]
+
+            week_arrival_quantity_dicts[supply_center] = SeriesTable(skus, quantities, T)
 
         return week_arrival_quantity_dicts
     
 
-    def generate_po_capacity_occupation(self, unit_capacity: Dict[str, List[float]], T: int) -> Dict[str, List[float]]:
+    def generate_po_capacity_occupation(self, unit_capacity: Dict[str, PairSeriesTable], T: int) -> Dict[str, SeriesTable]:
         """
-        生成每个供应中心下在途PO订单对产能占用量的字典。
+        生成每个供应中心下在途PO订单对产能占用量的参数表(工厂 × T 矩阵)。
         返回格式为 {supply_center: {factory: [产能占用 for t in range(T)]}}
+        PO 按 (工厂, SKU, 产能占用模型周) 一次分组求和, 从单位产能占用矩阵中按行号一次取出对应的单位占用,
+        相乘后累加到工厂 × 周矩阵; 工厂-SKU 不在单位产能占用表中的 PO 不计入占用。
         """
         data_dict = self._data_dict
 
         po_capacity_occupation_dicts = {}
         for supply_center, data in data_dict.items():
-            unit_capacity_df = unit_capacity[supply_center]
-            # Initialize the output dictionary
-            capacity_occupation_dicts = {}
+            unit_capacity_table = unit_capacity[supply_center]
             po_df = data[TableName.INTRANSIT_PO]
             po_df = po_df[po_df[IntransitPO.CAPACITY_OCCUPIED_MODEL_WEEK] >= 1]
             factory_set = po_df[IntransitPO.SUPPLIER].unique().tolist()
             # Group by factory, SKU, and model week, summing quantities
             grouped = po_df.groupby(
-                [IntransitPO.SUPPLIER, IntransitPO.SKU, IntransitPO.CAPACITY_OCCUPIED_MODEL_WEEK]
+                [IntransitPO.SUPPLIER, IntransitPO.SKU, IntransitPO.CAPACITY_OCCUPIED_MODEL_WEEK], observed=True
             )[IntransitPO.INTRANSIT_QUANTITY].sum().reset_index()
-            
-            # Process each factory
-            for factory in factory_set:
-                # Initialize dictionary for this factory
-                capacity_dict = [0.0] * T
-                
-                # Filter rows for this factory
-                factory_data = grouped[grouped[IntransitPO.SUPPLIER] == factory]
-                
-                # Calculate capacity occupation for each SKU and week
-                for _, row in factory_data.iterrows():
-                    sku = row[IntransitPO.SKU]
-                    week_idx = int(row[IntransitPO.CAPACITY_OCCUPIED_MODEL_WEEK]) - 1  # Convert to 0-based index
-                    quantity = int(row[IntransitPO.INTRANSIT_QUANTITY])
-                    
-                    # Ensure week_idx is within valid range and SKU is in unit_capacity
-                    if factory in unit_capacity_df.keys() and sku in unit_capacity_df[factory].keys():
-                        # Calculate capacity occupation = quantity * unit capacity
-                        unit_cap = unit_capacity_df[factory][sku][week_idx]
-                        capacity_dict[week_idx] += quantity * unit_cap
-                
-                capacity_occupation_dicts[factory] = capacity_dict
 
-            po_capacity_occupation_dicts[supply_center] = capacity_occupation_dicts
+            factories = grouped[IntransitPO.SUPPLIER].astype(object)
+            factory_rows = pd.Index(factory_set, dtype=object).get_indexer(factories)
+            week_idx = grouped[IntransitPO.CAPACITY_OCCUPIED_MODEL_WEEK].to_numpy(dtype=np.int64) - 1  # Convert to 0-based index
+            quantity = np.trunc(grouped[IntransitPO.INTRANSIT_QUANTITY].to_numpy(dtype=float))
+
+            # Gather unit capacity o_{f, p, t} for each grouped row; skip pairs absent from the unit capacity table
+            pair_rows = unit_capacity_table.pair_row_indices(factories, grouped[IntransitPO.SKU].astype(object))
+            valid = (pair_rows >= 0) & (week_idx < T)
+            unit_cap = unit_capacity_table.matrix[pair_rows[valid], week_idx[valid]]
+
+            # Calculate capacity occupation = quantity * unit capacity, accumulated per factory and week
+            capacity_occupation = np.zeros((len(factory_set), T))
+            np.add.at(capacity_occupation, (factory_rows[valid], week_idx[valid]), quantity[valid] * unit_cap)
+
+            po_capacity_occupation_dicts[supply_center] = SeriesTable(factory_set, capacity_occupation, T)
             
         return po_capacity_occupation_dicts
                             
\ No newline at end of file
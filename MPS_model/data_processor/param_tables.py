@@ -0,0 +1,151 @@
+from collections.abc import Mapping
+import numpy as np
+import pandas as pd
+
+
+class SeriesTable(Mapping):
+    """
+    以 NumPy 矩阵存储的 {键: 长度为 T 的序列} 参数表, 如 SKU × T 的需求、工厂 × T 的产能。
+    对外提供只读的字典兼容视图: 按键取值时返回该行的列表, 与原先的 dict-of-lists 用法一致。
+    """
+    def __init__(self, labels, matrix, num_weeks=None):
+        self.labels = list(labels)
+        matrix = np.asarray(matrix, dtype=float)
+        if matrix.size == 0:
+            matrix = matrix.reshape(len(self.labels), num_weeks or 0)
+        self.matrix = matrix
+        self.matrix.flags.writeable = False
+        # 键 -> 行号的整数索引
+        self.key_index = {label: i for i, label in enumerate(self.labels)}
+
+
+    @classmethod
+    def from_dict(cls, series_dict, num_weeks):
+        """
+        由 {键: 序列列表} 字典构建参数表。
+        """
+        labels = list(series_dict.keys())
+        matrix = np.array([series_dict[label] for label in labels], dtype=float).reshape(len(labels), -1) \
+            if labels else np.zeros((0, num_weeks))
+        return cls(labels, matrix, num_weeks)
+
+
+    def __getitem__(self, key):
+        return self.matrix[self.key_index[key]].tolist()
+
+
+    def __iter__(self):
+        return iter(self.key_index)
+
+
+    def __len__(self):
+        return len(self.key_index)
+
+
+    def __contains__(self, key):
+        return key in self.key_index
+
+
+    def __repr__(self):
+        return f"SeriesTable(rows={len(self)}, weeks={self.matrix.shape[1]})"
+
+
+    def row(self, key):
+        """
+        以只读 ndarray 形式获取某个键的序列, 不做列表转换。
+        """
+        return self.matrix[self.key_index[key]]
+
+
+    def row_indices(self, keys):
+        """
+        获取一组键对应的行号数组, 不存在的键为 -1。
+        """
+        return np.array([self.key_index.get(key, -1) for key in keys], dtype=np.int64)
+
+
+class PairSeriesTable(Mapping):
+    """
+    {外层键: {内层键: 长度为 T 的序列}} 的稀疏参数表, 如 工厂 × SKU × T 的单位产能占用。
+    只存储实际存在的 (外层键, 内层键) 对, 每对占矩阵一行, 行按外层键连续排列;
+    按外层键取值时返回共享底层矩阵的 SeriesTable 视图。
+    """
+    def __init__(self, outer_labels, inner_labels, outer_codes, inner_codes, matrix, num_weeks=None):
+        self.outer_labels = list(outer_labels)
+        self.inner_labels = list(inner_labels)
+
+        outer_codes = np.asarray(outer_codes, dtype=np.int64)
+        inner_codes = np.asarray(inner_codes, dtype=np.int64)
+        matrix = np.asarray(matrix, dtype=float)
+        if matrix.size == 0:
+            matrix = matrix.reshape(len(outer_codes), num_weeks or 0)
+
+        # 按外层键稳定排序, 使同一外层键的行连续
+        order = np.argsort(outer_codes, kind='stable')
+        self.outer_codes = outer_codes[order]
+        self.inner_codes = inner_codes[order]
+        self.matrix = matrix[order]
+        self.matrix.flags.writeable = False
+
+        self._views = {}
+        bounds = np.searchsorted(self.outer_codes, np.arange(len(self.outer_labels) + 1))
+        for code, outer_label in enumerate(self.outer_labels):
+            start, stop = bounds[code], bounds[code + 1]
+            self._views[outer_label] = SeriesTable(
+                [self.inner_labels[i] for i in self.inner_codes[start:stop]], self.matrix[start:stop], self.matrix.shape[1]
+            )
+
+
+    @classmethod
+    def from_nested_dict(cls, nested_dict, num_weeks):
+        """
+        由 {外层键: {内层键: 序列列表}} 字典构建参数表。
+        """
+        outer_labels = list(nested_dict.keys())
+        inner_index = {}
+        outer_codes, inner_codes, rows = [], [], []
+        for outer_code, outer_label in enumerate(outer_labels):
+            for inner_label, series in nested_dict[outer_label].items():
+                outer_codes.append(outer_code)
+                inner_codes.append(inner_index.setdefault(inner_label, len(inner_index)))
+                rows.append(series)
+
+        matrix = np.array(rows, dtype=float).reshape(len(rows), -1) if rows else np.zeros((0, num_weeks))
+        return cls(outer_labels, list(inner_index.keys()), outer_codes, inner_codes, matrix, num_weeks)
+
+
+    def pair_row_indices(self, outer_keys, inner_keys):
+        """
+        获取一组 (外层键, 内层键) 对应的矩阵行号数组, 不存在的键对为 -1。
+        """
+        outer_index = pd.Index(self.outer_labels)
+        inner_index = pd.Index(self.inner_labels)
+        outer_codes = outer_index.get_indexer(pd.Index(outer_keys, dtype=object))
+        inner_codes = inner_index.get_indexer(pd.Index(inner_keys, dtype=object))
+
+        # 以 外层编码 × 内层数量 + 内层编码 作为键对的整数编码
+        num_inner = max(len(self.inner_labels), 1)
+        pair_index = pd.Index(self.outer_codes * num_inner + self.inner_codes)
+        row_indices = pair_index.get_indexer(outer_codes * num_inner + inner_codes)
+        row_indices[(outer_codes < 0) | (inner_codes < 0)] = -1
+        return row_indices
+
+
+    def __getitem__(self, key):
+        return self._views[key]
+
+
+    def __iter__(self):
+        return iter(self._views)
+
+
+    def __len__(self):
+        return len(self._views)
+
+
+    def __contains__(self, key):
+        return key in self._views
+
+
+    def __repr__(self):
+        return f"PairSeriesTable(outer={len(self)}, pairs={len(self.outer_codes)}, weeks={self.matrix.shape[1]})"
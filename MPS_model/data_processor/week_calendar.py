@@ -0,0 +1,129 @@
+from util.header import *
+import numpy as np
+import pandas as pd
+
+
+class WeekCalendar:
+    """
+    安克周日历: 由安克周表一次性构建周起始日期索引和计划周期,
+    供各处理步骤对整列日期或周字符串做向量化的 日期 -> 安克周 -> 模型周 转换。
+    """
+    def __init__(self, anker_week_df, start_week: str, T: int):
+        self._start_week = start_week  # E.g.: "2025W1"
+        self._time_span = T
+
+        self._anker_week_table = self._build_anker_week_table(anker_week_df)
+        # searchsorted 所需的有序周起始日期及对应的安克周
+        self._week_start_dates = self._anker_week_table[AnkerWeek.WEEK_START_DATE].to_numpy(dtype='datetime64[ns]')
+        self._anker_weeks = self._anker_week_table[AnkerWeek.WEEK].to_numpy(dtype=object)
+
+        self._start_monday = self._week_strings_to_mondays(pd.Series([start_week])).iloc[0]
+        self._duration = self._generate_week_schedule()
+
+
+    def get_anker_week_table(self):
+        """
+        获取补充了周、月/日、年和周起始日期列, 并按周起始日期排序的安克周表。
+        """
+        return self._anker_week_table
+
+
+    def get_plan_start_week(self):
+        """
+        获取计划的起始周。
+        """
+        return self._start_week
+
+
+    def get_plan_duration(self):
+        """
+        获取计划周期内所有周的字符串列表。
+        """
+        return self._duration
+
+
+    def map_dates_to_anker_weeks(self, dates: pd.Series):
+        """
+        将日期序列映射为安克周字符串序列。
+        日期 d 属于第 i 周当且仅当 start_i <= d < start_{i+1}; 早于首周或不早于末周起始日期的日期映射为 NA。
+        """
+        assert isinstance(dates, pd.Series)
+        date_values = pd.to_datetime(dates).to_numpy(dtype='datetime64[ns]')
+        positions = np.searchsorted(self._week_start_dates, date_values, side='right') - 1
+        valid = (positions >= 0) & (positions < len(self._week_start_dates) - 1) & ~np.isnat(date_values)
+
+        anker_weeks = np.full(len(dates), pd.NA, dtype=object)
+        anker_weeks[valid] = self._anker_weeks[positions[valid]]
+        return pd.Series(anker_weeks, index=dates.index, dtype=object)
+
+
+    def map_anker_weeks_to_model_weeks(self, weeks: pd.Series):
+        """
+        将"YYYYWn"格式的周字符串序列映射为模型周序号(起始周为1)。
+        按 ISO 周一日期之差计算周数, 正确处理包含 53 周的年份。
+        """
+        assert isinstance(weeks, pd.Series)
+        mondays = self._week_strings_to_mondays(weeks)
+        return ((mondays - self._start_monday).dt.days // 7 + 1).astype(int)
+
+
+    def _build_anker_week_table(self, anker_week_df):
+        """
+        从安克周表中解析周字符串和周起始日期, 并按周起始日期排序。
+        """
+        anker_week_mapping = anker_week_df.copy()
+
+        anker_week_mapping[AnkerWeek.WEEK] = anker_week_mapping[AnkerWeek.ANKER_WEEK_MONTH_DAY].str.extract(r'(\d{4}W\d+)')
+        anker_week_mapping[AnkerWeek.MONTH_AND_DAY] = anker_week_mapping[AnkerWeek.ANKER_WEEK_MONTH_DAY].str.extract(r'(\d{2}/\d{2})')
+        anker_week_mapping[AnkerWeek.YEAR] = anker_week_mapping[AnkerWeek.ANKER_MONTH].astype(str).str[:4]
+        anker_week_mapping[AnkerWeek.WEEK_START_DATE] = pd.to_datetime(
+            anker_week_mapping[AnkerWeek.YEAR] + '-' + anker_week_mapping[AnkerWeek.MONTH_AND_DAY], format='%Y-%m/%d'
+        )
+
+        return anker_week_mapping.sort_values(AnkerWeek.WEEK_START_DATE)
+
+
+    def _generate_week_schedule(self):
+        """
+        根据起始周和计划周期，生成计划周期内所有周的字符串列表。
+        例如: start_week = '2025W50', duration = ['2025W50', ..., '2026W23']
+        """
+        week_mondays = pd.date_range(self._start_monday, periods=self._time_span, freq='7D')
+        return [self._get_week_string(date) for date in week_mondays]
+
+
+    @staticmethod
+    def count_weeks_between(start_week: str, end_week: str):
+        """
+        计算两个"YYYYWn"格式周字符串之间相差的周数(end_week 早于 start_week 时为负数)。
+        """
+        start_monday, end_monday = WeekCalendar._week_strings_to_mondays(pd.Series([start_week, end_week]))
+        return (end_monday - start_monday).days // 7
+
+
+    @staticmethod
+    def _week_strings_to_mondays(weeks: pd.Series):
+        """
+        将"YYYYWn"格式的周字符串序列转换为对应 ISO 周的周一日期序列。
+        """
+        parts = weeks.astype(str).str.extract(r'^(\d{4})W(\d+)')
+        if parts.isna().any().any():
+            invalid_weeks = weeks[parts.isna().any(axis=1)].tolist()
+            raise ValueError(f"Invalid week string format: {invalid_weeks}")
+        years = parts[0].astype(int)
+        week_numbers = parts[1].astype(int)
+
+        # ISO 第 1 周是包含 1 月 4 日的那一周
+        jan_4th = pd.to_datetime(years.astype(str) + '-01-04', format='%Y-%m-%d')
+        first_mondays = jan_4th - pd.to_timedelta(jan_4th.dt.weekday, unit='D')
+        return first_mondays + pd.to_timedelta((week_numbers - 1) * 7, unit='D')
+
+
+    @staticmethod
+    def _get_week_string(date):
+        """
+        将日期对象转换为"YYYYWN"格式的周字符串。
+        """
+        year, week, _ = date.isocalendar()
+        return f"{year}W{week}"
+
@@ -1,9 +1,24 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+import os
+
 import coptpy
+from data_processor.model_params_generator import LazyModelParams
+from data_processor.param_tables import SeriesTable
 from models.MPS_model import MPSModel
+from models.decomposition import DecomposedMPSModel
+from models.heuristic_planner import HeuristicPlanner
+from models.presolve import MPSPresolver
+from models.rolling_horizon import load_previous_solution, save_rolling_state
+from util.data_exporter import wait_for_exports
 from util.data_loader import load_model_params
 from util.data_visualizer import DataVisualizer
-from util.model_writer import ModelWriter
+from util.model_writer import ModelWriter, find_latest_solution_file, read_solution_file, write_scenario_results
+from util.profiler import PROFILER
+
 
+# 启发算法的使用方式: 不使用 / 作为 MIP 初始解 / 单独生成计划
+HEURISTIC_MODES = (None, "mip_start", "standalone")
 
 
 def main(args, T=26):
@@ -12,49 +27,327 @@ def main(args, T=26):
     params = args["solver_params"]
     relax_decision_vars = args["relax_decision_vars"]
     visualize = args["visualize"]
+    use_cache = args.get("use_cache", True)
+    num_load_workers = args.get("num_load_workers", 1)
+    export_mode = args.get("export_mode", "excel")
+    supply_centers = args.get("supply_centers", None)
+    lazy_params = args.get("lazy_params", False)
+    use_snapshot = args.get("use_snapshot", False)
+    build_mode = args.get("build_mode", "expression")
+    num_solve_workers = args.get("num_solve_workers", 1)
+    rolling_horizon = args.get("rolling_horizon", False)
+    warm_start = args.get("warm_start", None)
+    tighten_big_m = args.get("tighten_big_m", False)
+    decompose = args.get("decompose", False)
+    num_component_workers = args.get("num_component_workers", 1)
+    heuristic = args.get("heuristic", None)
+    time_window = args.get("time_window", None)
+    scenarios = args.get("scenarios", None)
+    presolve = args.get("presolve", False)
+    if scenarios is not None:
+        if build_mode != "matrix" or decompose:
+            raise ValueError("scenarios requires build_mode='matrix' and decompose=False")
+        # 需求场景模式只输出场景计划 CSV, 不约简数据、不使用初始解、不写出 .sol 文件
+        unsupported_options = {
+            "presolve": presolve, "heuristic": heuristic, "warm_start": warm_start,
+            "rolling_horizon": rolling_horizon, "visualize": visualize,
+        }
+        enabled_options = [name for name, value in unsupported_options.items() if value]
+        if enabled_options:
+            raise ValueError(f"scenarios cannot be combined with {enabled_options}")
+    if heuristic not in HEURISTIC_MODES:
+        raise ValueError(f"Invalid heuristic mode: {heuristic}, expected one of {HEURISTIC_MODES}")
 
-    model_params_cls, _ = load_model_params(start_week, T)
+    model_params_cls = load_model_params(
+        start_week, T, use_cache=use_cache, num_load_workers=num_load_workers, export_mode=export_mode,
+        supply_centers=supply_centers, lazy_params=lazy_params, use_snapshot=use_snapshot
+    )[0]
 
     supply_center_set = model_params_cls.supply_center_set
 
-    # 按 supply_center 求解子问题
-    for sc in supply_center_set:
-        # 初始化COPT环境
-        env = coptpy.Envr()
-        # 提取子问题数据
-        sub_data = {
-            'plan_duration': model_params_cls.T,
-            'sku_set': model_params_cls.sku_set[sc],
-            'factory_set': model_params_cls.factory_set[sc],
-            'SLA_S_dict': model_params_cls.SLA_S_dict[sc],
-            'SLA_T_dict': model_params_cls.SLA_T_dict[sc],
-            'factory_sku_lists_dict': model_params_cls.factory_sku_lists_dict[sc],
-            'capacity_occupancy_dict': model_params_cls.capacity_occupancy_dict[sc],
-            'normalized_capacity_dict': model_params_cls.normalized_capacity_dict[sc],
-            'MOQ_dict': model_params_cls.MOQ_dict[sc],
-            'M': 1e8,
-            'week_arrival_quantity_from_PO': model_params_cls.week_arrival_quantity_from_PO[sc],
-            'initial_inventory_dict': model_params_cls.initial_inventory_dict[sc],
-            'demand_dict': model_params_cls.demand_dict[sc],
-            'required_inventory_level_dict': model_params_cls.required_inventory_level_dict[sc],
-            'stock_cost_dict': model_params_cls.stock_cost_dict[sc],
-            'loss_sales_cost_dict': model_params_cls.loss_sales_cost_dict[sc],
-            'available_factory_set_of_skus': model_params_cls.available_factory_set_of_skus[sc],
-            'po_capacity_occupation_dicts': model_params_cls.po_capacity_occupation_dicts[sc],
-            "isolated_factory_set": model_params_cls.isolated_factory_set[sc]  # NOT be utilized now
-        }
+    # 单个供应中心建模求解的选项
+    solve_options = {
+        'params': params,
+        'relax_decision_vars': relax_decision_vars,
+        'build_mode': build_mode,
+        'visualize': visualize,
+        'start_week': start_week,
+        'T': T,
+        'rolling_horizon': rolling_horizon,
+        'warm_start': warm_start,
+        'tighten_big_m': tighten_big_m,
+        'decompose': decompose,
+        'num_component_workers': num_component_workers,
+        'heuristic': heuristic,
+        'time_window': time_window,
+        'scenarios': scenarios,
+        'presolve': presolve,
+    }
+
+    failed_supply_centers = {}
+    if num_solve_workers > 1:
+        # 多个供应中心在独立进程中并行建模求解
+        failed_supply_centers = _solve_supply_centers_in_parallel(
+            model_params_cls, num_solve_workers, solve_options
+        )
+    else:
+        # 按 supply_center 依次求解子问题
+        for sc_index, sc in enumerate(supply_center_set):
+            sub_data = _get_sub_data(model_params_cls, supply_center_set, sc_index)
+            _solve_supply_center(sc, sub_data, solve_options)
+
+    # 等待后台导出的编辑后数据表写入完成
+    with PROFILER.stage("main.wait_for_exports"):
+        wait_for_exports()
+
+    # 输出各阶段耗时和内存的运行清单, 与 .sol 文件位于同一输出目录
+    PROFILER.write_manifest("output/MPS", run_info={
+        'start_week': start_week,
+        'T': T,
+        'solver_params': params,
+        'relax_decision_vars': relax_decision_vars,
+        'supply_centers': list(supply_center_set),
+        'num_solve_workers': num_solve_workers,
+        'rolling_horizon': rolling_horizon,
+        'warm_start': warm_start,
+        'tighten_big_m': tighten_big_m,
+        'decompose': decompose,
+        'heuristic': heuristic,
+        'time_window': time_window,
+        'scenarios': scenarios,
+        'presolve': presolve,
+        'failed_supply_centers': failed_supply_centers,
+    })
+
+    if failed_supply_centers:
+        raise RuntimeError(f"Failed to solve supply centers: {list(failed_supply_centers)}")
+
+
+def _get_sub_data(model_params_cls, supply_center_set, sc_index):
+    """
+    获取求解顺序中第 sc_index 个供应中心的子问题数据。
+    延迟生成参数时, 在后台预先生成下一个供应中心的参数, 并在提取子问题数据后立即释放当前供应中心的参数和编辑后数据表,
+    建模求解期间只保留子问题数据。
+    """
+    sc = supply_center_set[sc_index]
+    if not isinstance(model_params_cls, LazyModelParams):
+        return _extract_sub_data(model_params_cls, sc)
+
+    sc_params = model_params_cls.get_supply_center_params(sc)
+    if sc_index + 1 < len(supply_center_set):
+        model_params_cls.prefetch(supply_center_set[sc_index + 1])
+    sub_data = _extract_sub_data(sc_params, sc)
+    model_params_cls.release(sc)
+    return sub_data
+
+
+def _extract_sub_data(sc_params, sc):
+    """
+    提取单个供应中心子问题的数据。
+    """
+    return {
+        'plan_duration': sc_params.T,
+        'sku_set': sc_params.sku_set[sc],
+        'factory_set': sc_params.factory_set[sc],
+        'SLA_S_dict': sc_params.SLA_S_dict[sc],
+        'SLA_T_dict': sc_params.SLA_T_dict[sc],
+        'factory_sku_lists_dict': sc_params.factory_sku_lists_dict[sc],
+        'capacity_occupancy_dict': sc_params.capacity_occupancy_dict[sc],
+        'normalized_capacity_dict': sc_params.normalized_capacity_dict[sc],
+        'MOQ_dict': sc_params.MOQ_dict[sc],
+        'M': 1e8,
+        'week_arrival_quantity_from_PO': sc_params.week_arrival_quantity_from_PO[sc],
+        'initial_inventory_dict': sc_params.initial_inventory_dict[sc],
+        'demand_dict': sc_params.demand_dict[sc],
+        'required_inventory_level_dict': sc_params.required_inventory_level_dict[sc],
+        'stock_cost_dict': sc_params.stock_cost_dict[sc],
+        'loss_sales_cost_dict': sc_params.loss_sales_cost_dict[sc],
+        'available_factory_set_of_skus': sc_params.available_factory_set_of_skus[sc],
+        'po_capacity_occupation_dicts': sc_params.po_capacity_occupation_dicts[sc],
+        "isolated_factory_set": sc_params.isolated_factory_set[sc]  # NOT be utilized now
+    }
+
+
+def _solve_supply_center(sc, sub_data, solve_options):
+    """
+    在独立的 COPT 环境中建模求解单个供应中心, 输出 .sol 文件并按需可视化, 返回 .sol 文件路径。
+    滚动计划模式下, 以上一次计划的解(按起始周的偏移平移)作为 MIP 初始解, 并记录本次的解供下一次使用。
+    启用 presolve 时在约简后的数据上建模求解, 被移除变量的固定取值在输出时补回 .sol 文件;
+    约简后没有剩余 SKU 时不建模, 直接由固定取值写出 .sol 文件。
+    """
+    if solve_options['scenarios'] is not None:
+        return _solve_supply_center_scenarios(sc, sub_data, solve_options)
+
+    presolver = None
+    model_data = sub_data
+    if solve_options['presolve']:
+        presolver = MPSPresolver(sc, sub_data)
+        model_data = presolver.presolve()
+        if not model_data['sku_set']:
+            # 全部 SKU 均被移除, 无需建模求解, 由固定取值直接写出 .sol 文件
+            print(f"All SKUs of {sc} are fixed by presolve, skipping model building")
+            return _write_and_visualize(sc, presolver, sub_data, solve_options)
+
+    if solve_options['heuristic'] == "standalone":
+        # 只用启发算法生成计划, 不调用求解器
+        model = HeuristicPlanner(sc, model_data, relax_decision_vars=solve_options['relax_decision_vars'])
+        model.plan()
+        return _write_and_visualize(sc, model, sub_data, solve_options, presolver)
+
+    # 初始化COPT环境
+    env = coptpy.Envr()
+
+    if solve_options['decompose']:
+        # 按 工厂-SKU 连通分量分解, 各分量独立建模求解后合并结果
+        model = DecomposedMPSModel(
+            env, sc, model_data, params=solve_options['params'],
+            relax_decision_vars=solve_options['relax_decision_vars'], build_mode=solve_options['build_mode'],
+            tighten_big_m=solve_options['tighten_big_m'], num_workers=solve_options['num_component_workers'],
+            time_window=solve_options['time_window']
+        )
+    else:
+        model = MPSModel(
+            env, sc, model_data, params=solve_options['params'],
+            relax_decision_vars=solve_options['relax_decision_vars'], build_mode=solve_options['build_mode'],
+            tighten_big_m=solve_options['tighten_big_m'], time_window=solve_options['time_window']
+        )
+    mip_start_values = _get_mip_start_values(sc, solve_options)
+    if not mip_start_values and solve_options['heuristic'] == "mip_start":
+        # 没有历史解可用时, 以启发算法生成的计划作为 MIP 初始解
+        mip_start_values = HeuristicPlanner(sc, model_data, relax_decision_vars=solve_options['relax_decision_vars']).plan()
+    if mip_start_values:
+        model.set_mip_start(mip_start_values)
+    model.solve()
+
+    return _write_and_visualize(sc, model, sub_data, solve_options, presolver)
+
+
+def _solve_supply_center_scenarios(sc, sub_data, solve_options):
+    """
+    在同一个模型上依次求解单个供应中心的各需求场景, 各场景的计划写入同一个 CSV 文件, 返回文件路径。
+    """
+    env = coptpy.Envr()
+    model = MPSModel(
+        env, sc, sub_data, params=solve_options['params'],
+        relax_decision_vars=solve_options['relax_decision_vars'], build_mode=solve_options['build_mode'],
+        tighten_big_m=solve_options['tighten_big_m'], time_window=solve_options['time_window']
+    )
+    scenario_data = {
+        scenario: _scale_demand(sub_data, demand_factor) for scenario, demand_factor in solve_options['scenarios'].items()
+    }
+    results = model.solve_scenarios(scenario_data)
+    return write_scenario_results(sc, results)
+
+
+def _scale_demand(sub_data, demand_factor):
+    """
+    将子问题数据中的需求和目标库存水平按 demand_factor 缩放, 得到一个需求场景的数据。
+    """
+    def scale(table):
+        if isinstance(table, SeriesTable):
+            return SeriesTable(table.labels, table.matrix * demand_factor, table.matrix.shape[1])
+        return {key: [value * demand_factor for value in series] for key, series in table.items()}
+
+    return {
+        **sub_data,
+        'demand_dict': scale(sub_data['demand_dict']),
+        'required_inventory_level_dict': scale(sub_data['required_inventory_level_dict']),
+    }
+
+
+def _write_and_visualize(sc, model, sub_data, solve_options, presolver=None):
+    """
+    输出求解结果并按需可视化, 返回 .sol 文件路径。presolver 不为 None 时在 .sol 文件中补回约简时移除的变量。
+    """
+    # 输出求解结果及结果后处理
+    model_writer = ModelWriter(model, sc, presolver=presolver)
+    solution_file_path = model_writer.write_solution()
+    if solve_options['rolling_horizon']:
+        save_rolling_state(sc, solve_options['start_week'], solve_options['T'], solution_file_path)
+
+    # 可视化库存曲线
+    if solve_options['visualize']:
+        data_visualizer = DataVisualizer(sc, solution_file_path, sub_data)
+        data_visualizer.visualize_all()
+
+    return solution_file_path
+
+
+def _get_mip_start_values(sc, solve_options):
+    """
+    获取供应中心的 MIP 初始解 {变量名: 取值}, 没有可用的初始解时返回 None:
+    - 滚动计划模式下优先使用上一次计划平移后的解;
+    - warm_start 为 "latest" 时使用该供应中心最近一次输出的 .sol 文件, 为字典时使用其中为该供应中心指定的 .sol 文件。
+    """
+    if solve_options['rolling_horizon']:
+        previous_values = load_previous_solution(sc, solve_options['start_week'], solve_options['T'])
+        if previous_values:
+            return previous_values
+
+    warm_start = solve_options['warm_start']
+    if warm_start is None:
+        return None
+    if warm_start == "latest":
+        solution_file_path = find_latest_solution_file(sc)
+    elif isinstance(warm_start, dict):
+        solution_file_path = warm_start.get(sc)
+    else:
+        raise ValueError(f"Invalid warm_start: {warm_start!r}, expected None, 'latest' or {{supply center: .sol path}}")
+
+    if solution_file_path is None or not os.path.exists(solution_file_path):
+        print(f"No warm start solution found for {sc}")
+        return None
+    print(f"Warm starting {sc} from {solution_file_path}")
+    return read_solution_file(solution_file_path)
+
+
+def _solve_supply_center_in_worker(sc, sub_data, solve_options):
+    """
+    在进程池的工作进程中求解单个供应中心, 返回 .sol 文件路径和该进程记录的阶段统计。
+    """
+    PROFILER.reset()
+    solution_file_path = _solve_supply_center(sc, sub_data, solve_options)
+    return solution_file_path, PROFILER.get_records()
+
+
+def _solve_supply_centers_in_parallel(model_params_cls, num_solve_workers, solve_options):
+    """
+    使用进程池并行建模求解各供应中心:
+    - 按供应中心规模(SKU数)从大到小提交, 使耗时最长的子问题最先开始;
+    - 机器的 CPU 核数在并发的求解器之间平分, 作为每个求解器的 Threads 参数(求解参数中已指定 Threads 时以其为准);
+    - 每个供应中心在独立进程中求解并写出各自的 .sol 文件, 单个供应中心失败不影响其他供应中心。
+    返回失败的供应中心及其错误信息 {供应中心: 错误信息}。
+    """
+    supply_center_set = sorted(
+        model_params_cls.supply_center_set, key=model_params_cls.get_supply_center_size, reverse=True
+    )
+    num_workers = min(num_solve_workers, len(supply_center_set))
+    worker_params = {'Threads': max(1, (os.cpu_count() or 1) // max(num_workers, 1)), **solve_options['params']}
+    worker_options = {**solve_options, 'params': worker_params}
+    print(f"Solving {len(supply_center_set)} supply centers with {num_workers} processes, "
+          f"Threads = {worker_params['Threads']} per solver, order: {supply_center_set}")
+
+    failed_supply_centers = {}
+    with ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = {}
+        for sc_index, sc in enumerate(supply_center_set):
+            sub_data = _get_sub_data(model_params_cls, supply_center_set, sc_index)
+            futures[executor.submit(
+                _solve_supply_center_in_worker, sc, sub_data, worker_options
+            )] = sc
 
-        model = MPSModel(env, sc, sub_data, params=params, relax_decision_vars=relax_decision_vars)
-        model.solve()
+        for future in as_completed(futures):
+            sc = futures[future]
+            try:
+                solution_file_path, records = future.result()
+            except Exception as e:
+                failed_supply_centers[sc] = repr(e)
+                print(f"Supply center {sc} failed: {e!r}")
+                continue
+            PROFILER.add_records(records)
+            print(f"Supply center {sc} solved, solution written to {solution_file_path}")
 
-        # 输出求解结果及结果后处理
-        model_writer = ModelWriter(model, sc)
-        solution_file_path = model_writer.write_solution()
-        
-        # 可视化库存曲线
-        if visualize:
-            data_visualizer = DataVisualizer(sc, solution_file_path, sub_data)
-            data_visualizer.visualize_all()
+    return failed_supply_centers
 
 
 
@@ -66,7 +359,24 @@ if __name__ == "__main__":
             'TimeLimit': 300
         }, 
         "relax_decision_vars": True,    # 是否将决策变量放松为连续变量
-        "visualize": False              # 是否可视化库存曲线
+        "visualize": False,             # 是否可视化库存曲线
+        "use_cache": True,              # 是否使用清洗后原始数据表的缓存
+        "num_load_workers": 7,          # 并行读取原始数据表的进程数, 1 表示顺序读取
+        "export_mode": "excel",         # 编辑后数据表的导出格式: "off", "parquet" 或 "excel"
+        "supply_centers": None,         # 只求解的供应中心列表, None 表示求解全部供应中心
+        "lazy_params": True,            # 是否按供应中心延迟生成模型参数, 并在求解当前中心时预先生成下一个中心的参数
+        "use_snapshot": False,          # 是否使用模型参数快照, 原始数据、起始周和计划周期不变时跳过数据预处理
+        "build_mode": "matrix",         # 模型构建方式: "expression" 逐个添加变量和约束, "matrix" 以矩阵形式一次性载入
+        "num_solve_workers": 1,         # 并行建模求解供应中心的进程数, 1 表示依次求解
+        "rolling_horizon": False,       # 是否滚动计划: 仍重新构建模型, 只以上一次计划的解(按起始周平移)作为 MIP 初始解; 原地修改模型需在进程内使用 RollingHorizonModel.solve_week
+        "warm_start": None,             # MIP 初始解: None 不使用, "latest" 使用各供应中心最近一次的 .sol 文件, 或 {供应中心: .sol 文件路径}
+        "tighten_big_m": True,          # 是否以由产能、需求、初始库存和PO到货推导出的上界代替 MOQ 和需求满足约束中的大 M
+        "decompose": False,             # 是否将供应中心按 工厂-SKU 连通分量分解为相互独立的子模型分别求解
+        "num_component_workers": 1,     # 并行求解各连通分量的线程数, 1 表示依次求解
+        "heuristic": None,              # 启发算法: None 不使用, "mip_start" 作为求解器的 MIP 初始解, "standalone" 只用启发算法生成计划
+        "time_window": None,            # 时间窗求解参数, None 表示直接求解整个模型, 如 {"length": 6, "overlap": 2, "time_limit": 30, "polish": True}
+        "presolve": True,               # 是否在建模前移除无需求、无目标库存且无PO到货的 SKU 及到货时已无需求的下单变量
+        "scenarios": None               # 需求场景 {场景名: 需求缩放系数}, 如 {"base": 1.0, "upside": 1.2, "downside": 0.8}, None 表示只求解原始需求; 不能与 presolve、heuristic、warm_start、rolling_horizon、visualize 同时启用
     }
 
     main(args)
@@ -1,45 +1,255 @@
 from coptpy import *
+from models.mps_matrix_builder import MPSMatrixBuilder
+from models.time_window_solver import TimeWindowSolver
+from util.profiler import PROFILER
 import datetime
+import numpy as np
 import os
 
 
+# 模型构建方式: 逐个添加变量和约束表达式 / 以矩阵形式一次性载入
+BUILD_MODES = ("expression", "matrix")
+
+
+def set_sub_problem_data(target, data):
+    """将子问题数据展开为 target 的属性, 供 MPSModel 和只计算矩阵数据的模型(如基准测试)共用"""
+    target.data = data
+    target.sku_set = data['sku_set']
+    target.factory_set = data['factory_set']
+    target.plan_duration = data['plan_duration']
+    target.SLA_S_dict = data['SLA_S_dict']
+    target.SLA_T_dict = data['SLA_T_dict']
+    target.factory_sku_lists_dict = data['factory_sku_lists_dict']
+    target.capacity_occupancy_dict = data['capacity_occupancy_dict']
+    target.normalized_capacity_dict = data['normalized_capacity_dict']
+    target.MOQ_dict = data['MOQ_dict']
+    target.intransit_PO_dict = data.get('week_arrival_quantity_from_PO', {})
+    target.initial_inventory_dict = data['initial_inventory_dict']
+    target.demand_dict = data['demand_dict']
+    target.required_inventory_level_dict = data['required_inventory_level_dict']
+    target.stock_cost_dict = data['stock_cost_dict']
+    target.loss_sales_cost_dict = data['loss_sales_cost_dict']
+    target.available_factory_set_of_skus = data['available_factory_set_of_skus']
+    target.po_capacity_occupation_dicts = data['po_capacity_occupation_dicts']
+    target.M = data['M']
+    # 各 SKU 保留的下单周数, 由 MPSPresolver 约简时给出, 缺省为 T - SLA_S
+    target.order_weeks_dict = data.get('order_weeks_dict', {})
+
+
 class MPSModel:
     """主生产调度问题模型，按 supply_center 划分子问题"""
-    def __init__(self, env, supply_center, data, params, relax_decision_vars):
+    def __init__(self, env, supply_center, data, params, relax_decision_vars, build_mode="expression", tighten_big_m=False,
+                 component=None, time_window=None):
+        if build_mode not in BUILD_MODES:
+            raise ValueError(f"Invalid build mode: {build_mode}, expected one of {BUILD_MODES}")
         print(f"Solving for supply center: {supply_center}")
         self.model = self._construct_model(env)
         self._set_params_for_solver(params)
         self.supply_center = supply_center
-        self.data = data
-        self.sku_set = data['sku_set']
-        self.factory_set = data['factory_set']
-        self.plan_duration = data['plan_duration']
-        self.SLA_S_dict = data['SLA_S_dict']
-        self.SLA_T_dict = data['SLA_T_dict']
-        self.factory_sku_lists_dict = data['factory_sku_lists_dict']
-        self.capacity_occupancy_dict = data['capacity_occupancy_dict']
-        self.normalized_capacity_dict = data['normalized_capacity_dict']
-        self.MOQ_dict = data['MOQ_dict']
-        self.intransit_PO_dict = data.get('week_arrival_quantity_from_PO', {})
-        self.initial_inventory_dict = data['initial_inventory_dict']
-        self.demand_dict = data['demand_dict']
-        self.required_inventory_level_dict = data['required_inventory_level_dict']
-        self.stock_cost_dict = data['stock_cost_dict']
-        self.loss_sales_cost_dict = data['loss_sales_cost_dict']
-        self.available_factory_set_of_skus = data['available_factory_set_of_skus']
-        self.po_capacity_occupation_dicts = data['po_capacity_occupation_dicts']
-        self.M = data['M']
+        # 按独立分量分解求解时的分量编号, 用于区分同一供应中心下各分量的 .mps 文件和阶段统计
+        self.component = component
+        self.model_label = supply_center if component is None else f"{supply_center}/{component}"
+        self._set_data(data)
 
         self.relax_decision_vars = relax_decision_vars
+        self.build_mode = build_mode
+        self.tighten_big_m = tighten_big_m
+        # 时间窗求解参数, 为 None 时直接求解整个模型, 否则按 TimeWindowSolver 进行 relax-and-fix / fix-and-optimize
+        self.time_window = time_window
+        self._time_window_solver = None
+        self.big_m_bounds = {}
+        self.num_big_m_tightened = 0
         self.variables = {}
-
-
-    def solve(self):
-        self._add_variables()
-        self._add_constraints()
-        self._set_objective()
-        self._save_model()
-        self.model.solve()
+        self._built = False
+        self._matrix_builder = None
+        self._matrix_arrays = None
+
+
+    def _set_data(self, data):
+        """设置子问题数据"""
+        set_sub_problem_data(self, data)
+
+
+    def build(self):
+        """构建模型, 已构建时不重复构建"""
+        if self._built:
+            return
+        with PROFILER.stage(f"MPSModel.build[{self.model_label}]") as record:
+            if self.build_mode == "matrix":
+                self._load_matrix_model()
+            else:
+                if self.tighten_big_m:
+                    self._derive_big_m_bounds()
+                self._add_variables()
+                self._add_constraints()
+                self._set_objective()
+            record['build_mode'] = self.build_mode
+            record['big_m_tightened'] = self.num_big_m_tightened
+            record['rows'] = self.model.getAttr(COPT.Attr.Rows)
+            record['cols'] = self.model.getAttr(COPT.Attr.Cols)
+        self._built = True
+
+
+    def update_data(self, data):
+        """
+        用新的子问题数据更新已构建的模型(仅 matrix 构建方式)。
+        变量和约束的名称与顺序不变时(SKU、工厂、SLA 等结构不变, 只有需求、到货、产能等数值变化),
+        只修改变化的目标系数、变量和约束的上下界以及约束矩阵系数, 不重建模型; 否则重新载入整个模型。
+        返回是否在原模型上完成了更新。
+        """
+        if self.build_mode != "matrix":
+            raise ValueError("update_data requires build_mode='matrix'")
+        self._set_data(data)
+        if not self._built:
+            self.build()
+            return False
+        if self._time_window_solver is not None:
+            # 时间窗求解固定过的整数变量恢复原状
+            self._time_window_solver.restore()
+            self._time_window_solver = None
+
+        with PROFILER.stage(f"MPSModel.update[{self.model_label}]") as record:
+            builder = MPSMatrixBuilder(self)
+            arrays = builder.build_arrays()
+            self._report_big_m_tightening(builder.num_big_m_tightened)
+            old_arrays = self._matrix_arrays
+            in_place = (
+                arrays['var_names'] == old_arrays['var_names'] and
+                arrays['constr_names'] == old_arrays['constr_names'] and
+                arrays['vtype'] == old_arrays['vtype']
+            )
+            if in_place:
+                record['changed'] = self._apply_matrix_changes(old_arrays, arrays)
+            else:
+                self.variables = MPSMatrixBuilder.load_arrays(self.model, arrays)
+            self._matrix_builder = builder
+            self._matrix_arrays = arrays
+            record['in_place'] = in_place
+
+        print(f"Model for {self.supply_center} {'updated in place' if in_place else 'reloaded'}")
+        return in_place
+
+
+    def update_demand(self, data):
+        """
+        用只有需求和目标库存水平变化的子问题数据更新已构建的模型(仅 matrix 构建方式), SKU、工厂等模型结构须保持不变。
+        不重新计算约束矩阵, 只修改 Inventory_* 和 Required_inventory_* 的右端项, 启用 tighten_big_m 时还修改随需求变化的大 M 系数。
+        返回修改的数量。
+        """
+        if self.build_mode != "matrix":
+            raise ValueError("update_demand requires build_mode='matrix'")
+        if self._built and (data['sku_set'] != self.sku_set or data['factory_set'] != self.factory_set):
+            raise ValueError(f"update_demand requires the same SKUs and factories for {self.supply_center}")
+        self._set_data(data)
+        if not self._built:
+            self.build()
+            return 0
+        if self._time_window_solver is not None:
+            self._time_window_solver.restore()
+            self._time_window_solver = None
+
+        with PROFILER.stage(f"MPSModel.update_demand[{self.model_label}]") as record:
+            changed = self._matrix_builder.update_demand(self.model, self._matrix_arrays)
+            self._report_big_m_tightening(self._matrix_builder.num_big_m_tightened)
+            record['changed'] = changed
+        print(f"Demand of {self.supply_center} updated in place, {changed} coefficients and bounds changed")
+        return changed
+
+
+    def set_mip_start(self, values):
+        """
+        以 {变量名: 取值} 设置 MIP 初始解, 当前模型中不存在的变量名被忽略。
+        设置前修复初始解: 整数和 0-1 变量取整, 取值截断到变量上下界, 下单指示变量 z 与下单量 x 保持一致。
+        返回实际设置的变量数。
+        """
+        self.build()
+        integer_var_types = {'order_indicator_vars', 'demand_statisfied_indicator_vars'}
+        if not self.relax_decision_vars:
+            integer_var_types.add('order_decision_vars')
+
+        start_values = {}
+        for var_type, variables in self.variables.items():
+            for name in variables.keys() & values.keys():
+                value = values[name]
+                start_values[name] = (variables[name], round(value) if var_type in integer_var_types else value)
+        num_dropped = len(values) - len(start_values)
+
+        # 有下单量即下单, 过滤后的 .sol 文件中不含 z, 同样由 x 推出
+        order_indicator_vars = self.variables['order_indicator_vars']
+        for name, (_, value) in list(start_values.items()):
+            if name.startswith('x_') and f"z{name[1:]}" in order_indicator_vars:
+                start_values[f"z{name[1:]}"] = (order_indicator_vars[f"z{name[1:]}"], 1 if value > 0 else 0)
+
+        start_vars = [var for var, _ in start_values.values()]
+        if start_vars:
+            lb = np.asarray(self.model.getInfo(COPT.Info.LB, start_vars), dtype=float)
+            ub = np.asarray(self.model.getInfo(COPT.Info.UB, start_vars), dtype=float)
+            clipped_values = np.clip([value for _, value in start_values.values()], lb, ub)
+            self.model.setMipStart(start_vars, clipped_values.tolist())
+            self.model.loadMipStart()
+        print(f"MIP start for {self.supply_center}: {len(start_vars)} values set, {num_dropped} unknown names dropped")
+        return len(start_vars)
+
+
+    def get_solution_values(self):
+        """
+        获取当前解 {变量名: 取值}, 没有可行解时返回空字典。
+        """
+        if not self._built or not self.model.getAttr(COPT.Attr.HasMipSol):
+            return {}
+        all_vars = self.model.getVars().tolist()
+        return dict(zip([var.name for var in all_vars], self.model.getValues()))
+
+
+    def solve(self, save_model=True):
+        self.build()
+        if save_model:
+            with PROFILER.stage(f"MPSModel.save_model[{self.model_label}]"):
+                self._save_model()
+        with PROFILER.stage(f"MPSModel.solve[{self.model_label}]") as record:
+            if self.time_window is not None:
+                self._time_window_solver = TimeWindowSolver(self, **self.time_window)
+                self._time_window_solver.solve()
+            else:
+                self.model.solve()
+            record['status'] = self.model.status
+
+
+    def solve_scenarios(self, scenario_data):
+        """
+        在同一个模型上依次求解多个需求场景(仅 matrix 构建方式)。scenario_data 为 {场景名: 子问题数据},
+        各场景的 SKU、工厂、SLA 等模型结构应一致, 只有需求、目标库存等数值不同。
+        模型只在第一个场景构建一次, 之后每个场景通过 update_demand 只修改变化的约束右端项(Inventory_* 和 Required_inventory_*,
+        启用 tighten_big_m 时还包括随需求变化的大 M 系数), 并以上一个场景的解为 MIP 初始解求解。
+        返回 {场景名: {'status': 求解状态, 'objective_value': 目标值, 'values': {变量名: 取值}}}, 没有可行解时后两者为 None 和空字典。
+        """
+        if self.build_mode != "matrix":
+            raise ValueError("solve_scenarios requires build_mode='matrix'")
+
+        results = {}
+        previous_values = {}
+        for scenario, data in scenario_data.items():
+            with PROFILER.stage(f"MPSModel.scenario[{self.model_label}/{scenario}]") as record:
+                self.update_demand(data)
+                if previous_values:
+                    self.set_mip_start(previous_values)
+                self.solve(save_model=False)
+                values = self.get_solution_values()
+                record['status'] = self.model.status
+
+            results[scenario] = {
+                'status': self.model.status,
+                'objective_value': self.model.objval if values else None,
+                'values': values,
+            }
+            previous_values = values or previous_values
+            print(f"Scenario {scenario} of {self.supply_center} solved, objective value: {results[scenario]['objective_value']}")
+        return results
+
+
+    def write_solution_file(self, file_name):
+        """将当前解写入 .sol 文件"""
+        self.model.write(file_name)
 
 
     def _set_params_for_solver(self, params):
@@ -50,7 +260,8 @@ class MPSModel:
     def _save_model(self):
         current_time = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         os.makedirs(f"./mps/supply_center_{self.supply_center}", exist_ok=True)
-        mps_file_name = f"./mps/supply_center_{self.supply_center}/mps_model_{current_time}.mps"
+        suffix = f"_component_{self.component}" if self.component is not None else ""
+        mps_file_name = f"./mps/supply_center_{self.supply_center}/mps_model_{current_time}{suffix}.mps"
         self.model.write(mps_file_name)
         print(f".mps model file has been saved to {mps_file_name}")
 
@@ -60,6 +271,69 @@ class MPSModel:
         return model
 
 
+    def _load_matrix_model(self):
+        """以矩阵形式构建并载入变量、约束和目标函数"""
+        builder = MPSMatrixBuilder(self)
+        self.variables, self._matrix_arrays = builder.load_into(self.model)
+        self._matrix_builder = builder
+        self._report_big_m_tightening(builder.num_big_m_tightened)
+
+        print(f"Added {len(self.variables)} variables for {self.supply_center}")
+        print(f"Added constraints for {self.supply_center}")
+        print(f"Objective function set for {self.supply_center}")
+
+
+    def _derive_big_m_bounds(self):
+        """由数据推导各下单量、库存和缺货量变量的大 M 上界, 供逐个添加约束时使用"""
+        builder = MPSMatrixBuilder(self)
+        self.big_m_bounds = builder.get_big_m_bounds()
+        self._report_big_m_tightening(builder.num_big_m_tightened)
+
+
+    def _report_big_m_tightening(self, num_tightened):
+        self.num_big_m_tightened = num_tightened
+        if self.tighten_big_m:
+            print(f"Big-M tightened in {num_tightened} constraints for {self.supply_center}")
+
+
+    def _get_order_weeks(self, p):
+        """SKU p 的下单变量周数, 下单周 tau in [0, 下单周数)"""
+        return self.order_weeks_dict.get(p, self.plan_duration - int(self.SLA_S_dict[p]))
+
+
+    def _get_big_m(self, var_name):
+        """获取变量的大 M 上界, 未推导时为 M"""
+        return self.big_m_bounds.get(var_name, self.M)
+
+
+    def _apply_matrix_changes(self, old_arrays, arrays):
+        """
+        将新旧矩阵数据之间变化的目标系数、变量上下界、约束上下界和约束矩阵系数写入模型, 返回变化的数量。
+        """
+        all_vars = self.model.getVars().tolist()
+        all_constrs = self.model.getConstrs().tolist()
+        changed = 0
+        for key, info, items in (
+            ('obj', COPT.Info.Obj, all_vars), ('lb', COPT.Info.LB, all_vars), ('ub', COPT.Info.UB, all_vars),
+            ('row_lb', COPT.Info.LB, all_constrs), ('row_ub', COPT.Info.UB, all_constrs),
+        ):
+            indices = np.flatnonzero(old_arrays[key] != arrays[key]).tolist()
+            if indices:
+                self.model.setInfo(info, [items[i] for i in indices], arrays[key][indices].tolist())
+                changed += len(indices)
+
+        # 系数变化(包括新增和变为 0)的位置
+        diff = (arrays['A'] - old_arrays['A']).tocoo()
+        diff.eliminate_zeros()
+        if diff.nnz:
+            new_values = np.asarray(arrays['A'].tocsr()[diff.row, diff.col]).ravel()
+            self.model.setCoeffs(
+                [all_constrs[i] for i in diff.row.tolist()], [all_vars[j] for j in diff.col.tolist()], new_values.tolist()
+            )
+            changed += diff.nnz
+        return changed
+
+
     def _add_variables(self):
         """添加决策变量"""
         self._add_order_decision_vars()
@@ -105,7 +379,7 @@ class MPSModel:
                 if self.plan_duration - int(self.SLA_S_dict[p]) <= 0:
                     print(f"Warning! {p} will NOT be included in this plan since its supply SLA {self.SLA_S_dict[p]} >= plan duration {self.plan_duration}")
                 else:
-                    for t in range(self.plan_duration - int(self.SLA_S_dict[p])):
+                    for t in range(self._get_order_weeks(p)):
                         var_name = f"x_{f}_{p}_{t}"
                         if self.relax_decision_vars:
                             self.variables[var_type][var_name] = self.model.addVar(vtype=COPT.CONTINUOUS, name=var_name, lb=0)
@@ -121,7 +395,7 @@ class MPSModel:
             for p in self.factory_sku_lists_dict[f]:
                 q = self.MOQ_dict[p]
                 if q > 0:
-                    for t in range(self.plan_duration - int(self.SLA_S_dict[p])):
+                    for t in range(self._get_order_weeks(p)):
                         var_name = f"z_{f}_{p}_{t}"
                         self.variables[var_type][var_name] = self.model.addVar(vtype=COPT.BINARY, name=var_name)
 
@@ -172,7 +446,7 @@ class MPSModel:
             for t in range(self.plan_duration):
                 lhs = 0.0
                 for p in self.factory_sku_lists_dict[f]:
-                    for tau in range(self.plan_duration - int(self.SLA_S_dict[p])):
+                    for tau in range(self._get_order_weeks(p)):
                         if tau + self.SLA_S_dict[p] - self.SLA_T_dict[p] - 1 == t:
                             coeff = self.capacity_occupancy_dict[f][p][t]
                             order_decision_var = self.variables['order_decision_vars'][f"x_{f}_{p}_{tau}"]
@@ -187,7 +461,7 @@ class MPSModel:
         """添加最小下单量约束"""
         for f in self.factory_set:
             for p in self.factory_sku_lists_dict[f]:
-                for t in range(self.plan_duration - int(self.SLA_S_dict[p])):
+                for t in range(self._get_order_weeks(p)):
                     q = self.MOQ_dict[p]  # 获取 MOQ 值
                     if q > 0:
                         order_decision_var = self.variables['order_decision_vars'][f"x_{f}_{p}_{t}"]
@@ -197,7 +471,8 @@ class MPSModel:
                         self.model.addConstr(order_decision_var >= q * order_indicator_var, name=f"MOQ_{f}_{p}_{t}")
                         
                         # 添加约束：订单量 <= M * 订单指示变量
-                        self.model.addConstr(order_decision_var <= self.M * order_indicator_var, name=f"OrderIndicator_{f}_{p}_{t}")
+                        big_m = self._get_big_m(f"x_{f}_{p}_{t}")
+                        self.model.addConstr(order_decision_var <= big_m * order_indicator_var, name=f"OrderIndicator_{f}_{p}_{t}")
 
 
     def _add_inventory_balance_constraints(self):
@@ -205,7 +480,7 @@ class MPSModel:
         for p in self.sku_set:
             for t in range(self.plan_duration):
                 sum_prod = 0
-                if t >= int(self.SLA_S_dict[p]):
+                if 0 <= t - int(self.SLA_S_dict[p]) < self._get_order_weeks(p):
                     for f in self.available_factory_set_of_skus[p]:
                         tau = int(t - self.SLA_S_dict[p])
                         order_decision_var = self.variables['order_decision_vars'][f"x_{f}_{p}_{tau}"]
@@ -245,11 +520,11 @@ class MPSModel:
                 stockout_var = self.variables['stockout_vars'][f"u_{p}_{t}"]
 
                 self.model.addConstr(
-                    stockout_var <= self.M * (1 - demand_satisfied_indicator),
+                    stockout_var <= self._get_big_m(f"u_{p}_{t}") * (1 - demand_satisfied_indicator),
                     name=f"DemandSatisfaction_{p}_{t}_1"
                 )
                 self.model.addConstr(
-                    inventory_var <= self.M * demand_satisfied_indicator,
+                    inventory_var <= self._get_big_m(f"I_{p}_{t}") * demand_satisfied_indicator,
                     name=f"DemandSatisfaction_{p}_{t}_2"
                 )
     
@@ -259,10 +534,11 @@ class MPSModel:
         for p in self.sku_set:
             for t in range(int(self.SLA_S_dict[p]), self.plan_duration):
                 sum_prod = 0
-                for f in self.available_factory_set_of_skus[p]:
-                    tau = int(t - self.SLA_S_dict[p])
-                    order_decision_var = self.variables['order_decision_vars'][f"x_{f}_{p}_{tau}"]
-                    sum_prod += order_decision_var
+                if t - int(self.SLA_S_dict[p]) < self._get_order_weeks(p):
+                    for f in self.available_factory_set_of_skus[p]:
+                        tau = int(t - self.SLA_S_dict[p])
+                        order_decision_var = self.variables['order_decision_vars'][f"x_{f}_{p}_{tau}"]
+                        sum_prod += order_decision_var
                 
                 required_inventory_level = self.required_inventory_level_dict.get(p, {})[t]
                 prev_inventory_var = self.variables['inventory_vars'][f"I_{p}_{t - 1}"] if t > 0 else self.initial_inventory_dict.get(p, 0)
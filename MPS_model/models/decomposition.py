@@ -0,0 +1,179 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+from coptpy import COPT
+from models.MPS_model import MPSModel
+from models.mps_matrix_builder import MPSMatrixBuilder
+from util.profiler import PROFILER
+
+
+def find_independent_components(data):
+    """
+    计算供应中心内 工厂-SKU 二部图的连通分量。不同分量的 SKU 之间不共享工厂的产能约束, 可以各自独立求解。
+    没有可用工厂的 SKU 合并为一个分量, 不生产任何 SKU 的工厂不属于任何分量。
+    返回 [(工厂列表, SKU列表)], 工厂和 SKU 保持原有顺序, 分量按 SKU 数从大到小排列。
+    """
+    parent = {}
+
+    def find(node):
+        root = node
+        while parent[root] != root:
+            root = parent[root]
+        while parent[node] != root:
+            parent[node], node = root, parent[node]
+        return root
+
+    def union(a, b):
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[root_b] = root_a
+
+    for p in data['sku_set']:
+        parent[('sku', p)] = ('sku', p)
+    for f in data['factory_set']:
+        parent[('factory', f)] = ('factory', f)
+    for f in data['factory_set']:
+        for p in data['factory_sku_lists_dict'][f]:
+            union(('factory', f), ('sku', p))
+    for p in data['sku_set']:
+        for f in data['available_factory_set_of_skus'][p]:
+            union(('factory', f), ('sku', p))
+
+    # 合并时总以工厂一侧为根, 根仍为 SKU 本身说明该 SKU 没有可用工厂
+    component_index = {}
+    components = []
+    for p in data['sku_set']:
+        root = find(('sku', p))
+        if root[0] == 'sku':
+            root = None
+        if root not in component_index:
+            component_index[root] = len(components)
+            components.append(([], []))
+        components[component_index[root]][1].append(p)
+    for f in data['factory_set']:
+        root = find(('factory', f))
+        if root in component_index:
+            components[component_index[root]][0].append(f)
+
+    return sorted(components, key=lambda component: len(component[1]), reverse=True)
+
+
+def extract_component_data(data, factories, skus):
+    """
+    提取一个独立分量的子问题数据。按键取值的参数表无需裁剪, 只替换 SKU、工厂集合及其对应关系。
+    """
+    component_data = dict(data)
+    component_data['sku_set'] = skus
+    component_data['factory_set'] = factories
+    component_data['factory_sku_lists_dict'] = {f: data['factory_sku_lists_dict'][f] for f in factories}
+    component_data['available_factory_set_of_skus'] = {p: data['available_factory_set_of_skus'][p] for p in skus}
+    return component_data
+
+
+class DecomposedMPSModel:
+    """
+    按 工厂-SKU 连通分量分解的 MPS 模型: 每个分量单独建模求解, 各分量共享同一个 COPT 环境,
+    num_workers > 1 时在线程池中并行求解(COPT 求解时释放 GIL), CPU 核数在并发的求解器之间平分。
+    各分量的目标函数之和即为整个供应中心的目标值, 求解结果合并写入同一个 .sol 文件。
+    """
+    def __init__(self, env, supply_center, data, params, relax_decision_vars, build_mode="expression",
+                 tighten_big_m=False, num_workers=1, time_window=None):
+        self.supply_center = supply_center
+        self.num_workers = max(1, num_workers)
+
+        components = find_independent_components(data)
+        print(f"Supply center {supply_center} decomposed into {len(components)} independent components, "
+              f"largest with {len(components[0][1]) if components else 0} SKUs")
+
+        component_params = dict(params)
+        if self.num_workers > 1:
+            component_params = {'Threads': max(1, (os.cpu_count() or 1) // self.num_workers), **params}
+        self.component_models = [
+            MPSModel(
+                env, supply_center, extract_component_data(data, factories, skus), params=component_params,
+                relax_decision_vars=relax_decision_vars, build_mode=build_mode, tighten_big_m=tighten_big_m,
+                component=k, time_window=time_window
+            )
+            for k, (factories, skus) in enumerate(components)
+        ]
+
+
+    def build(self):
+        """构建各分量的模型"""
+        for component_model in self.component_models:
+            component_model.build()
+
+
+    def set_mip_start(self, values):
+        """
+        按变量名将 {变量名: 取值} 分配到各分量并设置 MIP 初始解, 返回实际设置的变量数。
+        """
+        self.build()
+        component_of_var = {
+            name: k
+            for k, component_model in enumerate(self.component_models)
+            for variables in component_model.variables.values() for name in variables
+        }
+        component_values = [{} for _ in self.component_models]
+        for name, value in values.items():
+            k = component_of_var.get(name)
+            if k is not None:
+                component_values[k][name] = value
+
+        num_set = sum(
+            component_model.set_mip_start(start_values)
+            for component_model, start_values in zip(self.component_models, component_values) if start_values
+        )
+        num_dropped = len(values) - sum(len(start_values) for start_values in component_values)
+        print(f"MIP start for {self.supply_center}: {num_set} values set, {num_dropped} unknown names dropped")
+        return num_set
+
+
+    def get_solution_values(self):
+        """合并各分量的当前解 {变量名: 取值}, 任一分量没有可行解时返回空字典。"""
+        values = {}
+        for component_model in self.component_models:
+            component_values = component_model.get_solution_values()
+            if not component_values:
+                return {}
+            values.update(component_values)
+        return values
+
+
+    def solve(self):
+        self.build()
+        with PROFILER.stage(f"DecomposedMPSModel.solve[{self.supply_center}]") as record:
+            if self.num_workers > 1:
+                with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+                    list(executor.map(MPSModel.solve, self.component_models))
+            else:
+                for component_model in self.component_models:
+                    component_model.solve()
+            record['components'] = len(self.component_models)
+            record['num_workers'] = self.num_workers
+
+
+    def get_objective_value(self):
+        """各分量目标值之和"""
+        return sum(component_model.model.objval for component_model in self.component_models)
+
+
+    def write_solution_file(self, file_name):
+        """
+        将各分量的解合并写入一个 .sol 文件, 格式与 COPT 输出的 .sol 文件一致, 变量按类型分组排列。
+        任一分量没有可行解时抛出 RuntimeError。
+        """
+        missing = [
+            component_model.component for component_model in self.component_models
+            if not component_model.model.getAttr(COPT.Attr.HasMipSol)
+        ]
+        if missing:
+            raise RuntimeError(f"No feasible solution for components {missing} of {self.supply_center}")
+
+        component_values = [component_model.get_solution_values() for component_model in self.component_models]
+        with open(file_name, 'w') as f:
+            f.write(f"# Objective value {self.get_objective_value():.15g}\n")
+            for var_type, _ in MPSMatrixBuilder.VAR_TYPES:
+                for component_model, values in zip(self.component_models, component_values):
+                    for name in component_model.variables[var_type]:
+                        f.write(f"{name} {values[name]:.15g}\n")
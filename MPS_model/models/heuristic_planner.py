@@ -0,0 +1,164 @@
+import math
+
+import numpy as np
+
+from util.profiler import PROFILER
+
+
+# 目标函数中未满足目标库存水平的单位惩罚, 与 MPSModel 的目标函数一致
+SLACK_COST = 5
+
+
+class HeuristicPlanner:
+    """
+    考虑 MOQ 的构造式启发算法, 直接由单个供应中心的子问题数据在数秒内生成可行的主生产计划:
+    - 按缺货成本从高到低依次处理 SKU, 逐周推演库存;
+    - 第 t 周的可用库存(上周库存 + PO到货)不足以覆盖需求(单位库存成本低于目标库存惩罚时覆盖目标库存水平)时,
+      在第 t - SLA_S 周向可用工厂下单, 下单量不少于 MOQ, 且不超过其占用产能周(tau + SLA_S - SLA_T - 1)
+      扣除PO占用和已分配订单后的剩余产能, 按剩余产能从多到少在多个工厂间分配;
+    - 库存、缺货量、需求满足指示变量和目标库存松弛变量按库存平衡推算。
+    输出与 MPSModel 变量命名一致的完整计划 {变量名: 取值}, 可单独使用, 也可作为求解器的 MIP 初始解。
+    """
+    def __init__(self, supply_center, data, relax_decision_vars=False):
+        self.supply_center = supply_center
+        self.data = data
+        self.relax_decision_vars = relax_decision_vars
+        self.T = data['plan_duration']
+        self.values = {}
+        self.objective_value = None
+
+
+    def plan(self):
+        """生成计划并返回 {变量名: 取值}"""
+        with PROFILER.stage(f"HeuristicPlanner.plan[{self.supply_center}]") as record:
+            self.values = self._initialize_values()
+            remaining_capacity = self._remaining_capacity()
+            skus = sorted(self.data['sku_set'], key=lambda p: self.data['loss_sales_cost_dict'][p], reverse=True)
+            self.objective_value = sum(self._plan_sku(p, remaining_capacity) for p in skus)
+            record['rows'] = len(self.values)
+            record['objective_value'] = self.objective_value
+
+        print(f"Heuristic plan for {self.supply_center} generated with objective value {self.objective_value:.2f}")
+        return self.values
+
+
+    def write_solution_file(self, file_name):
+        """将计划写入与 COPT 输出格式一致的 .sol 文件"""
+        if self.objective_value is None:
+            self.plan()
+        with open(file_name, 'w') as f:
+            f.write(f"# Objective value {self.objective_value:.15g}\n")
+            for name, value in self.values.items():
+                f.write(f"{name} {value:.15g}\n")
+
+
+    def _initialize_values(self):
+        """按 MPSModel 的变量顺序为全部变量赋初值 0"""
+        T, data = self.T, self.data
+        order_weeks_dict = data.get('order_weeks_dict', {})
+        values = {}
+        for f in data['factory_set']:
+            for p in data['factory_sku_lists_dict'][f]:
+                for t in range(order_weeks_dict.get(p, T - int(data['SLA_S_dict'][p]))):
+                    values[f"x_{f}_{p}_{t}"] = 0
+        for f in data['factory_set']:
+            for p in data['factory_sku_lists_dict'][f]:
+                if data['MOQ_dict'][p] > 0:
+                    for t in range(order_weeks_dict.get(p, T - int(data['SLA_S_dict'][p]))):
+                        values[f"z_{f}_{p}_{t}"] = 0
+        for prefix in ('e', 'I', 'u'):
+            for p in data['sku_set']:
+                for t in range(T):
+                    values[f"{prefix}_{p}_{t}"] = 0
+        for p in data['sku_set']:
+            for t in range(int(data['SLA_S_dict'][p]), T):
+                values[f"s_{p}_{t}"] = 0
+        return values
+
+
+    def _remaining_capacity(self):
+        """各工厂每周扣除PO占用后的剩余产能 {工厂: ndarray}"""
+        data = self.data
+        remaining_capacity = {}
+        for f in data['factory_set']:
+            capacity = np.asarray(data['normalized_capacity_dict'][f], dtype=float)
+            if f in data['po_capacity_occupation_dicts'].keys():
+                capacity = capacity - np.asarray(data['po_capacity_occupation_dicts'][f], dtype=float)
+            remaining_capacity[f] = np.maximum(capacity, 0)
+        return remaining_capacity
+
+
+    def _plan_sku(self, p, remaining_capacity):
+        """为单个 SKU 下单并推算库存, 返回该 SKU 在目标函数中的成本"""
+        T, data, values = self.T, self.data, self.values
+        sla_s, sla_t = int(data['SLA_S_dict'][p]), int(data['SLA_T_dict'][p])
+        moq = data['MOQ_dict'][p]
+        stock_cost, loss_sales_cost = data['stock_cost_dict'][p], data['loss_sales_cost_dict'][p]
+        demand = np.asarray(data['demand_dict'][p], dtype=float)
+        po_arrival = np.asarray(data['week_arrival_quantity_from_PO'][p], dtype=float)
+        required_inventory_level = np.asarray(data['required_inventory_level_dict'][p], dtype=float)
+        factories = list(data['available_factory_set_of_skus'][p])
+        occupancy = {f: np.asarray(data['capacity_occupancy_dict'][f][p], dtype=float) for f in factories}
+        cover_required_level = stock_cost < SLACK_COST
+
+        cost = 0.0
+        prev_inventory = data['initial_inventory_dict'].get(p, 0)
+        for t in range(T):
+            available = prev_inventory + po_arrival[t]
+            # 第 0 周的库存平衡不含下单量, 只在 t >= max(SLA_S, 1) 时下单
+            if t >= max(sla_s, 1) and factories:
+                target = max(demand[t], required_inventory_level[t]) if cover_required_level else demand[t]
+                if target > available:
+                    available += self._place_orders(
+                        p, t - sla_s, target - available, moq, sla_s, sla_t, factories, occupancy, remaining_capacity
+                    )
+
+            inventory = available - demand[t]
+            stockout = max(-inventory, 0)
+            inventory = max(inventory, 0)
+            values[f"I_{p}_{t}"] = inventory
+            values[f"u_{p}_{t}"] = stockout
+            values[f"e_{p}_{t}"] = 0 if stockout > 0 else 1
+            cost += stock_cost * inventory
+            if t >= sla_s:
+                slack = max(required_inventory_level[t] - available, 0)
+                values[f"s_{p}_{t}"] = slack
+                cost += loss_sales_cost * stockout + SLACK_COST * slack
+            prev_inventory = inventory
+        return cost
+
+
+    def _place_orders(self, p, tau, need, moq, sla_s, sla_t, factories, occupancy, remaining_capacity):
+        """
+        在第 tau 周为 SKU p 下单 need 件, 按可下单量从多到少在各工厂间分配, 每个工厂的下单量不少于 MOQ 且不超过剩余产能。
+        返回实际下单总量。
+        """
+        capacity_week = tau + sla_s - sla_t - 1
+        capacity_limited = 0 <= capacity_week < self.T
+
+        def max_order_quantity(f):
+            if not capacity_limited or occupancy[f][capacity_week] <= 0:
+                return math.inf
+            quantity = remaining_capacity[f][capacity_week] / occupancy[f][capacity_week]
+            return quantity if self.relax_decision_vars else math.floor(quantity + 1e-9)
+
+        ordered = 0
+        for f in sorted(factories, key=max_order_quantity, reverse=True):
+            if need - ordered <= 0:
+                break
+            quantity = max(need - ordered, moq)
+            if not self.relax_decision_vars:
+                quantity = math.ceil(quantity - 1e-9)
+            quantity = min(quantity, max_order_quantity(f))
+            if quantity <= 0 or quantity < moq:
+                continue
+
+            self.values[f"x_{f}_{p}_{tau}"] += quantity
+            if moq > 0:
+                self.values[f"z_{f}_{p}_{tau}"] = 1
+            if capacity_limited:
+                remaining_capacity[f][capacity_week] = max(
+                    remaining_capacity[f][capacity_week] - quantity * occupancy[f][capacity_week], 0
+                )
+            ordered += quantity
+        return ordered
@@ -0,0 +1,578 @@
+from coptpy import COPT
+from data_processor.param_tables import PairSeriesTable, SeriesTable
+import numpy as np
+from scipy import sparse
+
+
+class MPSMatrixBuilder:
+    """
+    以矩阵形式构建 MPS 模型: 由参数数组和整数索引数组直接计算每个变量的列号和每个约束的行号,
+    以 COO 三元组拼装约束矩阵, 再通过 COPT 的 loadMatrix 一次性载入模型。
+    变量、约束的顺序和命名与逐个添加变量和约束的构建方式一致。
+    """
+    # 变量类型及其名称前缀, 顺序即变量在模型中的列顺序
+    VAR_TYPES = (
+        ('order_decision_vars', 'x'),
+        ('order_indicator_vars', 'z'),
+        ('demand_statisfied_indicator_vars', 'e'),
+        ('inventory_vars', 'I'),
+        ('stockout_vars', 'u'),
+        ('slack_vars', 's'),
+    )
+
+    def __init__(self, mps_model):
+        self._m = mps_model
+        self._T = mps_model.plan_duration
+        self._skus = list(mps_model.sku_set)
+        self._factories = list(mps_model.factory_set)
+        self._sku_index = {p: i for i, p in enumerate(self._skus)}
+        self._factory_index = {f: i for i, f in enumerate(self._factories)}
+
+        self._sla_s = np.array([int(mps_model.SLA_S_dict[p]) for p in self._skus], dtype=np.int64)
+        self._sla_t = np.array([int(mps_model.SLA_T_dict[p]) for p in self._skus], dtype=np.int64)
+
+        self._columns = {}  # {变量类型: (名称列表, 目标系数, 下界, 上界, 变量类型)}
+        self._row_blocks = []  # [(约束类型, 名称列表, 行下界, 行上界, 行号, 列号, 系数)]
+        self._row_starts = {}  # {约束类型: 起始行号}
+        self._constrs = None  # 已载入模型的约束对象, 在首次 update_demand 时取出并复用
+
+        self._index_order_pairs()
+        self._index_columns()
+        self._derive_big_m_bounds()
+
+
+    def build_arrays(self):
+        """
+        计算模型的全部矩阵数据, 返回字典:
+        var_names / obj / lb / ub / vtype 为各列(变量)的数据, constr_names / row_lb / row_ub 为各行(约束)的数据,
+        A 为 CSC 格式的约束矩阵, var_type_sizes 为各类变量的 (变量类型, 变量数)。
+        """
+        self._row_blocks = []
+        self._add_capacity_rows()
+        self._add_moq_rows()
+        self._add_inventory_balance_rows()
+        self._add_demand_satisfaction_rows()
+        self._add_required_inventory_rows()
+
+        var_names, obj, lb, ub, vtype, var_type_sizes = [], [], [], [], [], []
+        for var_type, _ in self.VAR_TYPES:
+            names, var_obj, var_lb, var_ub, var_vtype = self._columns[var_type]
+            var_names.extend(names)
+            obj.append(var_obj)
+            lb.append(var_lb)
+            ub.append(var_ub)
+            vtype.extend([var_vtype] * len(names))
+            var_type_sizes.append((var_type, len(names)))
+
+        constr_names, row_lb, row_ub, rows, cols, vals = [], [], [], [], [], []
+        num_rows = 0
+        for block, names, block_lb, block_ub, block_rows, block_cols, block_vals in self._row_blocks:
+            self._row_starts[block] = num_rows
+            constr_names.extend(names)
+            row_lb.append(block_lb)
+            row_ub.append(block_ub)
+            rows.append(block_rows + num_rows)
+            cols.append(block_cols)
+            vals.append(block_vals)
+            num_rows += len(names)
+
+        A = sparse.coo_matrix(
+            (np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))), shape=(num_rows, len(var_names))
+        ).tocsc()
+
+        return {
+            'var_names': var_names,
+            'obj': np.concatenate(obj),
+            'lb': np.concatenate(lb),
+            'ub': np.concatenate(ub),
+            'vtype': vtype,
+            'constr_names': constr_names,
+            'row_lb': np.concatenate(row_lb),
+            'row_ub': np.concatenate(row_ub),
+            'A': A,
+            'var_type_sizes': var_type_sizes,
+        }
+
+
+    @staticmethod
+    def load_arrays(model, arrays):
+        """
+        将 build_arrays 计算的矩阵数据一次性载入 COPT 模型(替换模型中已有的内容), 返回 {变量类型: {变量名: Var}}。
+        """
+        model.loadMatrix(
+            arrays['obj'], arrays['A'], arrays['row_lb'], arrays['row_ub'], arrays['lb'], arrays['ub'], arrays['vtype']
+        )
+        model.setObjSense(COPT.MINIMIZE)
+        # 没有变量或约束时(如供应中心的 SKU 均被 MPSPresolver 移除) setNames 会报错, 跳过命名
+        if arrays['var_names']:
+            model.setNames(model.getVars(), arrays['var_names'])
+        if arrays['constr_names']:
+            model.setNames(model.getConstrs(), arrays['constr_names'])
+
+        all_vars = model.getVars().tolist()
+        variables, start = {}, 0
+        for var_type, size in arrays['var_type_sizes']:
+            variables[var_type] = dict(zip(arrays['var_names'][start: start + size], all_vars[start: start + size]))
+            start += size
+        return variables
+
+
+    def load_into(self, model):
+        """
+        将变量、约束和目标函数载入 COPT 模型, 返回 ({变量类型: {变量名: Var}}, 矩阵数据)。
+        """
+        arrays = self.build_arrays()
+        return self.load_arrays(model, arrays), arrays
+
+
+    def update_demand(self, model, arrays):
+        """
+        在模型的子问题数据只有需求和目标库存水平变化(模型结构不变)时, 只更新已载入模型中随之变化的部分, 并同步更新 arrays:
+        库存平衡约束 Inventory_* 和目标库存水平约束 Required_inventory_* 的右端项;
+        启用 tighten_big_m 时重新推导大 M, 再更新 DemandSatisfaction_* 中随需求变化的大 M 系数和右端项。
+        下单量的大 M 只取决于产能, 保持不变。不重新计算整个约束矩阵, 返回修改的数量。
+        """
+        T, P = self._T, len(self._skus)
+        if self._constrs is None:
+            self._constrs = model.getConstrs().tolist()
+        constrs = self._constrs
+        changed = 0
+
+        inventory_rows = self._row_starts['inventory_balance'] + np.arange(P * T)
+        required_rows = self._row_starts['required_inventory'] + np.arange(len(self._s_sku))
+        inventory_rhs = self._inventory_balance_rhs()
+        bound_updates = [
+            ('row_lb', COPT.Info.LB, inventory_rows, inventory_rhs),
+            ('row_ub', COPT.Info.UB, inventory_rows, inventory_rhs),
+            ('row_lb', COPT.Info.LB, required_rows, self._required_inventory_lb()),
+        ]
+
+        if self._m.tighten_big_m:
+            old_u_big_m, old_i_big_m = self._u_big_m, self._i_big_m
+            self._derive_big_m_bounds()
+            cells = np.arange(P * T)
+            first_rows = self._row_starts['demand_satisfaction'] + 2 * cells
+            bound_updates.append(('row_ub', COPT.Info.UB, first_rows, self._u_big_m))
+
+            # u <= M_u * (1 - e) 和 I <= M_I * e 中 e_{p,t} 的系数分别为 M_u 和 -M_I
+            rows = np.concatenate([first_rows, first_rows + 1])
+            cells = np.concatenate([cells, cells])
+            old_values = np.concatenate([old_u_big_m, -old_i_big_m])
+            new_values = np.concatenate([self._u_big_m, -self._i_big_m])
+            coeff_changed = np.flatnonzero(old_values != new_values)
+            if len(coeff_changed):
+                e_vars = list(self._m.variables['demand_statisfied_indicator_vars'].values())
+                model.setCoeffs(
+                    [constrs[i] for i in rows[coeff_changed].tolist()],
+                    [e_vars[j] for j in cells[coeff_changed].tolist()],
+                    new_values[coeff_changed].tolist()
+                )
+                # 先减去旧系数再加上新系数, 使 arrays['A'] 与重新构建得到的矩阵完全一致
+                positions = (rows[coeff_changed], self._e0 + cells[coeff_changed])
+                shape = arrays['A'].shape
+                A = (
+                    arrays['A'] - sparse.csc_matrix((old_values[coeff_changed], positions), shape=shape)
+                    + sparse.csc_matrix((new_values[coeff_changed], positions), shape=shape)
+                )
+                A.eliminate_zeros()
+                arrays['A'] = A
+                changed += len(coeff_changed)
+
+        for key, info, rows, values in bound_updates:
+            bound_changed = np.flatnonzero(arrays[key][rows] != values)
+            if len(bound_changed):
+                model.setInfo(info, [constrs[i] for i in rows[bound_changed].tolist()], values[bound_changed].tolist())
+                arrays[key][rows[bound_changed]] = values[bound_changed]
+                changed += len(bound_changed)
+        return changed
+
+
+    def _index_order_pairs(self):
+        """
+        按 工厂 -> 可生产SKU 的顺序为每个 (工厂, SKU) 对编号, 并计算其下单变量的周数(缺省为 T - SLA_S)。
+        """
+        m = self._m
+        pair_factory, pair_sku = [], []
+        for f_idx, f in enumerate(self._factories):
+            for p in m.factory_sku_lists_dict[f]:
+                p_idx = self._sku_index[p]
+                if self._T - self._sla_s[p_idx] <= 0:
+                    print(f"Warning! {p} will NOT be included in this plan since its supply SLA {m.SLA_S_dict[p]} >= plan duration {self._T}")
+                pair_factory.append(f_idx)
+                pair_sku.append(p_idx)
+
+        self._pair_factory = np.array(pair_factory, dtype=np.int64)
+        self._pair_sku = np.array(pair_sku, dtype=np.int64)
+        # 下单周数缺省为 T - SLA_S, MPSPresolver 约简后由 order_weeks_dict 给出
+        order_weeks = np.array(
+            [m.order_weeks_dict.get(p, self._T - self._sla_s[p_idx]) for p_idx, p in enumerate(self._skus)], dtype=np.int64
+        )
+        self._pair_length = np.maximum(order_weeks[self._pair_sku], 0)
+        self._pair_index = {}
+        for k, (f_idx, p_idx) in enumerate(zip(pair_factory, pair_sku)):
+            self._pair_index.setdefault((f_idx, p_idx), k)
+
+        self._moq = np.array([m.MOQ_dict[self._skus[p_idx]] for p_idx in pair_sku], dtype=float)
+
+
+    def _index_columns(self):
+        """
+        计算各类变量的列号范围及每列对应的 (工厂, SKU, 周) 索引。
+        """
+        T, P = self._T, len(self._skus)
+        m = self._m
+
+        # x: 每个 (工厂, SKU) 对的 tau in [0, 下单周数)
+        self._x_pair, self._x_tau = self._expand_ranges(self._pair_length)
+        self._x_offsets = np.concatenate([[0], np.cumsum(self._pair_length)])
+        # z: 只为 MOQ > 0 的 (工厂, SKU) 对添加
+        moq_pairs = np.flatnonzero(self._moq > 0)
+        z_pair_local, self._z_tau = self._expand_ranges(self._pair_length[moq_pairs])
+        self._z_pair = moq_pairs[z_pair_local]
+        # s: 每个 SKU 的 t in [SLA_S, T)
+        self._s_length = np.maximum(T - self._sla_s, 0)
+        self._s_sku, s_local = self._expand_ranges(self._s_length)
+        self._s_t = s_local + self._sla_s[self._s_sku]
+
+        self._x0 = 0
+        self._z0 = self._x0 + len(self._x_pair)
+        self._e0 = self._z0 + len(self._z_pair)
+        self._i0 = self._e0 + P * T
+        self._u0 = self._i0 + P * T
+        self._s0 = self._u0 + P * T
+
+        x_vtype = COPT.CONTINUOUS if m.relax_decision_vars else COPT.INTEGER
+        grid_sku, grid_t = np.repeat(np.arange(P), T), np.tile(np.arange(T), P)
+
+        stock_cost = np.array([m.stock_cost_dict[p] for p in self._skus], dtype=float)
+        loss_sales_cost = np.array([m.loss_sales_cost_dict[p] for p in self._skus], dtype=float)
+        stockout_obj = np.where(grid_t >= self._sla_s[grid_sku], loss_sales_cost[grid_sku], 0.0)
+
+        self._add_columns('order_decision_vars', 'x', self._pair_names(self._x_pair, self._x_tau), 0.0, 0.0, x_vtype)
+        self._add_columns('order_indicator_vars', 'z', self._pair_names(self._z_pair, self._z_tau), 0.0, 0.0, COPT.BINARY, ub=1.0)
+        self._add_columns('demand_statisfied_indicator_vars', 'e', self._sku_names(grid_sku, grid_t), 0.0, 0.0, COPT.BINARY, ub=1.0)
+        self._add_columns('inventory_vars', 'I', self._sku_names(grid_sku, grid_t), stock_cost[grid_sku], 0.0, COPT.CONTINUOUS)
+        self._add_columns('stockout_vars', 'u', self._sku_names(grid_sku, grid_t), stockout_obj, 0.0, COPT.CONTINUOUS)
+        self._add_columns('slack_vars', 's', self._sku_names(self._s_sku, self._s_t), 5.0, 0.0, COPT.CONTINUOUS)
+
+
+    def _add_columns(self, var_type, prefix, name_parts, obj, lb, vtype, ub=COPT.INFINITY):
+        names = [f"{prefix}_{part}" for part in name_parts]
+        n = len(names)
+        self._columns[var_type] = (
+            names, np.broadcast_to(np.asarray(obj, dtype=float), (n,)).copy(),
+            np.full(n, lb, dtype=float), np.full(n, ub, dtype=float), vtype
+        )
+
+
+    def _add_rows(self, block, names, row_lb, row_ub, rows, cols, vals):
+        n = len(names)
+        self._row_blocks.append((
+            block, names,
+            np.broadcast_to(np.asarray(row_lb, dtype=float), (n,)).copy(),
+            np.broadcast_to(np.asarray(row_ub, dtype=float), (n,)).copy(),
+            np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64), np.asarray(vals, dtype=float)
+        ))
+
+
+    def get_big_m_bounds(self):
+        """
+        获取由数据推导出的大 M 上界 {变量名: 上界}, 包括下单量 x、库存 I 和缺货量 u, 供逐个添加约束的构建方式使用。
+        """
+        x_names = self._columns['order_decision_vars'][0]
+        i_names = self._columns['inventory_vars'][0]
+        u_names = self._columns['stockout_vars'][0]
+        return {
+            **dict(zip(x_names, self._x_big_m.tolist())),
+            **dict(zip(i_names, self._i_big_m.tolist())),
+            **dict(zip(u_names, self._u_big_m.tolist())),
+        }
+
+
+    def _derive_big_m_bounds(self):
+        """
+        由数据推导 OrderIndicator 和 DemandSatisfaction 约束中大 M 的有效上界(未启用 tighten_big_m 时均为 M):
+        - x_{f,p,tau} <= max(C_{f,t} - PO占用_{f,t}, 0) / o_{f,p,t}, t 为其占用的产能周, 整数下单量向下取整;
+        - e_{p,t} = 0 时 I_{p,t} = 0, 由库存平衡得 u_{p,t} <= 需求_{p,t} - PO到货_{p,t}(t = 0 时再减去初始库存);
+        - e_{p,t} = 1 时 u_{p,t} = 0, 由库存平衡递推 I_{p,t} <= max(I_{p,t-1}的上界 + sum_f x_{f,p,t-SLA_S}的上界 + PO到货_{p,t} - 需求_{p,t}, 0)。
+        各上界不超过 M, 推导不出有限上界的变量(如单位产能占用为 0 的下单量)保留 M。
+        """
+        m, T, P = self._m, self._T, len(self._skus)
+        M = float(m.M)
+        self._x_big_m = np.full(len(self._x_pair), M)
+        self._i_big_m = np.full(P * T, M)
+        self._u_big_m = np.full(P * T, M)
+        self.num_big_m_tightened = 0
+        if not m.tighten_big_m:
+            return
+
+        x_cols, capacity_rows, coeff = self._capacity_coefficients()
+        remaining_capacity = self._remaining_capacity()
+        bounded = coeff > 0
+        x_bound = np.full(len(self._x_pair), np.inf)
+        x_bound[x_cols[bounded]] = remaining_capacity[capacity_rows[bounded]] / coeff[bounded]
+        if not m.relax_decision_vars:
+            x_bound = np.floor(x_bound + 1e-6)
+        self._x_big_m = np.minimum(x_bound, M)
+
+        po_arrival = self._series_matrix(m.intransit_PO_dict, self._skus)
+        demand = self._series_matrix(m.demand_dict, self._skus)
+        initial_inventory = self._initial_inventory()
+        net_arrival = po_arrival - demand
+
+        stockout_bound = np.maximum(-net_arrival, 0)
+        stockout_bound[:, 0] = np.maximum(-net_arrival[:, 0] - initial_inventory, 0)
+
+        supply_sku, supply_x_cols, supply_tau = self._supply_order_columns()
+        supply_t = supply_tau + self._sla_s[supply_sku]
+        supply_valid = supply_t > 0
+        supply_bound = np.zeros((P, T))
+        np.add.at(
+            supply_bound, (supply_sku[supply_valid], supply_t[supply_valid]),
+            x_bound[supply_x_cols[supply_valid] - self._x0]
+        )
+        inventory_bound = np.empty((P, T))
+        previous_bound = initial_inventory
+        for t in range(T):
+            previous_bound = np.maximum(previous_bound + supply_bound[:, t] + net_arrival[:, t], 0)
+            inventory_bound[:, t] = previous_bound
+
+        self._i_big_m = np.minimum(inventory_bound, M).ravel()
+        self._u_big_m = np.minimum(stockout_bound, M).ravel()
+        self.num_big_m_tightened = int(
+            (self._x_big_m[self._x_offsets[self._z_pair] + self._z_tau] < M).sum() +
+            (self._i_big_m < M).sum() + (self._u_big_m < M).sum()
+        )
+
+
+    def _capacity_coefficients(self):
+        """
+        计算产能约束的非零系数: 对每个下单变量直接计算其占用的产能周 t, 而不是对每个 t 遍历所有 tau。
+        返回 (下单变量序号, 产能约束行号 f * T + t, 单位产能占用) 三个等长数组, 只包含占用产能周在计划期内的下单变量。
+        """
+        m, T = self._m, self._T
+        x_sku = self._pair_sku[self._x_pair]
+        capacity_week = self._x_tau + self._sla_s[x_sku] - self._sla_t[x_sku] - 1
+        valid = (capacity_week >= 0) & (capacity_week < T)
+
+        # 只取出实际占用产能的 (工厂, SKU) 对的单位产能占用
+        x_cols = np.flatnonzero(valid)
+        used_pairs, used_pair_rows = np.unique(self._x_pair[x_cols], return_inverse=True)
+        occupancy = self._pair_series_matrix(
+            m.capacity_occupancy_dict, self._pair_factory[used_pairs], self._pair_sku[used_pairs]
+        )
+        coeff = occupancy[used_pair_rows, capacity_week[x_cols]]
+        rows = self._pair_factory[self._x_pair[x_cols]] * T + capacity_week[x_cols]
+        return x_cols, rows, coeff
+
+
+    def _remaining_capacity(self):
+        """各工厂每周的剩余产能 max(C_{f,t} - PO占用_{f,t}, 0), 按 f * T + t 展平"""
+        m, T = self._m, self._T
+        F = len(self._factories)
+        normalized_capacity = self._series_matrix(m.normalized_capacity_dict, self._factories)
+        po_factories = [f for f in self._factories if f in m.po_capacity_occupation_dicts.keys()]
+        po_capacity_occupation = np.zeros((F, T))
+        if po_factories:
+            po_rows = [self._factory_index[f] for f in po_factories]
+            po_capacity_occupation[po_rows] = self._series_matrix(m.po_capacity_occupation_dicts, po_factories)
+        return np.maximum(normalized_capacity - po_capacity_occupation, 0).ravel()
+
+
+    def _add_capacity_rows(self):
+        """
+        产能约束: sum_p o_{f,p,t} * x_{f,p,tau} <= max(C_{f,t} - PO占用_{f,t}, 0), 其中 tau + SLA_S - SLA_T - 1 == t。
+        """
+        T, F = self._T, len(self._factories)
+        x_cols, rows, coeff = self._capacity_coefficients()
+        nonzero = coeff != 0
+
+        grid_f, grid_t = np.repeat(np.arange(F), T), np.tile(np.arange(T), F)
+        names = [f"Capacity_{self._factories[f]}_{t}" for f, t in zip(grid_f.tolist(), grid_t.tolist())]
+        self._add_rows('capacity', names, -COPT.INFINITY, self._remaining_capacity(), rows[nonzero], x_cols[nonzero] + self._x0, coeff[nonzero])
+
+
+    def _add_moq_rows(self):
+        """
+        最小下单量约束: x >= MOQ * z 和 x <= M * z, 两条约束按 (工厂, SKU, 周) 交替排列, M 为 x 的大 M 上界。
+        """
+        n = len(self._z_pair)
+        x_cols = self._x0 + self._x_offsets[self._z_pair] + self._z_tau
+        z_cols = self._z0 + np.arange(n)
+        moq_rows, indicator_rows = 2 * np.arange(n), 2 * np.arange(n) + 1
+
+        rows = np.concatenate([moq_rows, moq_rows, indicator_rows, indicator_rows])
+        cols = np.concatenate([x_cols, z_cols, x_cols, z_cols])
+        vals = np.concatenate([np.ones(n), -self._moq[self._z_pair], np.ones(n), -self._x_big_m[x_cols - self._x0]])
+        nonzero = vals != 0
+        rows, cols, vals = rows[nonzero], cols[nonzero], vals[nonzero]
+
+        row_lb = np.empty(2 * n)
+        row_ub = np.empty(2 * n)
+        row_lb[0::2], row_ub[0::2] = 0.0, COPT.INFINITY
+        row_lb[1::2], row_ub[1::2] = -COPT.INFINITY, 0.0
+
+        name_parts = self._pair_names(self._z_pair, self._z_tau)
+        names = [name for part in name_parts for name in (f"MOQ_{part}", f"OrderIndicator_{part}")]
+        self._add_rows('moq', names, row_lb, row_ub, rows, cols, vals)
+
+
+    def _add_inventory_balance_rows(self):
+        """
+        库存平衡约束: I_{p,t} - I_{p,t-1} - sum_f x_{f,p,t-SLA_S} - u_{p,t} = PO到货_{p,t} - 需求_{p,t},
+        t = 0 时为 I_{p,0} - u_{p,0} = 初始库存 + PO到货_{p,0} - 需求_{p,0}。
+        """
+        T, P = self._T, len(self._skus)
+        grid_sku, grid_t = np.repeat(np.arange(P), T), np.tile(np.arange(T), P)
+        cells = np.arange(P * T)
+
+        supply_sku, supply_x_cols, supply_tau = self._supply_order_columns()
+        supply_t = supply_tau + self._sla_s[supply_sku]
+        supply_valid = supply_t > 0
+        later = np.flatnonzero(grid_t > 0)
+
+        rows = np.concatenate([cells, cells, later, supply_sku[supply_valid] * T + supply_t[supply_valid]])
+        cols = np.concatenate([
+            self._i0 + cells, self._u0 + cells, self._i0 + later - 1, supply_x_cols[supply_valid]
+        ])
+        vals = np.concatenate([np.ones(P * T), -np.ones(P * T), -np.ones(len(later)), -np.ones(int(supply_valid.sum()))])
+
+        rhs = self._inventory_balance_rhs()
+        names = [f"Inventory_{self._skus[p]}_{t}" for p, t in zip(grid_sku.tolist(), grid_t.tolist())]
+        self._add_rows('inventory_balance', names, rhs, rhs, rows, cols, vals)
+
+
+    def _add_demand_satisfaction_rows(self):
+        """
+        辅助库存平衡约束: u_{p,t} <= M * (1 - e_{p,t}) 和 I_{p,t} <= M * e_{p,t}, 两条约束按 (SKU, 周) 交替排列,
+        M 分别为 u 和 I 的大 M 上界。
+        """
+        T, P = self._T, len(self._skus)
+        grid_sku, grid_t = np.repeat(np.arange(P), T), np.tile(np.arange(T), P)
+        cells = np.arange(P * T)
+        first_rows, second_rows = 2 * cells, 2 * cells + 1
+
+        rows = np.concatenate([first_rows, first_rows, second_rows, second_rows])
+        cols = np.concatenate([self._u0 + cells, self._e0 + cells, self._i0 + cells, self._e0 + cells])
+        vals = np.concatenate([np.ones(P * T), self._u_big_m, np.ones(P * T), -self._i_big_m])
+        nonzero = vals != 0
+        rows, cols, vals = rows[nonzero], cols[nonzero], vals[nonzero]
+
+        row_ub = np.empty(2 * P * T)
+        row_ub[0::2], row_ub[1::2] = self._u_big_m, 0.0
+
+        names = [
+            name for p, t in zip(grid_sku.tolist(), grid_t.tolist())
+            for name in (f"DemandSatisfaction_{self._skus[p]}_{t}_1", f"DemandSatisfaction_{self._skus[p]}_{t}_2")
+        ]
+        self._add_rows('demand_satisfaction', names, -COPT.INFINITY, row_ub, rows, cols, vals)
+
+
+    def _add_required_inventory_rows(self):
+        """
+        目标库存水平约束: I_{p,t-1} + sum_f x_{f,p,t-SLA_S} + s_{p,t} >= 目标库存_{p,t} - PO到货_{p,t}, t in [SLA_S, T),
+        t = 0 时以初始库存代替 I_{p,t-1}。约束行与松弛变量 s 一一对应。
+        """
+        T = self._T
+        s_rows = np.arange(len(self._s_sku))
+        s_offsets = np.concatenate([[0], np.cumsum(self._s_length)])
+
+        supply_sku, supply_x_cols, supply_tau = self._supply_order_columns()
+        prev = np.flatnonzero(self._s_t > 0)
+
+        rows = np.concatenate([s_rows, prev, s_offsets[supply_sku] + supply_tau])
+        cols = np.concatenate([
+            self._s0 + s_rows, self._i0 + self._s_sku[prev] * T + self._s_t[prev] - 1, supply_x_cols
+        ])
+        vals = np.ones(len(rows))
+
+        names = [f"Required_inventory_{part}" for part in self._sku_names(self._s_sku, self._s_t)]
+        self._add_rows('required_inventory', names, self._required_inventory_lb(), COPT.INFINITY, rows, cols, vals)
+
+
+    def _inventory_balance_rhs(self):
+        """库存平衡约束的右端项 PO到货_{p,t} - 需求_{p,t}, t = 0 时加上初始库存, 按 p * T + t 展平"""
+        m = self._m
+        rhs = self._series_matrix(m.intransit_PO_dict, self._skus) - self._series_matrix(m.demand_dict, self._skus)
+        rhs[:, 0] += self._initial_inventory()
+        return rhs.ravel()
+
+
+    def _required_inventory_lb(self):
+        """目标库存水平约束的下界 目标库存_{p,t} - PO到货_{p,t}, t = 0 时再减去初始库存, 与松弛变量 s 一一对应"""
+        m = self._m
+        required_inventory_level = self._series_matrix(m.required_inventory_level_dict, self._skus)
+        po_arrival = self._series_matrix(m.intransit_PO_dict, self._skus)
+        row_lb = required_inventory_level[self._s_sku, self._s_t] - po_arrival[self._s_sku, self._s_t]
+        row_lb -= np.where(self._s_t == 0, self._initial_inventory()[self._s_sku], 0.0)
+        return row_lb
+
+
+    def _supply_order_columns(self):
+        """
+        按 SKU -> 可用工厂 展开供应该 SKU 的下单变量, 返回 (SKU索引, 下单变量列号, tau) 三个等长数组。
+        """
+        m = self._m
+        supply_sku, supply_pair = [], []
+        for p_idx, p in enumerate(self._skus):
+            for f in m.available_factory_set_of_skus[p]:
+                supply_sku.append(p_idx)
+                supply_pair.append(self._pair_index[(self._factory_index[f], p_idx)])
+
+        supply_sku = np.array(supply_sku, dtype=np.int64)
+        supply_pair = np.array(supply_pair, dtype=np.int64)
+        local, tau = self._expand_ranges(self._pair_length[supply_pair])
+        return supply_sku[local], self._x0 + self._x_offsets[supply_pair[local]] + tau, tau
+
+
+    def _initial_inventory(self):
+        return np.array([self._m.initial_inventory_dict.get(p, 0) for p in self._skus], dtype=float)
+
+
+    def _pair_names(self, pairs, weeks):
+        return [
+            f"{self._factories[f]}_{self._skus[p]}_{t}"
+            for f, p, t in zip(self._pair_factory[pairs].tolist(), self._pair_sku[pairs].tolist(), weeks.tolist())
+        ]
+
+
+    def _sku_names(self, skus, weeks):
+        return [f"{self._skus[p]}_{t}" for p, t in zip(skus.tolist(), weeks.tolist())]
+
+
+    def _series_matrix(self, table, keys):
+        """
+        取出参数表中一组键对应的 (键数 × T) 矩阵, 键不存在时抛出 KeyError。
+        """
+        if isinstance(table, SeriesTable):
+            rows = table.row_indices(keys)
+            if (rows < 0).any():
+                raise KeyError(keys[int(np.flatnonzero(rows < 0)[0])])
+            return table.matrix[rows].copy()
+        return np.array([table[key] for key in keys], dtype=float).reshape(len(keys), self._T)
+
+
+    def _pair_series_matrix(self, table, factory_indices, sku_indices):
+        """
+        取出 {工厂: {SKU: 序列}} 参数表中一组 (工厂, SKU) 对应的 (对数 × T) 矩阵, 键不存在时抛出 KeyError。
+        """
+        factories = [self._factories[f] for f in factory_indices.tolist()]
+        skus = [self._skus[p] for p in sku_indices.tolist()]
+        if isinstance(table, PairSeriesTable):
+            rows = table.pair_row_indices(factories, skus)
+            if (rows < 0).any():
+                missing = int(np.flatnonzero(rows < 0)[0])
+                raise KeyError((factories[missing], skus[missing]))
+            return table.matrix[rows]
+        return np.array([table[f][p] for f, p in zip(factories, skus)], dtype=float).reshape(len(factories), self._T)
+
+
+    @staticmethod
+    def _expand_ranges(lengths):
+        """
+        将每组长度展开为 (组号, 组内序号) 两个等长数组, 如 lengths = [2, 0, 3] 得到 ([0, 0, 2, 2, 2], [0, 1, 0, 1, 2])。
+        """
+        lengths = np.asarray(lengths, dtype=np.int64)
+        groups = np.repeat(np.arange(len(lengths)), lengths)
+        offsets = np.arange(len(groups)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return groups, offsets
@@ -0,0 +1,171 @@
+import numpy as np
+
+from data_processor.param_tables import SeriesTable
+from util.model_writer import read_solution_file
+from util.profiler import PROFILER
+
+
+# 写出 .sol 文件时的变量名前缀顺序, 与 MPSModel 的变量类型顺序一致
+_VAR_PREFIXES = ('x', 'z', 'e', 'I', 'u', 's')
+
+
+def count_model_columns(data):
+    """由子问题数据计算 MPSModel 的变量数, 与两种构建方式得到的模型一致"""
+    T = data['plan_duration']
+    order_weeks_dict = data.get('order_weeks_dict', {})
+
+    def order_weeks(p):
+        return max(order_weeks_dict.get(p, T - int(data['SLA_S_dict'][p])), 0)
+
+    pairs = [p for f in data['factory_set'] for p in data['factory_sku_lists_dict'][f]]
+    num_x = sum(order_weeks(p) for p in pairs)
+    num_z = sum(order_weeks(p) for p in pairs if data['MOQ_dict'][p] > 0)
+    num_s = sum(max(T - int(data['SLA_S_dict'][p]), 0) for p in data['sku_set'])
+    return num_x + num_z + 3 * len(data['sku_set']) * T + num_s
+
+
+class MPSPresolver:
+    """
+    在构建 MPSModel 之前约简单个供应中心的子问题数据, 移除最优取值可以直接确定的变量:
+    1. 惰性 SKU: 计划期内需求、目标库存水平和PO到货均为 0。其库存始终不低于初始库存, 不下单、不缺货即为最优,
+       各变量固定为 x = z = u = s = 0, e = 1, I = 初始库存, 整个 SKU 从模型中移除, 其库存成本计入目标值常数项;
+    2. (SKU, 周) 上的下单变量: 到货周 tau + SLA_S 及之后各周的需求和目标库存水平均为 0 时, 下单只增加库存成本和产能占用,
+       x = z = 0 即为最优, 只保留到货周不晚于该 SKU 最后一个有需求或目标库存水平的周的下单变量(记录在 order_weeks_dict 中)。
+    求解后由 restore_solution_file 将被移除变量的固定取值和目标值常数项补回 .sol 文件;
+    全部 SKU 均为惰性时无需建模, 由 write_solution_file 直接写出 .sol 文件。
+    单位库存成本或缺货成本为负的 SKU 不做约简。
+    """
+    def __init__(self, supply_center, data):
+        self.supply_center = supply_center
+        self.data = data
+        self.fixed_values = {}
+        self.objective_offset = 0.0
+        self.inert_skus = []
+
+
+    def presolve(self):
+        """返回约简后的子问题数据"""
+        with PROFILER.stage(f"MPSPresolver.presolve[{self.supply_center}]") as record:
+            reduced_data = self._reduce()
+            num_columns = count_model_columns(self.data)
+            num_reduced_columns = count_model_columns(reduced_data)
+            record['rows'] = num_reduced_columns
+            record['inert_skus'] = len(self.inert_skus)
+            record['fixed_vars'] = len(self.fixed_values)
+
+        reduction_ratio = 1 - num_reduced_columns / num_columns if num_columns else 0.0
+        print(f"Presolve for {self.supply_center}: {len(self.inert_skus)} of {len(self.data['sku_set'])} SKUs inert, "
+              f"{len(self.fixed_values)} variables fixed, columns {num_columns} -> {num_reduced_columns} "
+              f"({reduction_ratio:.1%} reduction)")
+        return reduced_data
+
+
+    def restore_solution_file(self, file_name):
+        """
+        将被移除变量的固定取值补回约简模型输出的 .sol 文件, 目标值加上常数项, 变量按类型分组排列。
+        """
+        with open(file_name, 'r') as f:
+            first_line = f.readline()
+        objective_value = float(first_line.split()[-1]) + self.objective_offset
+        self._write(file_name, objective_value, read_solution_file(file_name))
+
+
+    def write_solution_file(self, file_name):
+        """
+        约简后没有剩余 SKU 时无需建模求解, 代替模型直接由固定取值和目标值常数项写出 .sol 文件。
+        """
+        self._write(file_name, self.objective_offset, {})
+
+
+    def _write(self, file_name, objective_value, values):
+        with open(file_name, 'w') as f:
+            f.write(f"# Objective value {objective_value:.15g}\n")
+            for prefix in _VAR_PREFIXES:
+                for source in (values, self.fixed_values):
+                    for name, value in source.items():
+                        if name.split('_', 1)[0] == prefix:
+                            f.write(f"{name} {value:.15g}\n")
+
+
+    def _reduce(self):
+        data = self.data
+        T = data['plan_duration']
+        skus = list(data['sku_set'])
+        demand = _series_matrix(data['demand_dict'], skus, T)
+        required_inventory_level = _series_matrix(data['required_inventory_level_dict'], skus, T)
+        po_arrival = _series_matrix(data.get('week_arrival_quantity_from_PO', {}), skus, T)
+
+        # 各 SKU 最后一个有需求或目标库存水平的周, 没有时为 -1
+        active = (demand != 0) | (required_inventory_level != 0)
+        last_active_week = np.where(active.any(axis=1), T - 1 - np.argmax(active[:, ::-1], axis=1), -1)
+        reducible = [
+            data['stock_cost_dict'][p] >= 0 and data['loss_sales_cost_dict'][p] >= 0 for p in skus
+        ]
+        inert = {
+            p for k, p in enumerate(skus) if reducible[k] and last_active_week[k] < 0 and not po_arrival[k].any()
+        }
+        self.inert_skus = [p for p in skus if p in inert]
+
+        factories_of_sku = {p: [] for p in skus}
+        for f in data['factory_set']:
+            for p in data['factory_sku_lists_dict'][f]:
+                factories_of_sku[p].append(f)
+
+        order_weeks_dict = {}
+        for k, p in enumerate(skus):
+            sla_s = int(data['SLA_S_dict'][p])
+            full_order_weeks = max(T - sla_s, 0)
+            if p in inert:
+                self._fix_inert_sku(p, sla_s, factories_of_sku[p])
+                continue
+            order_weeks = min(max(last_active_week[k] - sla_s + 1, 0), full_order_weeks) if reducible[k] else full_order_weeks
+            order_weeks_dict[p] = order_weeks
+            self._fix_orders(p, factories_of_sku[p], order_weeks, full_order_weeks)
+
+        reduced_skus = [p for p in skus if p not in inert]
+        factory_sku_lists_dict = {
+            f: [p for p in data['factory_sku_lists_dict'][f] if p not in inert] for f in data['factory_set']
+        }
+        # 不再生产任何 SKU 的工厂没有下单变量, 其产能约束为空行, 一并移除
+        reduced_factories = [f for f in data['factory_set'] if factory_sku_lists_dict[f]]
+        return {
+            **data,
+            'sku_set': reduced_skus,
+            'factory_set': reduced_factories,
+            'factory_sku_lists_dict': {f: factory_sku_lists_dict[f] for f in reduced_factories},
+            'available_factory_set_of_skus': {p: data['available_factory_set_of_skus'][p] for p in reduced_skus},
+            'order_weeks_dict': order_weeks_dict,
+        }
+
+
+    def _fix_inert_sku(self, p, sla_s, factories):
+        """固定惰性 SKU 的全部变量, 并将其库存成本计入目标值常数项"""
+        T = self.data['plan_duration']
+        initial_inventory = self.data['initial_inventory_dict'].get(p, 0)
+        self._fix_orders(p, factories, 0, max(T - sla_s, 0))
+        for t in range(T):
+            self.fixed_values[f"e_{p}_{t}"] = 1
+            self.fixed_values[f"I_{p}_{t}"] = initial_inventory
+            self.fixed_values[f"u_{p}_{t}"] = 0
+        for t in range(sla_s, T):
+            self.fixed_values[f"s_{p}_{t}"] = 0
+        self.objective_offset += self.data['stock_cost_dict'][p] * initial_inventory * T
+
+
+    def _fix_orders(self, p, factories, order_weeks, full_order_weeks):
+        """将下单周 tau in [order_weeks, full_order_weeks) 的下单变量及其指示变量固定为 0"""
+        for f in factories:
+            for tau in range(order_weeks, full_order_weeks):
+                self.fixed_values[f"x_{f}_{p}_{tau}"] = 0
+                if self.data['MOQ_dict'][p] > 0:
+                    self.fixed_values[f"z_{f}_{p}_{tau}"] = 0
+
+
+def _series_matrix(table, keys, T):
+    """取出参数表中一组键对应的 (键数 × T) 矩阵"""
+    if isinstance(table, SeriesTable):
+        rows = table.row_indices(keys)
+        if (rows < 0).any():
+            raise KeyError(keys[int(np.flatnonzero(rows < 0)[0])])
+        return table.matrix[rows].astype(float)
+    return np.array([table[key] for key in keys], dtype=float).reshape(len(keys), T)
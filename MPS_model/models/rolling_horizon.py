@@ -0,0 +1,98 @@
+import json
+import os
+
+from data_processor.week_calendar import WeekCalendar
+from models.MPS_model import MPSModel
+from util.model_writer import read_solution_file
+
+
+def get_rolling_state_path(supply_center):
+    """滚动计划状态文件路径, 与该供应中心的 .sol 文件位于同一目录"""
+    return f"output/MPS/supply_center_{supply_center}/rolling_state.json"
+
+
+def save_rolling_state(supply_center, start_week, T, solution_file_path):
+    """
+    记录本次求解的起始周、计划周期和 .sol 文件路径, 供下一周的滚动计划读取。
+    """
+    state_path = get_rolling_state_path(supply_center)
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    with open(state_path, 'w') as f:
+        json.dump({'start_week': start_week, 'T': T, 'solution_file': solution_file_path}, f, ensure_ascii=False)
+
+
+def load_previous_solution(supply_center, start_week, T):
+    """
+    读取上一次滚动计划的解, 并按起始周的偏移平移到本次计划的周序号上。
+    没有历史状态、.sol 文件不存在或与本次计划周期没有重叠时返回 None。
+    """
+    state_path = get_rolling_state_path(supply_center)
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path, 'r') as f:
+        state = json.load(f)
+    if not os.path.exists(state['solution_file']):
+        return None
+
+    shift = WeekCalendar.count_weeks_between(state['start_week'], start_week)
+    if not 0 <= shift < min(T, state['T']):
+        print(f"Previous solution of {supply_center} ({state['start_week']}) does not overlap with {start_week}")
+        return None
+    print(f"Using previous solution of {supply_center} ({state['start_week']}) shifted by {shift} weeks")
+    return shift_solution_values(read_solution_file(state['solution_file']), shift)
+
+
+def shift_solution_values(values, shift):
+    """
+    将 {变量名: 取值} 中变量名末尾的周序号减去 shift, 丢弃平移后周序号小于 0 的变量。
+    变量名形如 x_F1_SKU0_3, 末尾以下划线分隔的部分为周序号。
+    """
+    if shift == 0:
+        return dict(values)
+    shifted_values = {}
+    for name, value in values.items():
+        prefix, _, week = name.rpartition('_')
+        if not week.isdigit():
+            continue
+        t = int(week) - shift
+        if t >= 0:
+            shifted_values[f"{prefix}_{t}"] = value
+    return shifted_values
+
+
+class RollingHorizonModel:
+    """
+    在同一进程中跨周复用的 MPS 模型(matrix 构建方式):
+    第一周正常构建并求解; 之后每周只用新数据更新已构建模型的系数和上下界(结构变化时才重新载入),
+    并将上一周的解平移一周作为 MIP 初始解后求解。
+    """
+    def __init__(self, env, supply_center, params=None, relax_decision_vars=False, tighten_big_m=False):
+        self.env = env
+        self.supply_center = supply_center
+        self.params = params or {}
+        self.relax_decision_vars = relax_decision_vars
+        self.tighten_big_m = tighten_big_m
+        self.mps_model = None
+        self.start_week = None
+
+
+    def solve_week(self, start_week, data):
+        """
+        求解以 start_week 为起始周的计划, 返回求解后的 MPSModel。
+        """
+        if self.mps_model is None:
+            self.mps_model = MPSModel(
+                self.env, self.supply_center, data, params=self.params,
+                relax_decision_vars=self.relax_decision_vars, build_mode="matrix", tighten_big_m=self.tighten_big_m
+            )
+            self.mps_model.build()
+        else:
+            shift = WeekCalendar.count_weeks_between(self.start_week, start_week)
+            previous_values = self.mps_model.get_solution_values()
+            self.mps_model.update_data(data)
+            if previous_values and 0 <= shift < self.mps_model.plan_duration:
+                self.mps_model.set_mip_start(shift_solution_values(previous_values, shift))
+
+        self.mps_model.solve()
+        self.start_week = start_week
+        return self.mps_model
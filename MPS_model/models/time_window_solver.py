@@ -0,0 +1,189 @@
+from coptpy import COPT
+import numpy as np
+
+from util.profiler import PROFILER
+
+
+# 时间窗求解的默认参数: 窗口周数、相邻窗口重叠周数、每个窗口的求解时间限制(秒)、是否进行 fix-and-optimize 改进
+TIME_WINDOW_DEFAULTS = {
+    'length': 6,
+    'overlap': 2,
+    'time_limit': 30,
+    'polish': True,
+}
+
+# 含整数变量的变量类型, 按变量名末尾的周序号(下单周或需求周)划分时间窗
+_INTEGER_VAR_TYPES = ('order_decision_vars', 'order_indicator_vars', 'demand_statisfied_indicator_vars')
+# 窗口求解后固定取值的变量类型; 需求满足指示变量由已固定的订单决定, 只保留整数约束而不固定,
+# 避免大M约束下取值略偏离 0/1 的指示变量取整后与库存不一致
+_FIXED_VAR_TYPES = ('order_decision_vars', 'order_indicator_vars')
+
+
+class TimeWindowSolver:
+    """
+    在已构建的 MPSModel 上按时间窗求解:
+    1. relax-and-fix: 窗口从第 0 周开始, 每次只保留窗口内各周的整数约束, 之后各周的整数变量松弛为连续变量,
+       之前各周的订单变量已固定; 求解后固定窗口中不与下一个窗口重叠的各周的订单变量, 窗口前移 length - overlap 周;
+    2. fix-and-optimize: 以 relax-and-fix 的解为初始解, 再次按时间窗逐个放开窗口内各周的整数变量(其余整数变量固定)
+       并求解, 每个窗口的解不差于初始解。
+    需求满足指示变量不固定, 离开窗口后仍保留整数约束, 由已固定的订单决定取值。
+    每个子问题只含一个窗口的整数变量, 可以在较短的时间限制内求得接近最优的解。
+    求解结束后除最后一个窗口外的订单变量保持固定在最终计划上, 模型中的解即为最终计划。
+    """
+    def __init__(self, mps_model, length=None, overlap=None, time_limit=None, polish=None):
+        options = {**TIME_WINDOW_DEFAULTS, **{
+            key: value for key, value in
+            (('length', length), ('overlap', overlap), ('time_limit', time_limit), ('polish', polish))
+            if value is not None
+        }}
+        if options['length'] <= 0 or not 0 <= options['overlap'] < options['length']:
+            raise ValueError(f"Invalid time window: length {options['length']}, overlap {options['overlap']}")
+
+        self.mps_model = mps_model
+        self.model = mps_model.model
+        self.length = options['length']
+        self.overlap = options['overlap']
+        self.time_limit = options['time_limit']
+        self.polish = options['polish']
+
+        self._index_integer_vars()
+
+
+    def solve(self):
+        """依次进行 relax-and-fix 和 fix-and-optimize, 返回最终目标值"""
+        original_time_limit = self.model.getParam(COPT.Param.TimeLimit)
+        self.model.setParam(COPT.Param.TimeLimit, self.time_limit)
+        try:
+            objective_value = self._relax_and_fix()
+            if self.polish:
+                objective_value = self._fix_and_optimize()
+        finally:
+            self.model.setParam(COPT.Param.TimeLimit, original_time_limit)
+        return objective_value
+
+
+    def restore(self):
+        """恢复全部整数变量的原始上下界和变量类型, 如在更新模型数据后重新求解前调用"""
+        self._unfix(np.ones(len(self._vars), dtype=bool))
+
+
+    def _index_integer_vars(self):
+        """记录各整数变量的周序号、变量类型、是否固定和原始上下界"""
+        integer_vars, weeks, vtypes, fixable = [], [], [], []
+        for var_type in _INTEGER_VAR_TYPES:
+            if var_type == 'order_decision_vars' and self.mps_model.relax_decision_vars:
+                continue
+            vtype = COPT.INTEGER if var_type == 'order_decision_vars' else COPT.BINARY
+            for name, var in self.mps_model.variables.get(var_type, {}).items():
+                integer_vars.append(var)
+                weeks.append(int(name.rpartition('_')[2]))
+                vtypes.append(vtype)
+                fixable.append(var_type in _FIXED_VAR_TYPES)
+
+        self._vars = integer_vars
+        self._var_columns = [var.index for var in integer_vars]
+        self._incumbent = None
+        self._weeks = np.array(weeks, dtype=np.int64)
+        self._vtypes = vtypes
+        self._fixable = np.array(fixable, dtype=bool)
+        self._lb = np.asarray(self.model.getInfo(COPT.Info.LB, integer_vars), dtype=float) if integer_vars else np.zeros(0)
+        self._ub = np.asarray(self.model.getInfo(COPT.Info.UB, integer_vars), dtype=float) if integer_vars else np.zeros(0)
+
+
+    def _window_starts(self):
+        """各窗口的起始周, 最后一个窗口覆盖到计划期末"""
+        window_starts = [0]
+        while window_starts[-1] + self.length < self.mps_model.plan_duration:
+            window_starts.append(window_starts[-1] + self.length - self.overlap)
+        return window_starts
+
+
+    def _relax_and_fix(self):
+        supply_center = self.mps_model.supply_center
+        fixed = np.zeros(len(self._vars), dtype=bool)
+        objective_value = None
+        window_starts = self._window_starts()
+        for window_index, window_start in enumerate(window_starts):
+            window_end = window_start + self.length
+            in_window = (self._weeks >= window_start) & (self._weeks < window_end) & ~fixed
+            later = (self._weeks >= window_end) & ~fixed
+            self._set_vtypes(in_window, integer=True)
+            self._set_vtypes(later, integer=False)
+
+            with PROFILER.stage(f"TimeWindowSolver.relax_and_fix[{supply_center}]") as record:
+                self.model.solve()
+                record['window'] = [window_start, window_end]
+                record['status'] = self.model.status
+            if not self.model.getAttr(COPT.Attr.HasMipSol):
+                raise RuntimeError(f"No feasible solution in time window [{window_start}, {window_end}) of {supply_center}")
+            objective_value = self.model.objval
+            print(f"Relax-and-fix window [{window_start}, {window_end}) of {supply_center}: objective value {objective_value:.2f}")
+
+            self._incumbent = self.model.getValues()
+
+            # 固定窗口中不与下一个窗口重叠的各周; 最后一个窗口不再固定, 修改模型会使当前解失效
+            if window_index < len(window_starts) - 1:
+                to_fix = ~fixed & self._fixable & (self._weeks < window_starts[window_index + 1])
+                self._fix(to_fix)
+                fixed |= to_fix
+        return objective_value
+
+
+    def _fix_and_optimize(self):
+        supply_center = self.mps_model.supply_center
+        all_vars = self.model.getVars().tolist()
+        objective_value = self.model.objval
+        window_starts = self._window_starts()
+        # relax-and-fix 的最后一个窗口未固定, 先将其固定在当前解上
+        self._fix(self._weeks >= window_starts[-1])
+        for window_index, window_start in enumerate(window_starts):
+            window_end = window_start + self.length
+            in_window = (self._weeks >= window_start) & (self._weeks < window_end)
+            self._unfix(in_window)
+            self.model.setMipStart(all_vars, self._incumbent)
+            self.model.loadMipStart()
+
+            with PROFILER.stage(f"TimeWindowSolver.fix_and_optimize[{supply_center}]") as record:
+                self.model.solve()
+                record['window'] = [window_start, window_end]
+                record['status'] = self.model.status
+            if not self.model.getAttr(COPT.Attr.HasMipSol):
+                raise RuntimeError(f"No feasible solution in time window [{window_start}, {window_end}) of {supply_center}")
+            objective_value = self.model.objval
+            print(f"Fix-and-optimize window [{window_start}, {window_end}) of {supply_center}: objective value {objective_value:.2f}")
+            self._incumbent = self.model.getValues()
+            if window_index < len(window_starts) - 1:
+                self._fix(in_window)
+        return objective_value
+
+
+    def _set_vtypes(self, mask, integer):
+        indices = np.flatnonzero(mask).tolist()
+        if indices:
+            self.model.setVarType(
+                [self._vars[i] for i in indices],
+                [self._vtypes[i] if integer else COPT.CONTINUOUS for i in indices]
+            )
+
+
+    def _fix(self, mask):
+        """将选中的订单变量取整后固定在当前解上"""
+        indices = np.flatnonzero(mask & self._fixable).tolist()
+        if not indices:
+            return
+        fix_vars = [self._vars[i] for i in indices]
+        incumbent = np.asarray(self._incumbent)[[self._var_columns[i] for i in indices]]
+        values = np.clip(np.round(incumbent), self._lb[indices], self._ub[indices])
+        self.model.setInfo(COPT.Info.LB, fix_vars, values.tolist())
+        self.model.setInfo(COPT.Info.UB, fix_vars, values.tolist())
+
+
+    def _unfix(self, mask):
+        """恢复选中整数变量的原始上下界和变量类型"""
+        indices = np.flatnonzero(mask).tolist()
+        if not indices:
+            return
+        unfix_vars = [self._vars[i] for i in indices]
+        self.model.setInfo(COPT.Info.LB, unfix_vars, self._lb[indices].tolist())
+        self.model.setInfo(COPT.Info.UB, unfix_vars, self._ub[indices].tolist())
+        self._set_vtypes(mask, integer=True)
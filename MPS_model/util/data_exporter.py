@@ -0,0 +1,91 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+
+
+# 导出模式: 不导出 / Parquet / Excel
+EXPORT_MODES = ("off", "parquet", "excel")
+
+# 流式写入Excel时每次转换的行数
+_EXCEL_CHUNK_ROWS = 10000
+
+_executor = None
+_pending_futures = []
+_lock = threading.Lock()
+
+
+def export_modified_data(data_dict, base_dir, export_mode):
+    """
+    在后台线程中将 {供应中心: {表名: DataFrame}} 形式的数据字典导出到 base_dir/<供应中心>/ 目录下。
+    导出与后续模型构建并行进行, 调用 wait_for_exports() 等待导出完成。
+    """
+    if export_mode not in EXPORT_MODES:
+        raise ValueError(f"Invalid export mode: {export_mode}, expected one of {EXPORT_MODES}")
+    if export_mode == "off":
+        return None
+
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="data_exporter")
+        future = _executor.submit(_write_data_dict, data_dict, base_dir, export_mode)
+        _pending_futures.append(future)
+
+    return future
+
+
+def wait_for_exports():
+    """
+    阻塞直至所有已提交的导出任务完成, 导出出错时抛出对应异常。
+    """
+    with _lock:
+        futures = list(_pending_futures)
+        _pending_futures.clear()
+
+    for future in futures:
+        future.result()
+
+
+def _write_data_dict(data_dict, base_dir, export_mode):
+    """
+    将数据字典中的每张表写入文件。
+    """
+    for supply_center, data in data_dict.items():
+        supply_center_dir = os.path.join(base_dir, supply_center)
+        os.makedirs(supply_center_dir, exist_ok=True)
+
+        for table_name, df in data.items():
+            if export_mode == "parquet":
+                df.to_parquet(os.path.join(supply_center_dir, f"{table_name}.parquet"), index=False)
+            else:
+                _write_excel_streaming(df, os.path.join(supply_center_dir, f"{table_name}.xlsx"))
+
+    print(f"Modified data saved to {base_dir}.")
+
+
+def _write_excel_streaming(df, file_path):
+    """
+    使用 xlsxwriter 的 constant_memory 模式逐行写入Excel, 内存占用与表格大小无关。
+    未安装 xlsxwriter 时退回 DataFrame.to_excel。
+    """
+    try:
+        import xlsxwriter
+    except ImportError:
+        df.to_excel(file_path, index=False)
+        return
+
+    workbook = xlsxwriter.Workbook(file_path, {
+        'constant_memory': True,
+        'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+    })
+    worksheet = workbook.add_worksheet()
+    worksheet.write_row(0, 0, [str(col) for col in df.columns])
+
+    for start in range(0, len(df), _EXCEL_CHUNK_ROWS):
+        chunk = df.iloc[start: start + _EXCEL_CHUNK_ROWS]
+        # 转为 Python 对象, 空值写为空单元格
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        for row_idx, row in enumerate(chunk.itertuples(index=False, name=None), start=start + 1):
+            worksheet.write_row(row_idx, 0, row)
+
+    workbook.close()
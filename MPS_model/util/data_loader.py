@@ -1,17 +1,51 @@
-from data.data_reader import DataReader
+from data.data_reader import DataReader, compute_raw_data_digests
 from data_processor.data_preprocessor import DataPreprocessor
+from data_processor.model_params_generator import ModelParams
 from util.header import *
+from util.params_snapshot import get_snapshot_path, load_model_params_snapshot, save_model_params_snapshot
+from util.profiler import PROFILER
+import os
 import warnings
 
 warnings.filterwarnings('ignore')
 
 
-def load_model_params(start_week, T):
-    """加载数据"""
-    data_reader = DataReader()
+def load_model_params(start_week, T, use_cache=True, num_load_workers=1, export_mode="excel",
+                      supply_centers=None, lazy_params=False, use_snapshot=False):
+    """
+    加载数据。supply_centers 指定只处理的供应中心(None 为全部);
+    lazy_params 为 True 时返回按供应中心延迟生成参数的 LazyModelParams, 否则一次生成全部参数的 ModelParams。
+    use_snapshot 为 True 时, 若存在与原始文件哈希值、起始周、计划周期和供应中心筛选一致的模型参数快照,
+    则直接从快照恢复 ModelParams 并跳过数据读取和预处理(此时编辑后数据字典为 None);
+    否则正常预处理并写入快照, 此时即使 lazy_params 为 True 也一次生成全部参数, 使下次运行能够命中快照。
+    快照写入失败(如参数中混有无法保存为定长数组的标签)时仅提示, 不影响本次运行。
+    """
+    snapshot_path = None
+    if use_snapshot:
+        with PROFILER.stage("load_model_params.check_snapshot"):
+            snapshot_path = get_snapshot_path(compute_raw_data_digests(), start_week, T, supply_centers)
+        if os.path.exists(snapshot_path):
+            with PROFILER.stage("load_model_params.load_snapshot"):
+                model_params_cls = load_model_params_snapshot(snapshot_path, ModelParams)
+            return model_params_cls, None
+        print(f"Model params snapshot miss: {snapshot_path}")
+        if lazy_params:
+            print("Generating all model params to write the snapshot, lazy_params is ignored for this run.")
+            lazy_params = False
+
+    data_reader = DataReader(use_cache=use_cache, num_workers=num_load_workers)
     data_dict = data_reader.get_data_dict()
-    data_preprocessor = DataPreprocessor(data_dict, start_week, T)
+    data_preprocessor = DataPreprocessor(
+        data_dict, start_week, T, export_mode=export_mode, supply_centers=supply_centers, lazy_params=lazy_params
+    )
     modified_data_dict = data_preprocessor.get_modified_data_dict()
     model_params_cls = data_preprocessor.get_processed_data_cls()
 
+    if snapshot_path is not None:
+        with PROFILER.stage("load_model_params.save_snapshot"):
+            try:
+                save_model_params_snapshot(model_params_cls, snapshot_path)
+            except (ValueError, OSError) as e:
+                print(f"Failed to save model params snapshot: {e}")
+
     return model_params_cls, modified_data_dict
@@ -1,10 +1,63 @@
 import datetime
 import os
 
+import pandas as pd
+
+
+def read_solution_file(file_name):
+    """
+    读取 COPT 输出的 .sol 文件, 返回 {变量名: 取值}, 跳过以 # 开头的注释行(如目标值)和空行。
+    """
+    values = {}
+    with open(file_name, 'r') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and not parts[0].startswith('#'):
+                values[parts[0]] = float(parts[1])
+    return values
+
+
+def find_latest_solution_file(supply_center):
+    """
+    查找某个供应中心最近一次输出的完整 .sol 文件(不含过滤后的文件), 不存在时返回 None。
+    文件名中的时间戳格式为 %Y%m%d_%H%M%S, 按文件名排序即按时间排序。
+    """
+    solution_dir = f"output/MPS/supply_center_{supply_center}"
+    if not os.path.isdir(solution_dir):
+        return None
+    solution_files = sorted(
+        file_name for file_name in os.listdir(solution_dir)
+        if file_name.startswith("mps_model_") and file_name.endswith(".sol") and not file_name.endswith("_filtered.sol")
+    )
+    return os.path.join(solution_dir, solution_files[-1]) if solution_files else None
+
+
+def write_scenario_results(supply_center, results):
+    """
+    将多个场景的求解结果写入同一个 CSV 文件: 每列为一个场景, 首行为目标值, 之后每行为一个在任一场景中非零的变量
+    (不含指示变量 z 和 e), 返回文件路径。
+    """
+    current_time = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    os.makedirs(f"output/MPS/supply_center_{supply_center}", exist_ok=True)
+    file_name = f"output/MPS/supply_center_{supply_center}/scenario_plans_{current_time}.csv"
+
+    plans = pd.DataFrame({scenario: pd.Series(result['values'], dtype=float) for scenario, result in results.items()})
+    plans = plans[~plans.index.str.match(r'^[ze]_')]
+    plans = plans.loc[(plans.abs() > 1e-6).any(axis=1)].round()
+    objective_values = pd.DataFrame(
+        {scenario: [result['objective_value']] for scenario, result in results.items()}, index=['objective_value']
+    )
+    pd.concat([objective_values, plans]).to_csv(file_name, index_label='variable')
+    print(f"Scenario plans written to {file_name}")
+    return file_name
+
+
 class ModelWriter:
-    def __init__(self, mps_model, supply_center):
-        self.model = mps_model.model
+    def __init__(self, mps_model, supply_center, presolver=None):
+        self.mps_model = mps_model
         self.supply_center = supply_center
+        # 建模前约简数据的 MPSPresolver, 写出 .sol 文件时补回被移除变量的固定取值
+        self.presolver = presolver
 
 
     def write_solution(self):
@@ -14,7 +67,9 @@ class ModelWriter:
         os.makedirs(f"output/MPS/supply_center_{self.supply_center}", exist_ok=True)
         file_name = f"output/MPS/supply_center_{self.supply_center}/mps_model_{current_time}.sol"
 
-        self.model.write(file_name)
+        self.mps_model.write_solution_file(file_name)
+        if self.presolver is not None:
+            self.presolver.restore_solution_file(file_name)
         print(f"Solution written to {file_name}")
 
         filtered_file_name = self._filter_zero_vars_out(file_name)
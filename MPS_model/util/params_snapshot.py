@@ -0,0 +1,152 @@
+from collections.abc import Mapping
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from data_processor.param_tables import PairSeriesTable, SeriesTable
+
+
+# 模型参数快照目录及版本号, 修改预处理逻辑或快照格式后需递增版本号使旧快照失效
+SNAPSHOT_DIR = "./data/snapshot"
+SNAPSHOT_VERSION = 1
+
+# 快照中记录参数结构的元数据键
+_META_KEY = "__meta__"
+
+
+def get_snapshot_path(file_digests_dict, start_week, T, supply_centers=None):
+    """
+    生成模型参数快照路径。快照以快照版本号、各原始文件哈希值、起始周、计划周期和供应中心筛选为键,
+    任一项变化时对应不同的快照文件。
+    """
+    snapshot_key = json.dumps({
+        'version': SNAPSHOT_VERSION,
+        'file_digests': file_digests_dict,
+        'start_week': start_week,
+        'T': T,
+        'supply_centers': list(supply_centers) if supply_centers is not None else None,
+    }, sort_keys=True, ensure_ascii=False)
+    digest = hashlib.sha256(snapshot_key.encode('utf-8')).hexdigest()
+    return os.path.join(SNAPSHOT_DIR, f"model_params_v{SNAPSHOT_VERSION}_{digest[:16]}.npz")
+
+
+def save_model_params_snapshot(model_params, snapshot_path):
+    """
+    将 ModelParams 的全部属性写入 npz 快照。参数表以矩阵形式保存, 字典和列表拆分为键数组和值数组,
+    嵌套结构记录在 JSON 元数据中, 读取时无需 pickle。先写临时文件再替换, 避免留下不完整的快照。
+    """
+    arrays = {}
+    meta = {
+        'version': SNAPSHOT_VERSION,
+        'attributes': {name: _encode(value, name, arrays) for name, value in vars(model_params).items()},
+    }
+    arrays[_META_KEY] = np.array(json.dumps(meta, ensure_ascii=False))
+
+    os.makedirs(os.path.dirname(snapshot_path) or '.', exist_ok=True)
+    tmp_path = f"{snapshot_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, snapshot_path)
+    print(f"Model params snapshot saved to {snapshot_path}")
+
+
+def load_model_params_snapshot(snapshot_path, model_params_cls):
+    """
+    从 npz 快照恢复 model_params_cls 实例, 不重新执行数据读取和预处理。快照版本不一致时抛出 ValueError。
+    """
+    with np.load(snapshot_path, allow_pickle=False) as npz:
+        arrays = {key: npz[key] for key in npz.files}
+
+    meta = json.loads(arrays[_META_KEY].item())
+    if meta['version'] != SNAPSHOT_VERSION:
+        raise ValueError(f"Snapshot version {meta['version']} does not match {SNAPSHOT_VERSION}: {snapshot_path}")
+
+    attributes = {name: _decode(spec, arrays) for name, spec in meta['attributes'].items()}
+    print(f"Model params snapshot loaded from {snapshot_path}")
+    return model_params_cls.from_attributes(attributes)
+
+
+def _encode(value, key, arrays):
+    """
+    将参数值编码为元数据描述, 其中的数组写入 arrays, 数组键以 key 为前缀。
+    """
+    if isinstance(value, SeriesTable):
+        arrays[f"{key}/labels"] = _to_array(value.labels, key)
+        arrays[f"{key}/matrix"] = value.matrix
+        return {'type': 'series_table', 'key': key}
+    if isinstance(value, PairSeriesTable):
+        arrays[f"{key}/outer_labels"] = _to_array(value.outer_labels, key)
+        arrays[f"{key}/inner_labels"] = _to_array(value.inner_labels, key)
+        arrays[f"{key}/outer_codes"] = value.outer_codes
+        arrays[f"{key}/inner_codes"] = value.inner_codes
+        arrays[f"{key}/matrix"] = value.matrix
+        return {'type': 'pair_series_table', 'key': key}
+    if isinstance(value, list):
+        arrays[key] = _to_array(value, key)
+        return {'type': 'list', 'key': key}
+    if isinstance(value, Mapping):
+        items = list(value.items())
+        if items and all(isinstance(item, Mapping) for _, item in items):
+            # 嵌套字典逐层记录, 外层键一般为供应中心
+            if not all(isinstance(item_key, str) for item_key, _ in items):
+                raise ValueError(f"Nested dict keys must be strings to be snapshotted: {key}")
+            return {
+                'type': 'dict',
+                'items': {item_key: _encode(item, f"{key}/{item_key}", arrays) for item_key, item in items},
+            }
+        if items and all(isinstance(item, list) for _, item in items):
+            # {键: 列表} 拆分为键数组、各列表长度数组和拼接后的值数组
+            arrays[f"{key}/keys"] = _to_array([item_key for item_key, _ in items], key)
+            arrays[f"{key}/lengths"] = np.array([len(item) for _, item in items], dtype=np.int64)
+            arrays[f"{key}/values"] = _to_array([v for _, item in items for v in item], key)
+            return {'type': 'list_dict', 'key': key}
+        # {键: 标量} 拆分为键数组和值数组
+        arrays[f"{key}/keys"] = _to_array([item_key for item_key, _ in items], key)
+        arrays[f"{key}/values"] = _to_array([item for _, item in items], key)
+        return {'type': 'scalar_dict', 'key': key}
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return {'type': 'scalar', 'value': value}
+    raise ValueError(f"Unsupported model parameter type for snapshot: {key} ({type(value).__name__})")
+
+
+def _decode(spec, arrays):
+    """
+    按元数据描述从 arrays 恢复参数值。
+    """
+    value_type = spec['type']
+    key = spec.get('key')
+    if value_type == 'scalar':
+        return spec['value']
+    if value_type == 'list':
+        return arrays[key].tolist()
+    if value_type == 'dict':
+        return {item_key: _decode(item_spec, arrays) for item_key, item_spec in spec['items'].items()}
+    if value_type == 'scalar_dict':
+        return dict(zip(arrays[f"{key}/keys"].tolist(), arrays[f"{key}/values"].tolist()))
+    if value_type == 'list_dict':
+        values = arrays[f"{key}/values"].tolist()
+        bounds = np.concatenate([[0], np.cumsum(arrays[f"{key}/lengths"])]).tolist()
+        return {
+            item_key: values[bounds[i]: bounds[i + 1]]
+            for i, item_key in enumerate(arrays[f"{key}/keys"].tolist())
+        }
+    if value_type == 'series_table':
+        return SeriesTable(arrays[f"{key}/labels"].tolist(), arrays[f"{key}/matrix"])
+    if value_type == 'pair_series_table':
+        return PairSeriesTable(
+            arrays[f"{key}/outer_labels"].tolist(), arrays[f"{key}/inner_labels"].tolist(),
+            arrays[f"{key}/outer_codes"], arrays[f"{key}/inner_codes"], arrays[f"{key}/matrix"]
+        )
+    raise ValueError(f"Unknown snapshot value type: {value_type}")
+
+
+def _to_array(values, key):
+    """
+    将列表转为定长类型的 NumPy 数组。元素类型混杂(如字符串与数字混合)时无法无损还原, 抛出 ValueError。
+    """
+    array = np.asarray(values)
+    if array.dtype.kind == 'O' or (array.dtype.kind == 'U' and not all(isinstance(v, str) for v in values)):
+        raise ValueError(f"Values of {key} cannot be stored as a fixed-type array")
+    return array
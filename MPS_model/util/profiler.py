@@ -0,0 +1,138 @@
+from collections.abc import Mapping
+from contextlib import contextmanager
+import datetime
+import json
+import os
+import sys
+import threading
+import time
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows 下没有 resource 模块
+    resource = None
+
+
+def _get_peak_rss_mb():
+    """
+    获取进程的峰值常驻内存(MB)。Linux 下 ru_maxrss 单位为 KB, macOS 下为字节。
+    无法获取时返回 None。
+    """
+    if resource is not None:
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak_rss / (1024 * 1024) if sys.platform == 'darwin' else peak_rss / 1024
+    try:
+        import psutil
+        memory_info = psutil.Process().memory_info()
+        return getattr(memory_info, 'peak_wset', memory_info.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+def count_rows(obj):
+    """
+    统计阶段输出的行数:
+    - DataFrame 为其行数, 元组为各元素行数之和;
+    - 字典对各值求和: DataFrame 和字典递归统计, 标签列表(如SKU列表)计其长度, 数值序列和标量计为 1 行。
+      例如 {供应中心: {SKU: 周需求列表}} 为 SKU 总数, {供应中心: SKU列表} 也为 SKU 总数。
+    """
+    if isinstance(obj, pd.DataFrame):
+        return len(obj)
+    if isinstance(obj, tuple):
+        return sum(count_rows(item) for item in obj)
+    if isinstance(obj, list):
+        return len(obj)
+    if isinstance(obj, Mapping):
+        rows = 0
+        for value in obj.values():
+            if isinstance(value, (pd.DataFrame, Mapping, tuple)):
+                rows += count_rows(value)
+            elif isinstance(value, list) and not any(isinstance(item, (int, float)) for item in value):
+                rows += len(value)
+            else:
+                rows += 1
+        return rows
+    return None
+
+
+class StageProfiler:
+    """
+    记录流水线各阶段的墙钟时间、CPU 时间、峰值常驻内存增量和输出行数, 并输出为 JSON 运行清单。
+    """
+    def __init__(self):
+        self._records = []
+        self._lock = threading.Lock()
+
+
+    @contextmanager
+    def stage(self, name):
+        """
+        统计 with 语句块内的耗时和内存。调用方可在块内向返回的记录字典写入 'rows' 等额外字段。
+        """
+        record = {'stage': name, 'rows': None}
+        start_peak_rss = _get_peak_rss_mb()
+        start_cpu_time = time.process_time()
+        start_wall_time = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['wall_time_s'] = round(time.perf_counter() - start_wall_time, 6)
+            record['cpu_time_s'] = round(time.process_time() - start_cpu_time, 6)
+            end_peak_rss = _get_peak_rss_mb()
+            record['peak_rss_delta_mb'] = (
+                round(end_peak_rss - start_peak_rss, 3) if start_peak_rss is not None and end_peak_rss is not None else None
+            )
+            with self._lock:
+                self._records.append(record)
+
+
+    def get_records(self):
+        """
+        获取已记录的阶段统计列表。
+        """
+        with self._lock:
+            return list(self._records)
+
+
+    def add_records(self, records):
+        """
+        追加其他进程记录的阶段统计, 如并行求解的工作进程返回的记录。
+        """
+        with self._lock:
+            self._records.extend(records)
+
+
+    def reset(self):
+        """
+        清空已记录的阶段统计。
+        """
+        with self._lock:
+            self._records.clear()
+
+
+    def write_manifest(self, output_dir, run_info=None):
+        """
+        将阶段统计和运行信息写入 output_dir 下的 run_manifest_<时间>.json, 返回文件路径。
+        """
+        current_time = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        os.makedirs(output_dir, exist_ok=True)
+        file_name = os.path.join(output_dir, f"run_manifest_{current_time}.json")
+
+        records = self.get_records()
+        manifest = {
+            'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'run_info': run_info or {},
+            'peak_rss_mb': _get_peak_rss_mb(),
+            'stages': records,
+        }
+        with open(file_name, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2, default=str)
+
+        print(f"Run manifest written to {file_name}")
+        return file_name
+
+
+# 全局阶段统计器, 供流水线各模块共用
+PROFILER = StageProfiler()
@@ -0,0 +1,138 @@
+from util.header import *
+import re
+
+
+# 周列列名模式, 如 "2025W1" 或 "2024W50-12/08"
+WEEK_COLUMN_PATTERN = re.compile(r'^20\d{2}W\d+')
+
+
+def is_week_column(col):
+    """
+    判断列名是否为周列。
+    """
+    return isinstance(col, str) and WEEK_COLUMN_PATTERN.match(col) is not None
+
+
+class TableSchema:
+    """
+    原始数据表的读取模式: 声明后续流程需要的列、各列类型以及是否包含周列。
+    读取时只解析声明的列, 每个工作簿只打开一次, 读取后校验缺失列。
+    """
+    def __init__(self, table_name, columns, dtypes=None, week_column_dtype=None, has_week_columns=False):
+        self.table_name = table_name
+        self.columns = list(columns)
+        self.dtypes = dtypes or {}
+        self.week_column_dtype = week_column_dtype
+        self.has_week_columns = has_week_columns
+
+
+    def is_required_column(self, col):
+        """
+        判断列是否需要读取, 作为 pd.read_excel 的 usecols 参数, 读取时只解析声明的列和周列。
+        """
+        return col in self.columns or (self.has_week_columns and is_week_column(col))
+
+
+    def get_read_kwargs(self):
+        """
+        生成 pd.read_excel 的 usecols 和 dtype 参数。周列列名在读取前未知, 其类型由 check_columns 在读取后转换。
+        """
+        return {'usecols': self.is_required_column, 'dtype': dict(self.dtypes)}
+
+
+    def check_columns(self, df):
+        """
+        校验读取结果的列并转换周列类型, 返回 DataFrame。
+        处理逻辑：
+        1. 检查声明的列是否都已读取, 缺失则抛出 ValueError;
+        2. 若表格包含周列, 检查是否读取到周列, 并按 week_column_dtype 转换周列类型。
+        """
+        missing_columns = [col for col in self.columns if col not in df.columns]
+        if missing_columns:
+            raise ValueError(f"Table {self.table_name} is missing required columns: {missing_columns}")
+
+        week_columns = [col for col in df.columns if is_week_column(col)] if self.has_week_columns else []
+        if self.has_week_columns and not week_columns:
+            raise ValueError(f"Table {self.table_name} has no week columns matching {WEEK_COLUMN_PATTERN.pattern}")
+
+        if self.week_column_dtype is not None:
+            df = df.astype({col: self.week_column_dtype for col in week_columns})
+        return df
+
+
+# SKU、PN、供应中心、组装厂等标识列取值重复度高, 使用 category 类型; 数量类列使用 float32
+TABLE_SCHEMAS = {
+    TableName.ANKER_WEEK: TableSchema(
+        TableName.ANKER_WEEK,
+        columns=[AnkerWeek.ANKER_WEEK_MONTH_DAY, AnkerWeek.ANKER_MONTH],
+    ),
+    TableName.FACTORY_CAPACITY: TableSchema(
+        TableName.FACTORY_CAPACITY,
+        columns=[
+            FactoryCapacity.BG, FactoryCapacity.PDT, FactoryCapacity.PN, FactoryCapacity.SUPPLY_CENTER,
+            FactoryCapacity.FACTORY, FactoryCapacity.PRODUCT_LINE, FactoryCapacity.UPH, FactoryCapacity.HOURS_PER_SHIFT,
+            FactoryCapacity.SHIFTS_PER_DAY_PER_LINE, FactoryCapacity.AVAILABLE_LINE_COUNT,
+        ],
+        dtypes={
+            FactoryCapacity.PN: 'category',
+            FactoryCapacity.SUPPLY_CENTER: 'category',
+            FactoryCapacity.FACTORY: 'category',
+            FactoryCapacity.UPH: 'float64',
+            FactoryCapacity.HOURS_PER_SHIFT: 'float64',
+            FactoryCapacity.SHIFTS_PER_DAY_PER_LINE: 'float64',
+            FactoryCapacity.AVAILABLE_LINE_COUNT: 'float64',
+        },
+    ),
+    # 生产天数表的周列可能含有非数值内容, 由 DataReader 清洗时再转换为数值
+    TableName.FACTORY_PRODUCTION_DAYS: TableSchema(
+        TableName.FACTORY_PRODUCTION_DAYS,
+        columns=[FactoryProductionDays.FACTORY],
+        dtypes={FactoryProductionDays.FACTORY: 'category'},
+        has_week_columns=True,
+    ),
+    TableName.CURRENT_INVENTORY: TableSchema(
+        TableName.CURRENT_INVENTORY,
+        columns=[CurrentInventory.SUPPLY_CENTER, CurrentInventory.SKU, CurrentInventory.QUANTITY],
+        dtypes={
+            CurrentInventory.SUPPLY_CENTER: 'category',
+            CurrentInventory.SKU: 'category',
+            CurrentInventory.QUANTITY: 'float32',
+        },
+    ),
+    TableName.INTRANSIT_PO: TableSchema(
+        TableName.INTRANSIT_PO,
+        columns=[
+            IntransitPO.SUPPLIER, IntransitPO.SKU, IntransitPO.INTRANSIT_QUANTITY, IntransitPO.SUPPLY_CENTER,
+            IntransitPO.REQUIRED_ARRIVAL_TIME,
+        ],
+        dtypes={
+            IntransitPO.SUPPLIER: 'category',
+            IntransitPO.SKU: 'category',
+            IntransitPO.INTRANSIT_QUANTITY: 'float32',
+            IntransitPO.SUPPLY_CENTER: 'category',
+        },
+    ),
+    # MOQ 列可能含有非数值内容, 由 DataModifier 转换为数值
+    TableName.SKU_MAIN: TableSchema(
+        TableName.SKU_MAIN,
+        columns=[
+            SKUMain.BG, SKUMain.PN, SKUMain.SKU, SKUMain.SUPPLY_CENTER, SKUMain.SLA_S, SKUMain.SAFTY_STOCK_WEEKS,
+            SKUMain.STOCK_OUT_COST, SKUMain.LOSS_SALES_COST, SKUMain.MOQ,
+        ],
+        dtypes={
+            SKUMain.PN: 'category',
+            SKUMain.SKU: 'category',
+            SKUMain.SUPPLY_CENTER: 'category',
+        },
+    ),
+    TableName.SOP_PREDICTION: TableSchema(
+        TableName.SOP_PREDICTION,
+        columns=[SOP_PREDICTION.SKU, SOP_PREDICTION.SUPPLY_CENTER],
+        dtypes={
+            SOP_PREDICTION.SKU: 'category',
+            SOP_PREDICTION.SUPPLY_CENTER: 'category',
+        },
+        week_column_dtype='float32',
+        has_week_columns=True,
+    ),
+}